@@ -0,0 +1,49 @@
+"""
+Timing helpers shared by the benchmark scripts
+"""
+import time
+import statistics
+
+
+def report(label: str, count: int, elapsed: float, unit: str = "op", note: str = None) -> float:
+    """
+    Print the throughput of `count` operations that took `elapsed` seconds
+
+    Args:
+        label: Row label
+        count: Number of operations
+        elapsed: Wall time in seconds
+        unit: Singular name of one operation (e.g. "signature")
+        note: Shown in parentheses instead of the per-operation time
+
+    Returns:
+        Operations per second
+    """
+    rate = count / elapsed
+    detail = note or f"{elapsed / count * 1e6:.1f} us/{unit}"
+    print(f"{label:<34} {rate:>12.1f} {unit}s/s  ({detail})")
+    return rate
+
+
+def measure(label: str, fn, iterations: int, unit: str = "op") -> float:
+    """
+    Call `fn` once to warm up, then `iterations` times in a row, and report the throughput
+
+    Returns:
+        Calls per second
+    """
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return report(label, iterations, time.perf_counter() - start, unit)
+
+
+async def measure_latency(label: str, run, rounds: int):
+    """Await `run()` `rounds` times and print the p50 and max latency"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await run()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<34} p50 {statistics.median(samples):>8.1f}ms  max {max(samples):>8.1f}ms")
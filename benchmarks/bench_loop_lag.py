@@ -0,0 +1,73 @@
+"""
+Benchmark: event loop lag while signing (inline vs thread pool vs process pool)
+
+A ticker coroutine sleeps 5ms in a loop and records how late it wakes up while N
+transactions are signed concurrently through services/crypto_executor.py. Reports
+signatures per second and loop lag p50/p99/max for each executor mode.
+
+Usage:
+    python -m benchmarks.bench_loop_lag [signatures] [workers]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+from services.crypto_executor import CryptoExecutor
+from services.signer import LocalSigner
+
+PRIVATE_KEY = "0x" + "11" * 32
+TICK_SECONDS = 0.005
+
+
+def transaction(nonce: int):
+    return {
+        "to": "0x" + "22" * 20, "value": 0, "gas": 100000, "gasPrice": 10 ** 9,
+        "nonce": nonce, "chainId": 11155111, "data": "0x"
+    }
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+async def measure(mode: str, signer: LocalSigner, signatures: int, workers: int):
+    executor = CryptoExecutor(mode, workers)
+    await executor.sign_transaction(signer, transaction(0))  # warm-up (starts the pool)
+
+    lags, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK_SECONDS * 2)
+
+    start = time.perf_counter()
+    signed = await asyncio.gather(*(executor.sign_transaction(signer, transaction(n)) for n in range(signatures)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    executor.shutdown()
+
+    # Same key and payload must give the same signature in every mode
+    assert signed[1].raw_transaction == signer.sign_transaction(transaction(1)).raw_transaction
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    median = statistics.median(lags) if lags else 0.0
+    print(
+        f"{mode:<8} {signatures / elapsed:>9.1f} signatures/s   "
+        f"loop lag p50 {median:>7.2f}ms  p99 {p99:>7.2f}ms  max {(lags[-1] if lags else 0):>7.2f}ms"
+    )
+
+
+async def main(signatures: int, workers: int):
+    signer = LocalSigner(PRIVATE_KEY)
+    for mode in ("inline", "thread", "process"):
+        await measure(mode, signer, signatures, workers)
+
+
+if __name__ == "__main__":
+    signatures = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    asyncio.run(main(signatures, workers))
@@ -0,0 +1,71 @@
+"""
+Benchmark: permit pre-flight latency (sequential vs concurrent fan-out)
+
+A fake handler answers each pre-flight call (allowance, validation, simulation, gas
+balance, gas price) after a blocking sleep, like a sync web3 RPC read, and the permit
+pre-flight of services/non_custodial/execute_permit.py is timed against running the
+same calls one after another.
+
+Usage:
+    python -m benchmarks.bench_preflight [rpc_latency_ms] [rounds]
+"""
+import sys
+import time
+import asyncio
+
+import services.non_custodial.execute_permit as execute_permit
+from services.non_custodial.execute_permit import ExecutePermitRequest, _preflight
+from benchmarks._timing import measure_latency
+
+
+class FakeHandler:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _rpc(self):
+        time.sleep(self.latency)
+
+    async def check_allowance(self, owner_address: str, spender: str = None):
+        await asyncio.to_thread(self._rpc)
+        return {"success": True, "allowance": 0}
+
+    def validate_permit(self, owner, spender, value, deadline, **kwargs):
+        self._rpc()  # Permit nonce read on a cache miss
+        return {"success": True}
+
+    def simulate_permit(self, owner, spender, value, deadline, **kwargs):
+        self._rpc()
+        return {"success": True}
+
+    async def get_native_balance(self, address: str) -> float:
+        await asyncio.to_thread(self._rpc)
+        return 1.0
+
+    async def get_gas_price(self) -> int:
+        await asyncio.to_thread(self._rpc)
+        return 10 ** 9
+
+
+async def sequential(handler: FakeHandler, request: ExecutePermitRequest):
+    await handler.check_allowance(request.owner, request.spender)
+    await asyncio.to_thread(handler.validate_permit, request.owner, request.spender, request.value, request.deadline)
+    await asyncio.to_thread(handler.simulate_permit, request.owner, request.spender, request.value, request.deadline)
+    await handler.get_native_balance(request.spender)
+    await handler.get_gas_price()
+
+
+async def main(latency_ms: float, rounds: int):
+    execute_permit.PERMIT_RPC_SIMULATION = True
+    handler = FakeHandler(latency_ms / 1000)
+    request = ExecutePermitRequest(
+        owner="0x" + "11" * 20, spender="0x" + "22" * 20, value=1000, deadline=2 ** 32,
+        v=27, r="0x" + "33" * 32, s="0x" + "44" * 32
+    )
+    await measure_latency("sequential", lambda: sequential(handler, request), rounds)
+    await measure_latency("fan-out", lambda: _preflight(handler, request), rounds)
+
+
+if __name__ == "__main__":
+    latency_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 80
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(latency_ms, rounds))
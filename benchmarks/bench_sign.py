@@ -0,0 +1,75 @@
+"""
+Benchmark: EIP-2612 permit signatures per second
+
+Compares the previous per-call signing path of services/execute_sign.sign (new Web3 provider,
+Account.from_key, typed-data encoding, signing and recovery check on every call) with the
+cached SigningContext. RPC reads (nonce, balances) are excluded from both sides so only the
+per-signature setup and CPU work is measured.
+
+Usage:
+    python -m benchmarks.bench_sign [iterations]
+"""
+import os
+import sys
+
+# Offline defaults so the benchmark runs without a .env
+os.environ.setdefault("PAYER_PRIVATE_KEY", "0x" + "11" * 32)
+os.environ.setdefault("SPENDER_WALLET_ADDRESS", "0x" + "22" * 20)
+os.environ.setdefault("SEPOLIA_RPC_URL", "http://127.0.0.1:1")
+os.environ.setdefault("SEPOLIA_USDC_ADDRESS", "0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238")
+
+from web3 import Web3
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+
+from services.execute_sign import (
+    CHAIN_CONFIGS, TOKEN_CONFIGS, OWNER_PRIVATE_KEY, SPENDER, get_signing_context
+)
+from benchmarks._timing import measure
+
+NETWORK = "sepolia"
+TOKEN = "USDC"
+VALUE = 10_000
+DEADLINE = 2_000_000_000
+NONCE = 0
+
+PERMIT_TYPES = {
+    "Permit": [
+        {"name": "owner", "type": "address"},
+        {"name": "spender", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ],
+}
+
+
+def sign_legacy():
+    """The per-call work sign() did before the signing context (without its RPC reads)"""
+    chain_config = CHAIN_CONFIGS[NETWORK]
+    token_config = TOKEN_CONFIGS[NETWORK][TOKEN]
+    Web3(Web3.HTTPProvider(chain_config["rpc_url"]))
+    acct = Account.from_key(OWNER_PRIVATE_KEY)
+    domain = {
+        "name": token_config["name"],
+        "version": token_config["version"],
+        "chainId": chain_config["chain_id"],
+        "verifyingContract": token_config["address"],
+    }
+    message = {"owner": acct.address, "spender": SPENDER, "value": VALUE, "nonce": NONCE, "deadline": DEADLINE}
+    encoded = encode_typed_data(domain, PERMIT_TYPES, message)
+    signed = acct.sign_message(encoded)
+    recovered = Account.recover_message(encoded, signature=signed.signature)
+    assert recovered == acct.address
+
+
+def sign_with_context():
+    get_signing_context(NETWORK, TOKEN).sign_permit(VALUE, DEADLINE, NONCE)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    get_signing_context(NETWORK, TOKEN)  # build once, outside the measurement
+    before = measure("before (per-call setup)", sign_legacy, iterations, "signature")
+    after = measure("after (SigningContext)", sign_with_context, iterations, "signature")
+    print(f"speedup: {after / before:.2f}x")
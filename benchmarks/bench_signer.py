@@ -0,0 +1,64 @@
+"""
+Benchmark: signer backends (local key vs remote signer vs batching remote signer)
+
+Starts the stand-in signer server (services/signer_server.py) in-process on a Unix socket,
+checks that remote signatures equal local ones, then signs permits from many concurrent
+threads with each backend and reports signatures per second.
+
+Usage:
+    python -m benchmarks.bench_signer [signatures] [threads]
+"""
+import os
+import sys
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from services.eip712 import build_domain_separator, build_permit_struct_hash, signable_message
+from services.signer import LocalSigner, RemoteSigner, BatchingSigner
+from services.signer_server import create_signer_server, start_signer_server_thread
+from benchmarks._timing import report
+
+PRIVATE_KEY = "0x" + "11" * 32
+SPENDER = "0x" + "22" * 20
+DOMAIN_SEPARATOR = build_domain_separator("USDC", "2", 11155111, "0x1c7D4B196Cb0C7B01d743Fbc6116a902379C7238")
+TRANSACTION = {
+    "to": SPENDER, "value": 0, "gas": 100000, "gasPrice": 10 ** 9,
+    "nonce": 0, "chainId": 11155111, "data": "0x"
+}
+
+
+def permit_message(nonce: int):
+    return signable_message(DOMAIN_SEPARATOR, build_permit_struct_hash(
+        "0x19E7E376E7C213B7E7e7e46cc70A5dD086DAff2A", SPENDER, 10_000, nonce, 2_000_000_000
+    ))
+
+
+def measure(label: str, signer, signatures: int, threads: int) -> float:
+    signer.sign_message(permit_message(0))  # warm-up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda nonce: signer.sign_message(permit_message(nonce)), range(signatures)))
+    return report(label, signatures, time.perf_counter() - start, "signature", f"{threads} concurrent callers")
+
+
+if __name__ == "__main__":
+    signatures = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "signer.sock")
+    start_signer_server_thread(create_signer_server([PRIVATE_KEY], unix_path=socket_path))
+
+    local = LocalSigner(PRIVATE_KEY)
+    remote = RemoteSigner(local.address, f"unix://{socket_path}")
+    batching = BatchingSigner(RemoteSigner(local.address, f"unix://{socket_path}"))
+
+    # Remote backends must produce exactly the local signatures
+    for signer in (remote, batching):
+        assert signer.sign_message(permit_message(1)).signature == local.sign_message(permit_message(1)).signature
+        assert signer.sign_transaction(TRANSACTION).raw_transaction == local.sign_transaction(TRANSACTION).raw_transaction
+    print("correctness: remote and batching signatures match the local key")
+
+    measure("local", local, signatures, threads)
+    measure("remote (unix socket)", remote, signatures, threads)
+    measure("batching (unix socket)", batching, signatures, threads)
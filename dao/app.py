@@ -1,12 +1,14 @@
 from log import logger
-from sqlmodel import Session, select
+from sqlmodel import Session, select, func
 from .database import engine
 from .model import (
     OrderItem, SettlementBatch, 
     SettlementDetail, PayoutInstruction,
-    AuditEvent, Intent
+    AuditEvent, Intent, Payment, SettlementJob,
+    SettlementDetailStatus, SettlementBatchStatus, PaymentState, BatchStatus, PayoutStatus
 )
-from datetime import datetime
+from datetime import datetime, timedelta
+import uuid
 
 def add_settlement_batch(settlement_batch: SettlementBatch, settlement_detail: SettlementDetail):
     with Session(engine) as session:
@@ -95,5 +97,329 @@ def add_audit_event(audit_event: AuditEvent, intent: Intent = None)-> dict[str,
         session.refresh(audit_event)
         return audit_event.model_dump(mode="json")
 
+def add_settlement_detail(settlement_detail: SettlementDetail) -> dict[str, any]:
+    with Session(engine) as session:
+        session.add(settlement_detail)
+        session.commit()
+        session.refresh(settlement_detail)
+        logger.info(f"Added settlement detail: {settlement_detail}")
+        return settlement_detail.model_dump(mode="json")
+
+def claim_ready_settlement_details(chain_id: str, asset_id: str, limit: int = 500) -> list[dict[str, any]]:
+    """
+    Lock ready settlement details of a chain/token and mark them as releasing (safe with concurrent executors)
+
+    Payees whose ready details do not add up to a positive net amount are left out: their
+    details stay ready until later settlements make the payout positive.
+    """
+    with Session(engine) as session:
+        payable_payees = (
+            select(SettlementDetail.payee_address)
+            .where(SettlementDetail.chain_id == chain_id)
+            .where(SettlementDetail.asset_id == asset_id)
+            .where(SettlementDetail.settlement_status == SettlementDetailStatus.ready)
+            .group_by(SettlementDetail.payee_address)
+            .having(func.sum(SettlementDetail.net_amount) > 0)
+        )
+        details = session.exec(
+            select(SettlementDetail)
+            .where(SettlementDetail.chain_id == chain_id)
+            .where(SettlementDetail.asset_id == asset_id)
+            .where(SettlementDetail.settlement_status == SettlementDetailStatus.ready)
+            .where(SettlementDetail.payee_address.in_(payable_payees))
+            .order_by(SettlementDetail.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        results = []
+        for detail in details:
+            detail.settlement_status = SettlementDetailStatus.releasing
+            detail.updated_at = datetime.now()
+            session.add(detail)
+            results.append(detail.model_dump(mode="json"))
+        session.commit()
+        logger.info(f"Claimed {len(results)} ready settlement details for chain_id: {chain_id}, asset_id: {asset_id}")
+        return results
+
+def update_settlement_details(settlement_detail_ids: list[str], settlement_status: SettlementDetailStatus,
+                              tx_hash: str = None, settled_at: datetime = None, settlement_batch_id: str = None):
+    with Session(engine) as session:
+        details = session.exec(
+            select(SettlementDetail).where(SettlementDetail.settlement_detail_id.in_([uuid.UUID(str(i)) for i in settlement_detail_ids]))
+        ).all()
+        for detail in details:
+            detail.settlement_status = settlement_status
+            if tx_hash:
+                detail.tx_hash = tx_hash
+            if settled_at:
+                detail.settled_at = settled_at
+            if settlement_batch_id:
+                detail.settlement_batch_id = uuid.UUID(str(settlement_batch_id))
+            detail.updated_at = datetime.now()
+            session.add(detail)
+        session.commit()
+        logger.info(f"Updated {len(details)} settlement details to status: {settlement_status}")
+
+def add_payout_batch(settlement_batch: SettlementBatch, payout_instruction: PayoutInstruction, settlement_detail_ids: list[str]) -> dict[str, any]:
+    """Persist a settlement batch with its payout instruction and attach the settled details to it"""
+    with Session(engine) as session:
+        payout_instruction.settlement_batch = settlement_batch
+        session.add(payout_instruction)
+        session.flush()
+        details = session.exec(
+            select(SettlementDetail).where(SettlementDetail.settlement_detail_id.in_([uuid.UUID(str(i)) for i in settlement_detail_ids]))
+        ).all()
+        for detail in details:
+            detail.settlement_batch_id = settlement_batch.settlement_batch_id
+            session.add(detail)
+        session.commit()
+        session.refresh(settlement_batch)
+        session.refresh(payout_instruction)
+        logger.info(f"Added payout batch: {settlement_batch} with payout instruction: {payout_instruction}")
+        return {
+            "settlement_batch_id": str(settlement_batch.settlement_batch_id),
+            "payout_id": str(payout_instruction.payout_id)
+        }
+
+def update_payout_instruction(payout_id: str, **fields) -> dict[str, any]:
+    with Session(engine) as session:
+        payout_instruction = session.get(PayoutInstruction, uuid.UUID(str(payout_id)))
+        if not payout_instruction:
+            logger.error(f"Payout instruction not found: {payout_id}")
+            return None
+        for key, value in fields.items():
+            setattr(payout_instruction, key, value)
+        payout_instruction.updated_at = datetime.now()
+        session.add(payout_instruction)
+        session.commit()
+        session.refresh(payout_instruction)
+        return payout_instruction.model_dump(mode="json")
+
+def get_submitted_payout_instructions(chain_id: str, limit: int = 100) -> list[dict[str, any]]:
+    """Payout instructions of a chain that were sent but whose outcome is not recorded yet (oldest first)"""
+    with Session(engine) as session:
+        payout_instructions = session.exec(
+            select(PayoutInstruction)
+            .where(PayoutInstruction.chain_id == chain_id)
+            .where(PayoutInstruction.status == PayoutStatus.submitted)
+            .order_by(PayoutInstruction.submitted_at)
+            .limit(limit)
+        ).all()
+        return [payout_instruction.model_dump(mode="json") for payout_instruction in payout_instructions]
+
+def get_settlement_detail_ids(settlement_batch_id: str) -> list[str]:
+    with Session(engine) as session:
+        detail_ids = session.exec(
+            select(SettlementDetail.settlement_detail_id)
+            .where(SettlementDetail.settlement_batch_id == uuid.UUID(str(settlement_batch_id)))
+        ).all()
+        return [str(detail_id) for detail_id in detail_ids]
+
+def update_settlement_batch_status(settlement_batch_id: str, settlement_status: SettlementBatchStatus):
+    with Session(engine) as session:
+        settlement_batch = session.get(SettlementBatch, uuid.UUID(str(settlement_batch_id)))
+        if settlement_batch:
+            settlement_batch.settlement_status = settlement_status
+            settlement_batch.updated_at = datetime.now()
+            session.add(settlement_batch)
+            session.commit()
+            logger.info(f"Updated settlement batch: {settlement_batch_id} to status: {settlement_status}")
+
+
+TERMINAL_PAYMENT_STATES = (PaymentState.confirmed, PaymentState.failed)
+
+def add_payment(payment: Payment) -> dict[str, any]:
+    with Session(engine) as session:
+        payment.created_at = datetime.now()
+        payment.updated_at = payment.created_at
+        session.add(payment)
+        session.commit()
+        session.refresh(payment)
+        logger.info(f"Added payment: {payment.payment_id} in state: {payment.state}")
+        return payment.model_dump(mode="json")
+
+def get_payment(payment_id: str) -> dict[str, any]:
+    with Session(engine) as session:
+        payment = session.get(Payment, uuid.UUID(str(payment_id)))
+        if payment:
+            return payment.model_dump(mode="json")
+        return None
+
+def transition_payment(payment_id: str, from_states: list[PaymentState], to_state: PaymentState, **fields) -> dict[str, any]:
+    """Move a payment to to_state only if it is still in one of from_states (row locked, so concurrent workers cannot both win)"""
+    with Session(engine) as session:
+        payment = session.exec(
+            select(Payment)
+            .where(Payment.payment_id == uuid.UUID(str(payment_id)))
+            .where(Payment.state.in_(from_states))
+            .with_for_update()
+        ).first()
+        if not payment:
+            logger.warning(f"Payment {payment_id} is no longer in {[str(state.value) for state in from_states]}, skip transition to {to_state.value}")
+            return None
+        previous_state = payment.state
+        payment.state = to_state
+        for key, value in fields.items():
+            setattr(payment, key, value)
+        payment.updated_at = datetime.now()
+        session.add(payment)
+        session.commit()
+        session.refresh(payment)
+        logger.info(f"Payment {payment_id}: {previous_state.value} -> {to_state.value}")
+        return payment.model_dump(mode="json")
+
+def lease_payment(payment_id: str, lease_seconds: float) -> dict[str, any]:
+    """Take the lease of an unfinished payment unless another worker holds it; None if not available"""
+    with Session(engine) as session:
+        now = datetime.now()
+        payment = session.exec(
+            select(Payment)
+            .where(Payment.payment_id == uuid.UUID(str(payment_id)))
+            .where(Payment.state.not_in(TERMINAL_PAYMENT_STATES))
+            .where((Payment.lease_expires_at == None) | (Payment.lease_expires_at < now))
+            .with_for_update(skip_locked=True)
+        ).first()
+        if not payment:
+            return None
+        payment.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        session.add(payment)
+        session.commit()
+        session.refresh(payment)
+        return payment.model_dump(mode="json")
+
+def release_payment_lease(payment_id: str):
+    with Session(engine) as session:
+        payment = session.get(Payment, uuid.UUID(str(payment_id)))
+        if payment:
+            payment.lease_expires_at = None
+            session.add(payment)
+            session.commit()
+
+def has_earlier_unfinished_permit(payment_id: str, chain: str, token: str, owner_address: str, permit_nonce: int) -> bool:
+    """
+    Whether another payment of the owner and token signed with a lower permit nonce is still on its way
+
+    Only payments whose permit was submitted (permit_submitted or later), or that are queued
+    for settlement within their deadline, count: a signed payment the user never submitted
+    does not hold the owner's later permits back.
+    """
+    with Session(engine) as session:
+        queued = select(SettlementJob.job_id).where(SettlementJob.payment_id == Payment.payment_id).exists()
+        earlier = session.exec(
+            select(Payment.payment_id)
+            .where(Payment.payment_id != uuid.UUID(str(payment_id)))
+            .where(Payment.chain == chain)
+            .where(Payment.token == token)
+            .where(Payment.owner_address == owner_address)
+            .where(Payment.permit_nonce < permit_nonce)
+            .where(
+                Payment.state.in_((PaymentState.permit_submitted, PaymentState.permit_confirmed, PaymentState.transfer_submitted))
+                | ((Payment.state == PaymentState.signed) & queued & (Payment.deadline > int(datetime.now().timestamp())))
+            )
+            .limit(1)
+        ).first()
+        return earlier is not None
+
+def get_resumable_payment_ids(stale_seconds: float, limit: int = 20) -> list[str]:
+    """
+    Unfinished payments that nobody has advanced for stale_seconds and whose lease (if any) expired
+
+    A payment that was never queued for settlement may still be waiting for its signature
+    (created) or for the user to submit it (signed), so it only counts as stale once its permit
+    deadline has passed as well: the signature can no longer be used then.
+    """
+    with Session(engine) as session:
+        now = datetime.now()
+        queued = select(SettlementJob.job_id).where(SettlementJob.payment_id == Payment.payment_id).exists()
+        payment_ids = session.exec(
+            select(Payment.payment_id)
+            .where(Payment.state.not_in(TERMINAL_PAYMENT_STATES))
+            .where(Payment.updated_at < now - timedelta(seconds=stale_seconds))
+            .where(
+                Payment.state.not_in((PaymentState.created, PaymentState.signed))
+                | queued
+                | (Payment.deadline < int(now.timestamp()))
+            )
+            .where((Payment.lease_expires_at == None) | (Payment.lease_expires_at < now))
+            .order_by(Payment.updated_at)
+            .limit(limit)
+        ).all()
+        return [str(payment_id) for payment_id in payment_ids]
 
-        
\ No newline at end of file
+def count_unfinished_payments_by_spender(chain: str) -> dict[str, int]:
+    """Unfinished payments per relayer (lowercase spender address) of a chain, across all processes"""
+    with Session(engine) as session:
+        spender = func.lower(Payment.spender_address)
+        rows = session.exec(
+            select(spender, func.count())
+            .where(Payment.chain == chain)
+            .where(Payment.state.not_in(TERMINAL_PAYMENT_STATES))
+            .where(Payment.spender_address != None)
+            .group_by(spender)
+        ).all()
+        return {address: count for address, count in rows}
+
+def enqueue_settlement_job(payment_id: str, chain: str) -> dict[str, any]:
+    """Queue a payment for its chain's settlement workers (no-op while it is already queued or running)"""
+    with Session(engine) as session:
+        now = datetime.now()
+        job = session.exec(
+            select(SettlementJob).where(SettlementJob.payment_id == uuid.UUID(str(payment_id))).with_for_update()
+        ).first()
+        if job is None:
+            job = SettlementJob(payment_id=uuid.UUID(str(payment_id)), chain=chain, status=BatchStatus.pending,
+                                attempts=0, retries=0, available_at=now, created_at=now, updated_at=now)
+        elif job.status in (BatchStatus.done, BatchStatus.failed):
+            job.status = BatchStatus.pending
+            job.retries = 0
+            job.available_at = now
+            job.updated_at = now
+        else:
+            return job.model_dump(mode="json")
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        logger.info(f"Queued settlement job: {job.job_id} for payment: {payment_id} on chain: {chain}")
+        return job.model_dump(mode="json")
+
+def claim_settlement_jobs(chain: str, limit: int, lease_seconds: float) -> list[dict[str, any]]:
+    """Lock due jobs of a chain (and running jobs of crashed workers) and mark them running (safe with concurrent workers)"""
+    with Session(engine) as session:
+        now = datetime.now()
+        jobs = session.exec(
+            select(SettlementJob)
+            .where(SettlementJob.chain == chain)
+            .where(
+                ((SettlementJob.status == BatchStatus.pending) & (SettlementJob.available_at <= now))
+                | ((SettlementJob.status == BatchStatus.running) & (SettlementJob.locked_until < now))
+            )
+            .order_by(SettlementJob.available_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        results = []
+        for job in jobs:
+            job.status = BatchStatus.running
+            job.locked_until = now + timedelta(seconds=lease_seconds)
+            job.attempts += 1
+            job.updated_at = now
+            session.add(job)
+            results.append(job.model_dump(mode="json"))
+        session.commit()
+        if results:
+            logger.info(f"Claimed {len(results)} settlement jobs for chain: {chain}")
+        return results
+
+def update_settlement_job(job_id: str, **fields) -> dict[str, any]:
+    with Session(engine) as session:
+        job = session.get(SettlementJob, uuid.UUID(str(job_id)))
+        if not job:
+            logger.error(f"Settlement job not found: {job_id}")
+            return None
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job.model_dump(mode="json")
@@ -112,6 +112,16 @@ class AuditEventType(str, Enum):
     dispute_initiated = "dispute_initiated"
     policy_blocked = "policy_blocked"
 
+class PaymentState(str, Enum):
+    # 'created', 'signed', 'permit_submitted', 'permit_confirmed', 'transfer_submitted', 'confirmed', 'failed'
+    created = "created"
+    signed = "signed"
+    permit_submitted = "permit_submitted"
+    permit_confirmed = "permit_confirmed"
+    transfer_submitted = "transfer_submitted"
+    confirmed = "confirmed"
+    failed = "failed"
+
 class OrderItem(SQLModel, table=True):
     __tablename__ = "orders"
     orders_id: Optional[int] = Field(default=None, primary_key=True)
@@ -127,6 +137,59 @@ class OrderItem(SQLModel, table=True):
     created_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
     updated_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
 
+class Payment(SQLModel, table=True):
+    __tablename__ = "payment"
+    payment_id: Optional[uuid.UUID] = Field(
+        default=None,
+        primary_key=True,
+        sa_column_kwargs={
+            "pg_type": PG_UUID(as_uuid=True),
+            "server_default": "gen_random_uuid()"
+        }
+    )
+    session_id: str = Field(sa_column=Column(TEXT))
+    order_number: str = Field(default=None, sa_column=Column(VARCHAR(length=128)))
+    chain: str = Field(sa_column=Column(VARCHAR(length=50), nullable=False))
+    token: str = Field(sa_column=Column(VARCHAR(length=50), nullable=False))
+    owner_address: str = Field(sa_column=Column(VARCHAR(length=128), nullable=False))
+    spender_address: str = Field(default=None, sa_column=Column(VARCHAR(length=128)))
+    budget: Decimal = Field(default=Decimal(0), sa_column=Column(NUMERIC(precision=78, scale=0), nullable=False))
+    spend_amount: Decimal = Field(default=Decimal(0), sa_column=Column(NUMERIC(precision=78, scale=0), nullable=False))
+    deadline: int = Field(default=0, sa_column=Column(BIGINT))
+    state: Optional[PaymentState] = Field(sa_column=Column(PG_ENUM(PaymentState), default=PaymentState.created, nullable=False))
+    sign_info: Optional[dict] = Field(default=None, sa_column=Column(JSONB))
+    permit_nonce: Decimal = Field(default=None, sa_column=Column(NUMERIC(precision=78, scale=0)))
+    permit_tx_hash: str = Field(default=None, sa_column=Column(TEXT))
+    permit_relayer_nonce: int = Field(default=None, sa_column=Column(BIGINT))
+    transfer_tx_hash: str = Field(default=None, sa_column=Column(TEXT))
+    transfer_relayer_nonce: int = Field(default=None, sa_column=Column(BIGINT))
+    error_code: str = Field(default=None, sa_column=Column(TEXT))
+    error_message: str = Field(default=None, sa_column=Column(TEXT))
+    lease_expires_at: datetime = Field(default=None, sa_column=Column(TIMESTAMP(timezone=True)))
+    created_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
+    updated_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
+
+class SettlementJob(SQLModel, table=True):
+    __tablename__ = "settlement_job"
+    job_id: Optional[uuid.UUID] = Field(
+        default=None,
+        primary_key=True,
+        sa_column_kwargs={
+            "pg_type": PG_UUID(as_uuid=True),
+            "server_default": "gen_random_uuid()"
+        }
+    )
+    payment_id: uuid.UUID = Field(foreign_key="payment.payment_id")
+    chain: str = Field(sa_column=Column(VARCHAR(length=50), nullable=False))
+    status: Optional[BatchStatus] = Field(sa_column=Column(PG_ENUM(BatchStatus), default=BatchStatus.pending, nullable=False))
+    attempts: int = Field(default=0, nullable=False)
+    retries: int = Field(default=0, nullable=False)
+    available_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), nullable=False))
+    locked_until: datetime = Field(default=None, sa_column=Column(TIMESTAMP(timezone=True)))
+    last_error: str = Field(default=None, sa_column=Column(TEXT))
+    created_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
+    updated_at: datetime = Field(sa_column=Column(TIMESTAMP(timezone=True), default=datetime.now()))
+
 class SettlementBatch(SQLModel, table=True):
     __tablename__ = "settlement_batch"
     settlement_batch_id: Optional[uuid.UUID] = Field(
@@ -172,6 +235,7 @@ class SettlementDetail(SQLModel, table=True):
     intent_id: str = Field(sa_column=Column(TEXT))
     tx_hash: str = Field(sa_column=Column(TEXT))
     chain_id: str = Field(sa_column=Column(TEXT, nullable=False))
+    asset_id: str = Field(default=None, sa_column=Column(TEXT))
     payer_address: str = Field(sa_column=Column(VARCHAR(length=128)))
     payee_address: str = Field(sa_column=Column(VARCHAR(length=128)))
     gross_amount: Decimal = Field(sa_column=Column(NUMERIC(precision=78, scale=0), nullable=False, default=0))
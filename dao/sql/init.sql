@@ -64,6 +64,10 @@ DO $$ BEGIN
  'funds_released', 'transaction_failed', 'dispute_initiated', 'policy_blocked');
  EXCEPTION WHEN duplicate_object THEN NULL;
  END $$;
+DO $$ BEGIN 
+    CREATE TYPE payment_state_enum AS ENUM ('created', 'signed', 'permit_submitted', 'permit_confirmed', 'transfer_submitted', 'confirmed', 'failed');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
 
 CREATE TABLE orders (
     orders_id SERIAL PRIMARY KEY, -- SQLModel's default for primary_key=True and int
@@ -80,6 +84,52 @@ CREATE TABLE orders (
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+CREATE TABLE IF NOT EXISTS payment (
+    payment_id UUID PRIMARY KEY DEFAULT gen_random_uuid(), 
+    session_id TEXT, 
+    order_number VARCHAR (128), 
+    chain VARCHAR (50) NOT NULL, 
+    token VARCHAR (50) NOT NULL, 
+    owner_address VARCHAR (128) NOT NULL, 
+    spender_address VARCHAR (128), -- Relayer (EVM) or fee payer (Solana) named in the signature
+    budget NUMERIC (78, 0) NOT NULL DEFAULT 0, -- Permit value (Smallest unit)
+    spend_amount NUMERIC (78, 0) NOT NULL DEFAULT 0, -- Transfer amount (Smallest unit)
+    deadline BIGINT, 
+    state payment_state_enum NOT NULL DEFAULT 'created', 
+    sign_info JSONB, -- Permit signature (EVM) or partially signed transaction (Solana)
+    permit_nonce NUMERIC (78, 0), -- EIP-2612 nonce of the owner the permit was signed with
+    permit_tx_hash TEXT, 
+    permit_relayer_nonce BIGINT, -- Account nonce of the permit transaction
+    transfer_tx_hash TEXT, 
+    transfer_relayer_nonce BIGINT, -- Account nonce of the transferFrom transaction
+    error_code TEXT, 
+    error_message TEXT, 
+    lease_expires_at TIMESTAMPTZ, -- Set while a worker drives the payment
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), 
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE payment IS 'Payment State Machine: created -> signed -> permit_submitted -> permit_confirmed -> transfer_submitted -> confirmed/failed';
+CREATE INDEX IF NOT EXISTS idx_payment_state_updated ON payment (state, updated_at);
+CREATE INDEX IF NOT EXISTS idx_payment_session ON payment (session_id);
+CREATE INDEX IF NOT EXISTS idx_payment_order_number ON payment (order_number);
+
+CREATE TABLE IF NOT EXISTS settlement_job (
+    job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(), 
+    payment_id UUID NOT NULL REFERENCES payment (payment_id), 
+    chain VARCHAR (50) NOT NULL, -- Worker pool that settles the payment
+    status batch_status_enum NOT NULL DEFAULT 'pending', 
+    attempts INTEGER NOT NULL DEFAULT 0, -- Times a worker claimed the job
+    retries INTEGER NOT NULL DEFAULT 0, -- Transient step failures retried with backoff
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- Not claimed before (re-check delay of pending transactions)
+    locked_until TIMESTAMPTZ, -- Claim of a running job; reclaimed after this (crashed worker)
+    last_error TEXT, 
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), 
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE settlement_job IS 'Settlement Queue: payments waiting for a worker of their chain (claimed with FOR UPDATE SKIP LOCKED)';
+CREATE UNIQUE INDEX IF NOT EXISTS ux_settlement_job_payment ON settlement_job (payment_id);
+CREATE INDEX IF NOT EXISTS idx_settlement_job_claim ON settlement_job (chain, status, available_at);
+
 CREATE TABLE IF NOT EXISTS settlement_batch(
     settlement_batch_id UUID PRIMARY KEY DEFAULT gen_random_uuid(), 
     tenant_id TEXT NOT NULL, -- Tenant Identifier
@@ -125,6 +175,7 @@ CREATE TABLE IF NOT EXISTS settlement_detail (
     intent_id TEXT, -- Business Intent ID (Off-chain)
     tx_hash TEXT, -- On-chain Transaction Hash (nullable)
     chain_id TEXT NOT NULL, -- CAIP-2 
+    asset_id TEXT, -- CAIP-19 of the settled token (nullable)
     payer_address VARCHAR (128), 
     payee_address VARCHAR (128), 
     gross_amount NUMERIC (78, 0) NOT NULL DEFAULT 0, -- Gross Amount (Smallest unit)
@@ -148,6 +199,9 @@ CREATE INDEX IF NOT EXISTS idx_settlement_detail_batch ON settlement_detail(sett
 CREATE INDEX IF NOT EXISTS idx_settlement_detail_intent ON settlement_detail(intent_id);
 CREATE INDEX IF NOT EXISTS idx_settlement_detail_txhash ON settlement_detail(tx_hash);
 CREATE INDEX IF NOT EXISTS idx_settlement_detail_payee ON settlement_detail(payee_address);
+-- Batched payouts pay the ready details of one token at a time
+ALTER TABLE settlement_detail ADD COLUMN IF NOT EXISTS asset_id TEXT;
+CREATE INDEX IF NOT EXISTS idx_settlement_detail_chain_asset ON settlement_detail(chain_id, asset_id, settlement_status);
 
 
 CREATE TABLE IF NOT EXISTS payout_instruction (
@@ -170,7 +224,9 @@ CREATE TABLE IF NOT EXISTS payout_instruction (
 COMMENT ON TABLE payout_instruction IS 'Custodial Payout Instruction and Execution Record';
 CREATE INDEX IF NOT EXISTS idx_payout_instruction_batch ON payout_instruction (settlement_batch_id);
 CREATE INDEX IF NOT EXISTS idx_payout_instruction_chain_asset ON payout_instruction (chain_id, asset_id);
-CREATE UNIQUE INDEX IF NOT EXISTS ux_payout_instruction_txhash ON payout_instruction (chain_id, tx_hash) WHERE tx_hash IS NOT NULL;
+-- One batched payout transaction pays several payees, so a tx hash is shared by their instructions
+DROP INDEX IF EXISTS ux_payout_instruction_txhash;
+CREATE INDEX IF NOT EXISTS idx_payout_instruction_txhash ON payout_instruction (chain_id, tx_hash) WHERE tx_hash IS NOT NULL;
 
 CREATE TABLE IF NOT EXISTS merchant_account_balance (
     balance_id UUID PRIMARY KEY DEFAULT gen_random_uuid(), 
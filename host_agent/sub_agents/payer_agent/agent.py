@@ -153,7 +153,8 @@ async def create_payment(order_number: str, spend_amount: float, budget: float,
         "deadline": deadline,
         "network": chain,
         "token": currency,
-        "spend_amount": spend_amount
+        "spend_amount": spend_amount,
+        "order_number": order_number
     }
     if sign_info:
         payload.update(sign_info)
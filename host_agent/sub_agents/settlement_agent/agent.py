@@ -105,6 +105,15 @@ async def settle_payment(tool_context: ToolContext) -> dict[str, any]:
         if permit_transfer_result:
             tx_hash = permit_transfer_result["txHash"]
             is_success = permit_transfer_result["success"]
+            if permit_transfer_result.get("status") in ("queued", "pending"):
+                # Not confirmed yet: the settlement workers finish it, update the order and send the notification
+                return {
+                    "status": permit_transfer_result["status"],
+                    "message": f"Settlement for order number: {order_number} is {permit_transfer_result['status']}, the order is updated once it is confirmed on-chain."
+                }
+            if not is_success and permit_transfer_result.get("status") == "failed":
+                # Reverted on-chain: report it like any other settlement failure (not as SUCCESS below)
+                raise Exception(permit_transfer_result.get("message") or "Settlement transaction failed on-chain")
             event_type = None
             if is_success:
                 event_type = AuditEventType.transfer_completed
@@ -14,8 +14,18 @@ from typing import Annotated, Tuple
 
 import uvicorn
 import os
+import asyncio
 
 from services.order.order_service import get_order_item
+from services.non_custodial.payout_executor import start_payout_loops, stop_payout_loops
+from services.token_state_cache import TOKEN_CACHE_ENABLED, run_token_state_sync
+from services.non_custodial.transfer_handler import build_handlers, run_handler_health_checks, close_handlers
+from services.crypto_executor import shutdown_crypto_executor
+from services.solana_client_pool import close_solana_clients
+from services.solana_blockhash_cache import SOLANA_BLOCKHASH_CACHE_ENABLED, run_blockhash_refresh
+from services.solana_priority_fees import SOLANA_PRIORITY_FEES_ENABLED, run_priority_fee_refresh
+from services.gas_balance_monitor import GAS_MONITOR_ENABLED, run_gas_balance_monitor, get_gas_balances
+from task_manager.settlement_workers import start_settlement_pools, stop_settlement_pools, run_payment_resume_loop
 from uuid import uuid4
 
 load_dotenv()
@@ -56,7 +66,47 @@ async def lifespan(app: FastAPI):
     )
     shared_service = AppWideService(APP_NAME, session_service, runner)
     app.state.shared_service = shared_service
+    # Build the transfer handlers up front so the first payment on a chain does not pay the connection setup
+    non_custodial = os.getenv("SETTLEMENT_MODE") == "NONE_CUSTODIAL"
+    handler_health_task = None
+    gas_monitor_task = None
+    payment_resume_task = None
+    settlement_tasks = []
+    if non_custodial:
+        await build_handlers()
+        handler_health_task = asyncio.create_task(run_handler_health_checks())
+        # Relayer / fee payer gas balances (alerts, relayer routing) without per-payment RPC
+        gas_monitor_task = asyncio.create_task(run_gas_balance_monitor()) if GAS_MONITOR_ENABLED else None
+        # Per-chain settlement worker pools over the settlement_job queue
+        settlement_tasks = start_settlement_pools()
+        # Re-queue payments left unfinished by a previous process from their persisted state
+        payment_resume_task = asyncio.create_task(run_payment_resume_loop())
+    # Batched settlement payouts (PAYOUT_MODE=BATCH)
+    payout_tasks = start_payout_loops()
+    # Follow Approval/Transfer logs for the allowance/balance cache
+    token_sync_task = asyncio.create_task(run_token_state_sync()) if TOKEN_CACHE_ENABLED else None
+    # Keep a fresh recent blockhash per Solana cluster
+    blockhash_task = asyncio.create_task(run_blockhash_refresh()) if SOLANA_BLOCKHASH_CACHE_ENABLED else None
+    # Keep recent Solana priority fees per cluster
+    priority_fee_task = asyncio.create_task(run_priority_fee_refresh()) if SOLANA_PRIORITY_FEES_ENABLED else None
     yield {"shared_service": shared_service}
+    if payment_resume_task:
+        payment_resume_task.cancel()
+    await stop_settlement_pools(settlement_tasks)
+    if token_sync_task:
+        token_sync_task.cancel()
+    if blockhash_task:
+        blockhash_task.cancel()
+    if priority_fee_task:
+        priority_fee_task.cancel()
+    await stop_payout_loops(payout_tasks)
+    if gas_monitor_task:
+        gas_monitor_task.cancel()
+    if handler_health_task:
+        handler_health_task.cancel()
+        await close_handlers()
+    await close_solana_clients()
+    shutdown_crypto_executor()
     
 app = FastAPI(lifespan=lifespan)
 
@@ -175,6 +225,11 @@ async def get_order_status(request: Request):
             "message": f"None of status found by order number: {order_number_from_request} and user_id: {user_id_from_request}"
         }
     
+@app.get("/gas_balances")
+async def get_wallet_gas_balances():
+    """Cached native balances, thresholds and status of the relayer and fee-payer wallets"""
+    return {"enabled": GAS_MONITOR_ENABLED, "wallets": get_gas_balances()}
+
 if __name__ == "__main__":
     host = os.getenv("ZEN7_PAYMENT_SERVER_HOST")
     port = os.getenv("ZEN7_PAYMENT_SERVER_PORT")
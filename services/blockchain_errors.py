@@ -3,13 +3,14 @@ Blockchain-specific error codes for Zen7 Payment Agent.
 Based on actual errors from transfer_handler.py, execute_permit.py, and agent.py
 """
 
+import re
 from enum import Enum
 from typing import Optional, Dict, Any
 
 
 class BlockchainErrorCode(Enum):
     """
-    Blockchain transaction error codes (110014-110030)
+    Blockchain transaction error codes (110014-110031)
     Extends constants.py (110001-110013)
     """
     
@@ -41,6 +42,9 @@ class BlockchainErrorCode(Enum):
     
     # Simulation errors (110030)
     SIMULATION_FAILED = ("110030", "Transaction simulation failed.")
+    
+    # Submission errors (110031)
+    TRANSACTION_STATUS_UNKNOWN = ("110031", "Transaction may have been sent. Please check before retrying.")
 
     @property
     def code(self) -> str:
@@ -63,6 +67,18 @@ class BlockchainErrorClassifier:
     """Classify blockchain errors"""
     
     ERROR_PATTERNS = {
+        # Transient RPC errors (checked first: "context deadline exceeded" is not an expired permit)
+        "context deadline exceeded": BlockchainErrorCode.RPC_ERROR,
+        "too many requests": BlockchainErrorCode.RPC_ERROR,
+        "rate limit": BlockchainErrorCode.RPC_ERROR,
+        "502 server error": BlockchainErrorCode.RPC_ERROR,
+        "503 server error": BlockchainErrorCode.RPC_ERROR,
+        "504 server error": BlockchainErrorCode.RPC_ERROR,
+        "header not found": BlockchainErrorCode.RPC_ERROR,
+        "read timed out": BlockchainErrorCode.NETWORK_CONNECTION_FAILED,
+        "connection reset": BlockchainErrorCode.NETWORK_CONNECTION_FAILED,
+        "connection aborted": BlockchainErrorCode.NETWORK_CONNECTION_FAILED,
+        "max retries exceeded": BlockchainErrorCode.NETWORK_CONNECTION_FAILED,
         # Nonce
         "nonce too low": BlockchainErrorCode.NONCE_TOO_LOW,
         "nonce too high": BlockchainErrorCode.NONCE_TOO_HIGH,
@@ -113,6 +129,7 @@ class BlockchainErrorClassifier:
         # System errors
         BlockchainErrorCode.SIMULATION_FAILED: ErrorCategory.SYSTEM_ERROR,
         BlockchainErrorCode.TRANSACTION_REVERTED: ErrorCategory.SYSTEM_ERROR,
+        BlockchainErrorCode.TRANSACTION_STATUS_UNKNOWN: ErrorCategory.SYSTEM_ERROR,
     }
     
     @classmethod
@@ -126,6 +143,26 @@ class BlockchainErrorClassifier:
                 return error_code
         return None
     
+    @classmethod
+    def from_code(cls, code: str) -> Optional[BlockchainErrorCode]:
+        """Error code of a code string such as "110014" """
+        for error_code in BlockchainErrorCode:
+            if error_code.code == code:
+                return error_code
+        return None
+    
+    @classmethod
+    def classify_exception(cls, error_message: str) -> Optional[BlockchainErrorCode]:
+        """Classify a raised error: its "[110014] ..." code prefix when present, else the message patterns"""
+        if not error_message:
+            return None
+        match = re.search(r'\[(\d{6})\]', error_message)
+        if match:
+            error_code = cls.from_code(match.group(1))
+            if error_code:
+                return error_code
+        return cls.classify_error(error_message)
+    
     @classmethod
     def get_error_category(cls, error_code: BlockchainErrorCode) -> ErrorCategory:
         """Get error category"""
@@ -159,6 +196,14 @@ class BlockchainErrorClassifier:
             }
 
 
+class TransactionStatusUnknown(Exception):
+    """A send whose outcome is unknown (110031): the transaction tx_hash may still be mined"""
+
+    def __init__(self, tx_hash: str, error: str):
+        super().__init__(f"[{BlockchainErrorCode.TRANSACTION_STATUS_UNKNOWN.code}] Transaction {tx_hash} may have been sent: {error}")
+        self.tx_hash = tx_hash
+
+
 def create_error_response(error_message: str, additional_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Create standardized error response"""
     parsed_error = BlockchainErrorClassifier.parse_error(error_message)
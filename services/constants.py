@@ -39,6 +39,11 @@ AssetID = {
     "solana:EtWTRABZaYq6iMfeYKouRu166VU2xqa1": "solana:EtWTRABZaYq6iMfeYKouRu166VU2xqa1/slip44:501"
 }
 
+def get_token_asset_id(chain_id: str, token_address: str) -> str:
+    """CAIP-19 asset id of a token on a chain (ERC-20 contract or SPL mint)"""
+    namespace = "token" if chain_id.startswith("solana") else "erc20"
+    return f"{chain_id}/{namespace}:{token_address}"
+
 TokenDecimals = {
     "eip155:1": 6,
     "eip155:84532": 6,
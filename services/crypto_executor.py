@@ -0,0 +1,195 @@
+"""
+Crypto Executor (Off-Loop ECDSA / Ed25519 Work)
+
+Signing (sign_transaction, sign_message), signature recovery and Solana partial_sign are
+CPU-bound and used to run on the asyncio loop thread, adding loop lag under batch load.
+The executor moves them to a worker pool:
+
+- thread: ThreadPoolExecutor (default; also used for remote signers, which are I/O bound)
+- process: ProcessPoolExecutor; local keys and payloads are passed as plain bytes/dicts
+- inline: Run on the caller's thread (original behaviour, for debugging)
+
+Configuration (.env):
+- CRYPTO_EXECUTOR_MODE: thread (default), process or inline
+- CRYPTO_EXECUTOR_WORKERS: Pool size (default: CPU count)
+"""
+from log import logger
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_account.messages import SignableMessage
+
+# Load environment variables
+load_dotenv()
+
+CRYPTO_EXECUTOR_MODE = os.getenv("CRYPTO_EXECUTOR_MODE", "thread").lower()
+CRYPTO_EXECUTOR_WORKERS = int(os.getenv("CRYPTO_EXECUTOR_WORKERS", str(os.cpu_count() or 4)))
+
+
+# ==================== Worker Functions (picklable, run in the pool) ====================
+
+def _sign_transaction_with_key(private_key: bytes, transaction: Dict[str, Any]):
+    return Account.from_key(private_key).sign_transaction(transaction)
+
+
+def _sign_message_with_key(private_key: bytes, message: SignableMessage):
+    return Account.from_key(private_key).sign_message(message)
+
+
+def _recover_message(message: SignableMessage, vrs: tuple) -> str:
+    return Account.recover_message(message, vrs=vrs)
+
+
+def _partial_sign_solana(transaction_bytes: bytes, keypairs_bytes: List[bytes], recent_blockhash: str) -> bytes:
+    from solders.hash import Hash  # type: ignore
+    from solders.keypair import Keypair  # type: ignore
+    from solders.transaction import Transaction  # type: ignore
+
+    transaction = Transaction.from_bytes(transaction_bytes)
+    transaction.partial_sign([Keypair.from_bytes(key) for key in keypairs_bytes], Hash.from_string(recent_blockhash))
+    return bytes(transaction)
+
+
+def _sign_versioned_solana(message_bytes: bytes, keypairs_bytes: List[bytes]) -> bytes:
+    from solders.keypair import Keypair  # type: ignore
+    from solders.message import from_bytes_versioned  # type: ignore
+    from solders.transaction import VersionedTransaction  # type: ignore
+
+    message = from_bytes_versioned(message_bytes)
+    return bytes(VersionedTransaction(message, [Keypair.from_bytes(key) for key in keypairs_bytes]))
+
+
+# ==================== Executor ====================
+
+class CryptoExecutor:
+    """Runs signing and recovery off the event loop thread"""
+
+    def __init__(self, mode: str = CRYPTO_EXECUTOR_MODE, workers: int = CRYPTO_EXECUTOR_WORKERS):
+        """
+        Initialize the executor
+
+        Args:
+            mode: thread, process or inline
+            workers: Pool size
+        """
+        if mode not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown CRYPTO_EXECUTOR_MODE: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self, cpu_only: bool) -> Optional[Executor]:
+        """Process pool for pure-data crypto calls in process mode, thread pool otherwise (None = inline)"""
+        if self.mode == "inline":
+            return None
+        with self._lock:
+            if cpu_only and self.mode == "process":
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+                return self._process_pool
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crypto")
+            return self._thread_pool
+
+    async def run(self, fn: Callable, *args, cpu_only: bool = False, **kwargs):
+        """
+        Run a callable in the pool
+
+        Args:
+            fn: Callable (must be picklable with its arguments when cpu_only=True in process mode)
+            cpu_only: The call is pure CPU work on plain data and may go to the process pool
+        """
+        pool = self._pool(cpu_only)
+        if pool is None:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def sign_transaction(self, signer, transaction: Dict[str, Any]):
+        """Sign an EVM transaction with a signer (LocalSigner / RemoteSigner / LocalAccount)"""
+        private_key = getattr(signer, "private_key_bytes", None)
+        if self.mode == "process" and private_key:
+            return await self.run(_sign_transaction_with_key, private_key, dict(transaction), cpu_only=True)
+        return await self.run(signer.sign_transaction, transaction)
+
+    async def sign_message(self, signer, message: SignableMessage):
+        """Sign an EIP-191/712 message with a signer"""
+        private_key = getattr(signer, "private_key_bytes", None)
+        if self.mode == "process" and private_key:
+            return await self.run(_sign_message_with_key, private_key, message, cpu_only=True)
+        return await self.run(signer.sign_message, message)
+
+    async def recover_message(self, message: SignableMessage, vrs: tuple) -> str:
+        """Recover the signer address of an EIP-191/712 message"""
+        return await self.run(_recover_message, message, vrs, cpu_only=True)
+
+    async def partial_sign(self, transaction, keypairs: list, recent_blockhash):
+        """
+        Partially sign a Solana transaction
+
+        Returns:
+            The signed transaction (a new instance in process mode)
+        """
+        if self.mode == "process":
+            from solders.transaction import Transaction  # type: ignore
+
+            signed_bytes = await self.run(
+                _partial_sign_solana, bytes(transaction), [bytes(keypair) for keypair in keypairs],
+                str(recent_blockhash), cpu_only=True
+            )
+            return Transaction.from_bytes(signed_bytes)
+        await self.run(transaction.partial_sign, keypairs, recent_blockhash)
+        return transaction
+
+    async def sign_versioned(self, message, keypairs: list):
+        """
+        Sign a Solana v0 message with all of its signers
+
+        Returns:
+            The signed VersionedTransaction
+        """
+        from solders.transaction import VersionedTransaction  # type: ignore
+
+        if self.mode == "process":
+            from solders.message import to_bytes_versioned  # type: ignore
+
+            signed_bytes = await self.run(
+                _sign_versioned_solana, to_bytes_versioned(message), [bytes(keypair) for keypair in keypairs], cpu_only=True
+            )
+            return VersionedTransaction.from_bytes(signed_bytes)
+        return await self.run(VersionedTransaction, message, keypairs)
+
+    def shutdown(self):
+        with self._lock:
+            if self._thread_pool:
+                self._thread_pool.shutdown(wait=False)
+                self._thread_pool = None
+            if self._process_pool:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+
+
+_crypto_executor: Optional[CryptoExecutor] = None
+
+
+def get_crypto_executor() -> CryptoExecutor:
+    """Get the process-wide crypto executor"""
+    global _crypto_executor
+    if _crypto_executor is None:
+        _crypto_executor = CryptoExecutor()
+        logger.info(f"[Crypto] Executor mode: {_crypto_executor.mode}, workers: {_crypto_executor.workers}")
+    return _crypto_executor
+
+
+def shutdown_crypto_executor():
+    """Stop the worker pools (called on server shutdown)"""
+    global _crypto_executor
+    if _crypto_executor is not None:
+        _crypto_executor.shutdown()
+        _crypto_executor = None
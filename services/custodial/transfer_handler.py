@@ -2,7 +2,8 @@ from log import logger
 from services import CHAIN_ID, CHAIN_RPC_URL, USDC_ADDRESS
 import os
 from web3 import Web3
-from eth_account import Account
+from services.signer import SIGNER_BACKEND, create_signer
+from services.crypto_executor import get_crypto_executor
 from dotenv import load_dotenv
 import asyncio
 from typing import Dict, Any
@@ -127,13 +128,13 @@ class TransferHandler:
     def __init__(self):
         # Prioritize SPENDER_KEY, fall back to PRIVATE_KEY if not found
         self.private_key = os.getenv("SPENDER_KEY") or os.getenv("PAYER_PRIVATE_KEY")
-        if not self.private_key:
-            raise ValueError("SPENDER_KEY or PAYER_PRIVATE_KEY not configured")
-        
-        if not self.private_key.startswith("0x"):
+        if self.private_key and not self.private_key.startswith("0x"):
             self.private_key = f"0x{self.private_key}"
+        if not self.private_key and SIGNER_BACKEND == "local":
+            raise ValueError("SPENDER_KEY or PAYER_PRIVATE_KEY not configured")
         
-        self.account = Account.from_key(self.private_key)
+        # Local key or remote signer (SIGNER_BACKEND); remote signers sign for SPENDER_WALLET_ADDRESS
+        self.account = create_signer(self.private_key, address=os.getenv("SPENDER_WALLET_ADDRESS"))
         
         self.config = SEPOLIA_USDC_CONFIG
         logger.info(f"Connecting to Ethereum Sepolia Testnet: {self.config['rpc_url']}")
@@ -197,7 +198,7 @@ class TransferHandler:
             })
             
             # 4. Sign and send transaction (do not wait for confirmation)
-            signed_txn = self.account.sign_transaction(transfer_txn)
+            signed_txn = await get_crypto_executor().sign_transaction(self.account, transfer_txn)
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
             
             logger.info(f" TransferFrom transaction submitted: {tx_hash.hex()}")
@@ -350,7 +351,7 @@ class TransferHandler:
             logger.info(f"   Nonce: {permit_txn['nonce']}")
             
             # Sign and send transaction (do not wait for confirmation)
-            signed_txn = self.account.sign_transaction(permit_txn)
+            signed_txn = await get_crypto_executor().sign_transaction(self.account, permit_txn)
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
             
             logger.info(f" Permit transaction submitted: {tx_hash.hex()}")
@@ -4,8 +4,6 @@ from dotenv import load_dotenv
 import os
 
 from web3 import Web3
-from eth_account import Account
-from eth_account.messages import encode_typed_data
 
 load_dotenv()
 
@@ -17,6 +15,10 @@ SEPOLIA_USDC_ADDRESS = os.getenv("SEPOLIA_USDC_ADDRESS")
 SEPOLIA_DAI_ADDRESS = os.getenv("SEPOLIA_DAI_ADDRESS")
 
 from services.constants import ChainConfig
+from services.token_state_cache import get_token_state_cache
+from services.signer import SIGNER_BACKEND, create_signer
+from services.eip712 import build_domain_separator, build_permit_struct_hash, signable_message
+from services.permit_nonce_tracker import get_permit_nonce_tracker
 
 # Chain Configuration Dictionary
 CHAIN_CONFIGS = {
@@ -71,18 +73,18 @@ SPENDER = Web3.to_checksum_address(os.getenv("SPENDER_WALLET_ADDRESS"))
 # WARNING: Never use a real user's key here in production.
 OWNER_PRIVATE_KEY = os.getenv("OWNER_PK") or OWNER_PRIVATE_KEY
 
-# Validate private key format
-if not OWNER_PRIVATE_KEY:
-    raise ValueError("Private key not configured! Please set PAYER_PRIVATE_KEY or OWNER_PK environment variables")
-
-if not OWNER_PRIVATE_KEY.startswith("0x"):
-    OWNER_PRIVATE_KEY = "0x" + OWNER_PRIVATE_KEY
+# Validate private key format (a remote signer holds the key instead, see SIGNER_BACKEND)
+if OWNER_PRIVATE_KEY:
+    if not OWNER_PRIVATE_KEY.startswith("0x"):
+        OWNER_PRIVATE_KEY = "0x" + OWNER_PRIVATE_KEY
 
-# Validate private key length (64 hex characters + 0x prefix = 66 characters)
-if len(OWNER_PRIVATE_KEY) != 66:
-    raise ValueError(f"Invalid private key format! Length should be 66 characters, actual length is {len(OWNER_PRIVATE_KEY)} characters: {OWNER_PRIVATE_KEY}")
+    # Validate private key length (64 hex characters + 0x prefix = 66 characters)
+    if len(OWNER_PRIVATE_KEY) != 66:
+        raise ValueError(f"Invalid private key format! Length should be 66 characters, actual length is {len(OWNER_PRIVATE_KEY)} characters: {OWNER_PRIVATE_KEY}")
 
-logger.info(f"Using private key: {OWNER_PRIVATE_KEY[:10]}...{OWNER_PRIVATE_KEY[-10:]}")
+    logger.info(f"Using private key: {OWNER_PRIVATE_KEY[:10]}...{OWNER_PRIVATE_KEY[-10:]}")
+elif SIGNER_BACKEND == "local":
+    raise ValueError("Private key not configured! Please set PAYER_PRIVATE_KEY or OWNER_PK environment variables")
 
 def get_token_name_onchain(token_address: str, w3: Web3) -> str:
     """
@@ -138,9 +140,161 @@ def fetch_token_balance(owner_addr: str, token_address: str, w3: Web3) -> int:
     res = w3.eth.call({"to": token_address, "data": data}, "latest")
     return int(res.hex(), 16)  # smallest unit, 6 decimals for USDC
 
-from typing import Tuple
+from typing import Dict, Tuple, Optional
+import threading
+
+
+def budget_to_smallest_unit(budget: int) -> int:
+    """Mirror the UI's value scaling: display = USDC * 100000, on-chain smallest unit has 6 decimals"""
+    budget_ui = str(budget/10)  # example: your front-end "budget" string (scaled by 100000) - 0.01 USDC
+    scaled_budget = float(budget_ui) / 100000.0
+    return int(scaled_budget * 1_000_000)  # USDC has 6 decimals
 
-def sign(budget: int , deadline: int, network: str = "sepolia", token: str = "USDC") -> Tuple[str, str, str, int, int]:
+
+class SigningContext:
+    """
+    Everything needed to sign permits for one (network, token), built once and reused:
+    the Web3 provider, the owner account, the EIP-712 domain (with the on-chain name for DAI)
+    and its precomputed domain separator.
+    """
+
+    def __init__(self, network: str, token: str):
+        """
+        Build the signing context
+
+        Args:
+            network: Network name (sepolia, basesepolia, bnbtestnet)
+            token: Token symbol (USDC or DAI)
+        """
+        # Validate network support
+        if network not in CHAIN_CONFIGS:
+            raise ValueError(f"Unsupported network: {network}. Supported: {list(CHAIN_CONFIGS.keys())}")
+
+        chain_config = CHAIN_CONFIGS[network]
+
+        # Validate RPC URL configuration
+        if not chain_config["rpc_url"]:
+            raise ValueError(f"{network.upper()}_RPC_URL not configured. Please check .env")
+
+        # Validate token support on the network
+        if network not in TOKEN_CONFIGS:
+            raise ValueError(f"No token configuration for network: {network}")
+
+        if token not in TOKEN_CONFIGS[network]:
+            supported_tokens = list(TOKEN_CONFIGS[network].keys())
+            raise ValueError(f"Token {token} not supported on {network}. Supported: {supported_tokens}")
+
+        token_config = TOKEN_CONFIGS[network][token]
+        if not token_config["address"]:
+            raise ValueError(f"{token} address not configured for {network}. Please check .env")
+
+        self.network = network
+        self.token = token
+        self.chain_config = chain_config
+        self.chain_id = chain_config["chain_id"]
+        self.token_address = token_config["address"]
+        self.w3 = Web3(Web3.HTTPProvider(chain_config["rpc_url"]))
+        # Local key or remote signer (SIGNER_BACKEND); remote signers sign for OWNER_WALLET_ADDRESS
+        self.account = create_signer(OWNER_PRIVATE_KEY, address=os.getenv("OWNER_WALLET_ADDRESS"))
+        self.owner = self.account.address
+
+        token_name = token_config["name"]
+        # For DAI, prioritize the on-chain name (to avoid domain mismatch)
+        if token == "DAI":
+            onchain_name = get_token_name_onchain(self.token_address, self.w3)
+            if onchain_name:
+                token_name = onchain_name
+
+        self.domain = {
+            "name": token_name,
+            "version": token_config["version"],
+            "chainId": self.chain_id,  # Ensure it's an integer
+            "verifyingContract": self.token_address,
+        }
+        self.domain_separator = build_domain_separator(
+            token_name, token_config["version"], self.chain_id, self.token_address
+        )
+
+        # Optional sanity check (once per context instead of on every signature)
+        try:
+            if self.w3.eth.get_balance(self.owner) <= 0:
+                logger.warning(f"Warning: Owner has 0 {chain_config.get('native_currency', 'ETH')} for gas (only matters if sending a tx).")
+        except Exception as e:
+            logger.warning(f"Could not read owner native balance on {network}: {e}")
+
+        logger.info(f">>> Signing context ready - Network: {chain_config['name']}, Chain ID: {self.chain_id}, {token} Contract Address: {self.token_address}, Owner Address: {self.owner}")
+
+    def fetch_nonce(self, refresh: bool = False) -> int:
+        """Owner's permit nonce from the shared tracker (RPC only on first use or after a resync)"""
+        return get_permit_nonce_tracker().get(
+            self.chain_id, self.token_address, self.owner,
+            lambda: fetch_nonce(self.owner, self.token_address, self.w3),
+            refresh=refresh
+        )
+
+    def reserve_nonce(self, deadline: int) -> int:
+        """Next free permit nonce of the owner, taken for a permit with this deadline"""
+        return get_permit_nonce_tracker().reserve(
+            self.chain_id, self.token_address, self.owner,
+            lambda: fetch_nonce(self.owner, self.token_address, self.w3),
+            deadline
+        )
+
+    def release_nonces(self):
+        """Drop the reservations (a reserved nonce was not signed), the next one resyncs from the chain"""
+        get_permit_nonce_tracker().invalidate(self.chain_id, self.token_address, self.owner)
+
+    def sign_permit(self, value: int, deadline: int, nonce: int, spender: Optional[str] = None) -> Tuple[str, str, str, int]:
+        """
+        Sign a Permit (pure CPU, no RPC)
+
+        Args:
+            value: Allowance in the smallest unit
+            deadline: Expiration timestamp
+            nonce: Owner's permit nonce
+            spender: Relayer address (defaults to SPENDER_WALLET_ADDRESS)
+
+        Returns:
+            (signature, r, s, v) tuple
+        """
+        # ---------- Sign using eth-account (EIP-712 v4, fixed Permit struct fast path) ----------
+        struct_hash = build_permit_struct_hash(
+            self.owner,
+            spender or SPENDER,
+            to_uint256(value),
+            to_uint256(nonce),
+            to_uint256(deadline)
+        )
+        signed = self.account.sign_message(signable_message(self.domain_separator, struct_hash))
+
+        signature_hex = signed.signature.hex()
+        r_hex = "0x" + signed.r.to_bytes(32, "big").hex()
+        s_hex = "0x" + signed.s.to_bytes(32, "big").hex()
+        return signature_hex, r_hex, s_hex, signed.v  # v is usually 27 or 28
+
+
+_signing_contexts: Dict[Tuple[str, str], SigningContext] = {}
+_signing_contexts_lock = threading.Lock()
+
+
+def get_signing_context(network: str = "sepolia", token: str = "USDC") -> SigningContext:
+    """
+    Get (or build) the cached signing context of a (network, token)
+
+    Args:
+        network: Network name (sepolia, basesepolia, bnbtestnet)
+        token: Token symbol (USDC or DAI)
+    """
+    key = (network.lower(), token.upper())
+    with _signing_contexts_lock:
+        context = _signing_contexts.get(key)
+        if context is None:
+            context = SigningContext(*key)
+            _signing_contexts[key] = context
+        return context
+
+
+def sign(budget: int , deadline: int, network: str = "sepolia", token: str = "USDC", spender: str = None) -> Tuple[str, str, str, int, int]:
     """
     Generates the EIP-2612 Permit signature (multi-chain supported)
     
@@ -148,132 +302,29 @@ def sign(budget: int , deadline: int, network: str = "sepolia", token: str = "US
         deadline: Expiration timestamp
         network: Network name (sepolia or basesepolia)
         token: Token symbol (USDC or DAI)
+        spender: Relayer address that will call transferFrom (defaults to SPENDER_WALLET_ADDRESS)
         
     Returns:
-        (signature, r, s, v) tuple
+        (signature, r, s, v, nonce) tuple
     """
+    context = get_signing_context(network, token)
+    value_smallest = budget_to_smallest_unit(budget)
 
-    network = network.lower()
-    token = token.upper()
-
-    # Validate network support
-    if network not in CHAIN_CONFIGS:
-        raise ValueError(f"Unsupported network: {network}. Supported: {list(CHAIN_CONFIGS.keys())}")
-    
-    chain_config = CHAIN_CONFIGS[network]
-    CHAIN_ID = chain_config["chain_id"]
-    
-    # Validate RPC URL configuration
-    if not chain_config["rpc_url"]:
-        raise ValueError(f"{network.upper()}_RPC_URL not configured. Please check .env")
-    
-    # Create Web3 instance for the corresponding network
-    w3 = Web3(Web3.HTTPProvider(chain_config["rpc_url"]))
-    
-    # Validate token support on the network
-    if network not in TOKEN_CONFIGS:
-        raise ValueError(f"No token configuration for network: {network}")
-    
-    if token not in TOKEN_CONFIGS[network]:
-        supported_tokens = list(TOKEN_CONFIGS[network].keys())
-        raise ValueError(f"Token {token} not supported on {network}. Supported: {supported_tokens}")
-    
-    token_config = TOKEN_CONFIGS[network][token]
-    if not token_config["address"]:
-        raise ValueError(f"{token} address not configured for {network}. Please check .env")
-    
-    TOKEN_ADDRESS = token_config["address"]
-    TOKEN_NAME = token_config["name"]
-    TOKEN_VERSION = token_config["version"]
-    
-    # For DAI, prioritize the on-chain name (to avoid domain mismatch)
-    if token == "DAI":
-        onchain_name = get_token_name_onchain(TOKEN_ADDRESS, w3)
-        if onchain_name:
-            TOKEN_NAME = onchain_name
-
-    acct = Account.from_key(OWNER_PRIVATE_KEY)
-    OWNER = acct.address  # derived from private key
-
-    # UI-provided inputs
-    budget_ui = str(budget/10)  # example: your front-end "budget" string (scaled by 100000) - 0.01 USDC
-    
-    # deadline_iso = "2025-12-31T23:59:59"  # example ISO datetime from your UI
-
-    # ---------- Mirror your UI's value scaling ----------
-    # UI budget is a string of "display units" where display = USDC * 100000
-    # So on-chain smallest unit (6 decimals) is: floor((budget/100000) * 1e6)
-    scaled_budget = float(budget_ui) / 100000.0
-    value_smallest = int(scaled_budget * 1_000_000)  # USDC has 6 decimals
-
-    # Optional sanity checks (Dynamically display network information)
-    network_name = chain_config["name"]  # Get network name
-    native_currency = chain_config.get("native_currency", "ETH")
-    
-    # Print detailed network and contract information
-    logger.info(f">>> Checking Balance - Network: {network_name}, Chain ID: {CHAIN_ID}")
-    logger.info(f">>> {token} Contract Address: {TOKEN_ADDRESS}")
-    logger.info(f">>> Owner Address: {OWNER}")
-    
-    # Optional sanity checks similar to your JS:
-    balance_wei = w3.eth.get_balance(OWNER)
-    if balance_wei <= 0:
-        logger.warning(f"Warning: Owner has 0 {native_currency} for gas (only matters if sending a tx).")
-
-    token_balance = fetch_token_balance(OWNER, TOKEN_ADDRESS, w3)
+    # Balance is served by the log-fed token cache (no RPC while it is fresh)
+    token_balance = get_token_state_cache(context.network, context.token_address, context.w3).get_balance(context.owner)
     if token_balance < value_smallest:
         logger.warning(f"Warning: Insufficient USDC. Have {(token_balance/1e6):.2f}, need {(value_smallest/1e6):.2f}")
 
-    nonce = fetch_nonce(OWNER, TOKEN_ADDRESS, w3)
-
-    # current = datetime.now()
-    # updates = current + timedelta(seconds=expiry)     
-    # deadline = int(updates.timestamp())
-    # logger.info(f"deadline: {deadline}")
-    
-    # ---------- Build EIP-712 typed data ----------
-    domain = {
-        "name": TOKEN_NAME,
-        "version": TOKEN_VERSION,
-        "chainId": CHAIN_ID,  # Ensure it's an integer
-        "verifyingContract": TOKEN_ADDRESS,
-    }
-
-    types = {
-        "Permit": [
-            {"name": "owner", "type": "address"},
-            {"name": "spender", "type": "address"},
-            {"name": "value", "type": "uint256"},
-            {"name": "nonce", "type": "uint256"},
-            {"name": "deadline", "type": "uint256"},
-        ],
-    }
-
-    message = {
-        "owner": OWNER,
-        "spender": SPENDER,
-        "value": to_uint256(value_smallest),
-        "nonce": to_uint256(nonce),
-        "deadline": to_uint256(deadline),
-    }
-
-    # ---------- Sign using eth-account (EIP-712 v4) ----------
-    # Use the correct parameter format: pass domain, types, message separately
-    encoded = encode_typed_data(domain, types, message)
-    signed = acct.sign_message(encoded)
-
-    signature_hex = signed.signature.hex()
-    r_hex = "0x" + signed.r.to_bytes(32, "big").hex()
-    s_hex = "0x" + signed.s.to_bytes(32, "big").hex()
-    v_int = signed.v  # usually 27 or 28
+    # Reserved, so a second permit signed before this one confirms gets the next nonce
+    nonce = context.reserve_nonce(deadline)
+    try:
+        signature_hex, r_hex, s_hex, v_int = context.sign_permit(value_smallest, deadline, nonce, spender)
+    except Exception:
+        context.release_nonces()
+        raise
 
     logger.info(f"EIP-2612 Permit Signature: {signature_hex}")
     logger.info(f"r: {r_hex}")
     logger.info(f"s: {s_hex}")
     logger.info(f"v: {v_int}")
-
-    # Optional: verify recovery
-    recovered = Account.recover_message(encoded, signature=signature_hex)
-    assert recovered.lower() == OWNER.lower(), "Signature recover mismatch"
-    logger.info(f"Recovered signer: {recovered}")
-    return signature_hex, r_hex, s_hex, v_int, nonce
\ No newline at end of file
+    return signature_hex, r_hex, s_hex, v_int, nonce
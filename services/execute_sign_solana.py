@@ -20,6 +20,13 @@ from typing import Tuple, Optional
 
 # Assuming 'log' is configured for logging
 from log import logger
+from services.crypto_executor import get_crypto_executor
+from services.solana_client_pool import get_solana_client
+from services.solana_blockhash_cache import get_blockhash_cache
+from services.solana_ata_cache import get_ata_cache
+from services.solana_priority_fees import SOLANA_PRIORITY_FEE_URGENCY, get_priority_fee_oracle
+from services.solana_nonce_pool import get_nonce_pool
+from services.solana_delegation_tracker import get_delegation_tracker
 
 # Solana Dependencies
 try:
@@ -35,7 +42,9 @@ try:
         get_associated_token_address,
         transfer_checked,
         TransferCheckedParams,
-        create_associated_token_account,
+        create_idempotent_associated_token_account,
+        approve_checked,
+        ApproveCheckedParams,
     )
     from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID  # type: ignore
     # Re-import Message here as it's used explicitly below
@@ -85,10 +94,23 @@ if not FEE_PAYER_ADDRESS:
     raise ValueError("Fee Payer Address not configured! Please set FEE_PAYER_ADDRESS in the .env file.")
 
 
+def _load_payer_keypair() -> "Keypair":
+    """Payer Keypair from SOLANA_PAYER_PRIVATE_KEY (Base58 or hex)"""
+    try:
+        if len(PAYER_PRIVATE_KEY) == 88:  # Base58
+            return Keypair.from_base58_string(PAYER_PRIVATE_KEY)
+        key_hex = PAYER_PRIVATE_KEY[2:] if PAYER_PRIVATE_KEY.startswith('0x') else PAYER_PRIVATE_KEY
+        return Keypair.from_bytes(bytes.fromhex(key_hex))
+    except Exception as e:
+        raise ValueError(f"Invalid private key format: {e}")
+
+
 async def sign_solana_transfer(
     network: str = "solana-devnet",
     token: str = "USDC",
-    amount: int = 30000  # 0.03 USDC in smallest units
+    amount: int = 30000,  # 0.03 USDC in smallest units
+    urgency: str = SOLANA_PRIORITY_FEE_URGENCY,
+    durable: bool = False
 ) -> Tuple[str, str, str]:
     """
     Generates a partially signed Solana transfer transaction (Client-Side)
@@ -97,6 +119,8 @@ async def sign_solana_transfer(
         network: Network name (solana-devnet)
         token: Token symbol (USDC)
         amount: Transfer amount (in smallest units)
+        urgency: Priority fee tier (low, normal, high, urgent)
+        durable: Build on a durable nonce of the fee payer's nonce pool (pre-signed, does not expire)
         
     Returns:
         (base64_encoded_transaction, payer_address, payee_address)
@@ -114,19 +138,11 @@ async def sign_solana_transfer(
     chain_config = CHAIN_CONFIGS[network]
     token_config = TOKEN_CONFIGS[network][token]
     
-    # Create Solana client
-    client = AsyncClient(chain_config["rpc_url"], commitment=Confirmed)
+    # Shared pooled Solana client (kept open across calls)
+    client = get_solana_client(chain_config["rpc_url"])
     
     # Load Payer Keypair (Client-side)
-    try:
-        if len(PAYER_PRIVATE_KEY) == 88:  # Base58
-            payer_keypair = Keypair.from_base58_string(PAYER_PRIVATE_KEY)
-        else:
-            key_hex = PAYER_PRIVATE_KEY[2:] if PAYER_PRIVATE_KEY.startswith('0x') else PAYER_PRIVATE_KEY
-            key_bytes = bytes.fromhex(key_hex)
-            payer_keypair = Keypair.from_bytes(key_bytes)
-    except Exception as e:
-        raise ValueError(f"Invalid private key format: {e}")
+    payer_keypair = _load_payer_keypair()
     
     payer_pubkey = payer_keypair.pubkey()
     
@@ -176,35 +192,27 @@ async def sign_solana_transfer(
     except Exception as e:
         logger.warning(f"Warning: Failed to query {token} balance: {e}")
     
-    # Get the latest blockhash
-    blockhash_response = await client.get_latest_blockhash()
-    recent_blockhash = blockhash_response.value.blockhash
+    # Recent blockhash from the background-refreshed cache (no RPC while it is fresh)
+    recent_blockhash, _ = await get_blockhash_cache(chain_config["rpc_url"]).get_blockhash()
     
-    # Check if the payee's Token Account exists
+    # Check if the payee's Token Account exists (cached per payee/mint, no RPC for repeat payees)
     instructions = []
-    try:
-        payee_account_info = await client.get_account_info(payee_token_account)
-        if not payee_account_info.value:
-            logger.warning(f">>> Payee's {token} Token Account does not exist, will create automatically")
-            # Create Associated Token Account instruction
-            create_ata_ix = create_associated_token_account(
-                payer=fee_payer_pubkey,  # Fee Payer pays the creation fee (SOL rent)
-                owner=payee_pubkey,      # Owner of the Token Account
-                mint=token_mint          # Token Mint Address
-            )
-            instructions.append(create_ata_ix)
-            logger.info(f">>> Added Create Token Account instruction (Fee Payer will cover the cost)")
+    payee_ata_exists = await get_ata_cache(chain_config["rpc_url"]).exists(payee_pubkey, token_mint, payee_token_account)
+    if payee_ata_exists:
+        logger.info(f">>> Payee's {token} Token Account already exists")
+    else:
+        if payee_ata_exists is None:
+            logger.warning(f"Warning: Cannot check Payee Token Account, adding an idempotent create instruction")
         else:
-            logger.info(f">>> Payee's {token} Token Account already exists")
-    except Exception as e:
-        logger.warning(f"Warning: Cannot check Payee Token Account, attempting to create anyway: {e}")
-        # If unable to confirm, add the creation instruction (it will be skipped if it exists)
-        create_ata_ix = create_associated_token_account(
-            payer=fee_payer_pubkey,
-            owner=payee_pubkey,
-            mint=token_mint
+            logger.warning(f">>> Payee's {token} Token Account does not exist, will create automatically")
+        # Idempotent create: succeeds as a no-op if the account was created in the meantime
+        create_ata_ix = create_idempotent_associated_token_account(
+            payer=fee_payer_pubkey,  # Fee Payer pays the creation fee (SOL rent)
+            owner=payee_pubkey,      # Owner of the Token Account
+            mint=token_mint          # Token Mint Address
         )
         instructions.append(create_ata_ix)
+        logger.info(f">>> Added Create Token Account instruction (Fee Payer will cover the cost)")
     
     # Build SPL Token Transfer Instruction (Transfer to Payee)
     transfer_ix = transfer_checked(
@@ -220,12 +228,27 @@ async def sign_solana_transfer(
     )
     instructions.append(transfer_ix)
     
-    # Build the Transaction Message (fee_payer set to the backend address)
-    message = Message.new_with_blockhash(
-        instructions,      # May contain Create Token Account + Transfer instructions
-        fee_payer_pubkey,  # Specify backend as the Fee Payer (pays gas)
-        recent_blockhash
+    # Prepend SetComputeUnitLimit / SetComputeUnitPrice for the requested urgency tier
+    compute_budget_ixs = await get_priority_fee_oracle(chain_config["rpc_url"]).compute_budget_instructions(
+        instructions, fee_payer_pubkey, recent_blockhash, urgency
     )
+    instructions = compute_budget_ixs + instructions
+    
+    if durable:
+        # Durable nonce: AdvanceNonceAccount (authority = fee payer) first, the stored nonce replaces the blockhash
+        nonce_account, nonce = await get_nonce_pool(chain_config["rpc_url"], FEE_PAYER_ADDRESS).reserve(str(payer_pubkey))
+        recent_blockhash = Hash.from_string(nonce)
+        message = Message.new_with_nonce(
+            instructions, fee_payer_pubkey, Pubkey.from_string(nonce_account), fee_payer_pubkey
+        )
+        logger.info(f">>> Using durable nonce account {nonce_account} (transaction does not expire until it is used)")
+    else:
+        # Build the Transaction Message (fee_payer set to the backend address)
+        message = Message.new_with_blockhash(
+            instructions,      # May contain Create Token Account + Transfer instructions
+            fee_payer_pubkey,  # Specify backend as the Fee Payer (pays gas)
+            recent_blockhash
+        )
     
     # Create the transaction (do not pass signers to prevent immediate full signing)
     transaction = Transaction.new_unsigned(message)
@@ -233,15 +256,12 @@ async def sign_solana_transfer(
     # Payer partially signs (only signs the SPL Token transfer authorization part)
     # Note: partial_sign needs all required signers (payer and fee_payer) listed in the message.
     # The payer_keypair is one of the required signers for the SPL transfer.
-    transaction.partial_sign([payer_keypair], recent_blockhash)
+    transaction = await get_crypto_executor().partial_sign(transaction, [payer_keypair], recent_blockhash)
     
     # Serialize to Base64
     tx_bytes = bytes(transaction)
     tx_base64 = base64.b64encode(tx_bytes).decode('utf-8')
     
-    # Close client
-    await client.close()
-    
     # Output the required parameters for the backend execute_permit function
     logger.info("=" * 80)
     logger.info(f">>> Copy the following parameters to the test data in execute_permit.py ({network}/{token}):")
@@ -258,4 +278,71 @@ async def sign_solana_transfer(
     logger.info(f">>> Transaction Size: {len(tx_bytes)} bytes")
     logger.info("=" * 80)
     
-    return tx_base64, str(payer_pubkey), str(payee_pubkey)
\ No newline at end of file
+    return tx_base64, str(payer_pubkey), str(payee_pubkey)
+
+
+async def sign_solana_approve(
+    network: str = "solana-devnet",
+    token: str = "USDC",
+    budget: int = 1000000,
+    required: Optional[int] = None
+) -> Tuple[Optional[str], str, str]:
+    """
+    Generates a partially signed SPL approve_checked of a budget to the fee payer (delegate mode)
+    
+    One approval covers many payments: the backend pulls each payment as delegate. No new
+    signature is produced while the tracked delegation still covers the next payment.
+    
+    Args:
+        network: Network name (solana-devnet)
+        token: Token symbol (USDC)
+        budget: Amount to delegate (in smallest units)
+        required: Amount the next payment needs (defaults to the budget)
+        
+    Returns:
+        (base64_encoded_transaction or None if the delegation suffices, payer_address, fee_payer_address)
+    """
+    network = network.lower()
+    token = token.upper()
+    if network not in CHAIN_CONFIGS:
+        raise ValueError(f"Unsupported network: {network}")
+    if network not in TOKEN_CONFIGS or token not in TOKEN_CONFIGS[network]:
+        raise ValueError(f"Token {token} not supported on {network}")
+    
+    chain_config = CHAIN_CONFIGS[network]
+    token_config = TOKEN_CONFIGS[network][token]
+    
+    payer_keypair = _load_payer_keypair()
+    payer_pubkey = payer_keypair.pubkey()
+    fee_payer_pubkey = Pubkey.from_string(FEE_PAYER_ADDRESS)
+    token_mint = Pubkey.from_string(token_config["mint_address"])
+    payer_token_account = get_associated_token_address(payer_pubkey, token_mint)
+    
+    # Skip the signature while the existing delegation covers the payment
+    remaining = await get_delegation_tracker(chain_config["rpc_url"], FEE_PAYER_ADDRESS).remaining(
+        payer_pubkey, token_mint, payer_token_account
+    )
+    if remaining >= (required if required is not None else budget):
+        logger.info(f">>> Existing delegation of {remaining} covers the payment, no new approval needed")
+        return None, str(payer_pubkey), str(fee_payer_pubkey)
+    
+    approve_ix = approve_checked(
+        ApproveCheckedParams(
+            program_id=TOKEN_PROGRAM_ID,
+            source=payer_token_account,
+            mint=token_mint,
+            delegate=fee_payer_pubkey,  # The backend pulls payments as delegate
+            owner=payer_pubkey,
+            amount=budget,
+            decimals=token_config['decimals']
+        )
+    )
+    recent_blockhash, _ = await get_blockhash_cache(chain_config["rpc_url"]).get_blockhash()
+    instructions = await get_priority_fee_oracle(chain_config["rpc_url"]).compute_budget_instructions(
+        [approve_ix], fee_payer_pubkey, recent_blockhash
+    ) + [approve_ix]
+    transaction = Transaction.new_unsigned(Message.new_with_blockhash(instructions, fee_payer_pubkey, recent_blockhash))
+    transaction = await get_crypto_executor().partial_sign(transaction, [payer_keypair], recent_blockhash)
+    
+    logger.info(f">>> Approve {budget / (10 ** token_config['decimals'])} {token} to delegate {str(fee_payer_pubkey)}")
+    return base64.b64encode(bytes(transaction)).decode('utf-8'), str(payer_pubkey), str(fee_payer_pubkey)
@@ -0,0 +1,233 @@
+"""
+Gas Balance Monitor for Relayer and Fee-Payer Wallets
+
+The EVM relayers and the Solana fee payer pay the gas of every settlement. Their native
+balances are refreshed per chain in the background instead of being read on every payment:
+
+- Cache: last balance, read time and status of every wallet, served to the permit pre-flight
+  (execute_permit.py) and exposed by GET /gas_balances together with the thresholds
+- Routing: EVM balances are fed to the relayer pool, which stops assigning new payments to a
+  relayer below RELAYER_MIN_GAS_BALANCE (see relayer_pool.py)
+- Alerts: a wallet changing status (ok / low / critical) is logged and, with GAS_ALERT_URL,
+  posted to a webhook; refresh counts, errors and RPC latency are kept per wallet as metrics
+
+Wallets are taken from the cached transfer handlers, one refresh per chain.
+
+Configuration (.env):
+- GAS_MONITOR_ENABLED: true (default) / false to read the spender balance per payment again
+- GAS_MONITOR_INTERVAL_SECONDS: Refresh interval (default: 30)
+- GAS_MONITOR_TIMEOUT_SECONDS: Timeout of one chain's refresh (default: 10)
+- GAS_MONITOR_MAX_STALENESS_SECONDS: Older balances are not served from the cache (default: 3x the interval)
+- RELAYER_LOW_GAS_BALANCE: Relayer balance (ETH/BNB) reported as low (default: 0.01)
+- RELAYER_MIN_GAS_BALANCE: Relayer balance reported as critical, no new payments are assigned below it (default: 0.0001)
+- SOLANA_FEE_PAYER_LOW_BALANCE / SOLANA_FEE_PAYER_MIN_BALANCE: Same levels for the fee payer in SOL (default: 0.05 / 0.005)
+- GAS_ALERT_URL: Webhook receiving status changes as {"chain", "address", "role", "balance", "status", "previous_status"} (optional)
+"""
+from log import logger
+import os
+import time
+import asyncio
+import threading
+import requests
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from services.non_custodial.relayer_pool import DEFAULT_MIN_GAS_BALANCE
+from services.non_custodial.transfer_handler import get_cached_handlers
+
+# Load environment variables
+load_dotenv()
+
+GAS_MONITOR_ENABLED = os.getenv("GAS_MONITOR_ENABLED", "true").lower() == "true"
+GAS_MONITOR_INTERVAL_SECONDS = float(os.getenv("GAS_MONITOR_INTERVAL_SECONDS", "30"))
+GAS_MONITOR_TIMEOUT_SECONDS = float(os.getenv("GAS_MONITOR_TIMEOUT_SECONDS", "10"))
+GAS_MONITOR_MAX_STALENESS_SECONDS = float(os.getenv("GAS_MONITOR_MAX_STALENESS_SECONDS", str(GAS_MONITOR_INTERVAL_SECONDS * 3)))
+RELAYER_LOW_GAS_BALANCE = float(os.getenv("RELAYER_LOW_GAS_BALANCE", "0.01"))
+SOLANA_FEE_PAYER_LOW_BALANCE = float(os.getenv("SOLANA_FEE_PAYER_LOW_BALANCE", "0.05"))
+SOLANA_FEE_PAYER_MIN_BALANCE = float(os.getenv("SOLANA_FEE_PAYER_MIN_BALANCE", "0.005"))
+GAS_ALERT_URL = os.getenv("GAS_ALERT_URL")
+
+STATUS_UNKNOWN = "unknown"
+STATUS_OK = "ok"
+STATUS_LOW = "low"
+STATUS_CRITICAL = "critical"
+
+
+class WalletBalance:
+    """Cached native balance of one gas-paying wallet"""
+
+    def __init__(self, network: str, address: str, role: str, low_balance: float, min_balance: float):
+        """
+        Initialize the cache entry
+
+        Args:
+            network: Network name
+            address: Wallet address
+            role: "relayer" (EVM) or "fee_payer" (Solana)
+            low_balance: Below this balance the wallet is reported low
+            min_balance: Below this balance the wallet is reported critical
+        """
+        self.network = network
+        self.address = address
+        self.role = role
+        self.low_balance = low_balance
+        self.min_balance = min_balance
+        self.balance: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self.status = STATUS_UNKNOWN
+        # Metrics
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+
+    def classify(self, balance: float) -> str:
+        if balance < self.min_balance:
+            return STATUS_CRITICAL
+        if balance < self.low_balance:
+            return STATUS_LOW
+        return STATUS_OK
+
+    def is_fresh(self) -> bool:
+        return self.updated_at is not None and time.time() - self.updated_at <= GAS_MONITOR_MAX_STALENESS_SECONDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chain": self.network,
+            "address": self.address,
+            "role": self.role,
+            "balance": self.balance,
+            "status": self.status,
+            "fresh": self.is_fresh(),
+            "updated_at": self.updated_at,
+            "low_balance": self.low_balance,
+            "min_balance": self.min_balance,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "latency_ms": self.latency_ms,
+        }
+
+
+# ==================== Global Balance Cache ====================
+
+_wallets: Dict[tuple, WalletBalance] = {}
+_wallets_lock = threading.Lock()
+
+
+def _wallet(network: str, address: str) -> WalletBalance:
+    key = (network, address.lower())
+    with _wallets_lock:
+        wallet = _wallets.get(key)
+        if wallet is None:
+            if network.startswith("solana"):
+                wallet = WalletBalance(network, address, "fee_payer", SOLANA_FEE_PAYER_LOW_BALANCE, SOLANA_FEE_PAYER_MIN_BALANCE)
+            else:
+                wallet = WalletBalance(network, address, "relayer", RELAYER_LOW_GAS_BALANCE, DEFAULT_MIN_GAS_BALANCE)
+            _wallets[key] = wallet
+        return wallet
+
+
+def get_cached_gas_balance(network: str, address: str) -> Optional[float]:
+    """
+    Native balance of a wallet from the monitor's cache
+
+    Args:
+        network: Network name
+        address: Wallet address
+
+    Returns:
+        The balance, or None if the monitor is disabled or has no fresh value for the wallet
+    """
+    if not GAS_MONITOR_ENABLED or not address:
+        return None
+    with _wallets_lock:
+        wallet = _wallets.get((network.lower(), address.lower()))
+    if wallet is None or not wallet.is_fresh():
+        return None
+    return wallet.balance
+
+
+def get_gas_balances() -> List[Dict[str, Any]]:
+    """Snapshot of every monitored wallet (balance, status, thresholds and refresh metrics)"""
+    with _wallets_lock:
+        wallets = list(_wallets.values())
+    return [wallet.to_dict() for wallet in wallets]
+
+
+def _send_alert(payload: Dict[str, Any]):
+    try:
+        res = requests.post(GAS_ALERT_URL, json=payload, timeout=10)
+        logger.info(f"[Gas] Sent gas balance alert to {GAS_ALERT_URL} with status code: {res.status_code}")
+    except Exception as e:
+        logger.warning(f"[Gas] Failed to send gas balance alert to {GAS_ALERT_URL}: {e}")
+
+
+async def _update(wallet: WalletBalance, balance: float, latency_ms: float):
+    previous_status = wallet.status
+    wallet.balance = balance
+    wallet.updated_at = time.time()
+    wallet.latency_ms = latency_ms
+    wallet.refreshes += 1
+    wallet.last_error = None
+    wallet.status = wallet.classify(balance)
+    if wallet.status == previous_status:
+        return
+
+    message = f"[Gas] {wallet.role} {wallet.address} on {wallet.network}: {previous_status} -> {wallet.status} (balance: {balance})"
+    if wallet.status == STATUS_CRITICAL:
+        routing = "; no new payments are routed to it" if wallet.role == "relayer" else ""
+        logger.error(f"{message}, below {wallet.min_balance}{routing}")
+    elif wallet.status == STATUS_LOW:
+        logger.warning(f"{message}, below {wallet.low_balance}; top it up")
+    else:
+        logger.info(message)
+    # A healthy wallet seen for the first time is not worth an alert
+    if GAS_ALERT_URL and not (previous_status == STATUS_UNKNOWN and wallet.status == STATUS_OK):
+        await asyncio.to_thread(_send_alert, {
+            "chain": wallet.network,
+            "address": wallet.address,
+            "role": wallet.role,
+            "balance": balance,
+            "status": wallet.status,
+            "previous_status": previous_status,
+        })
+
+
+async def _refresh_network(network: str, handler):
+    started = time.perf_counter()
+    try:
+        balances = await asyncio.wait_for(handler.get_gas_balances(), GAS_MONITOR_TIMEOUT_SECONDS)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        with _wallets_lock:
+            wallets = [wallet for wallet in _wallets.values() if wallet.network == network]
+        for wallet in wallets:
+            wallet.errors += 1
+            wallet.last_error = error
+        logger.warning(f"[Gas] Balance refresh failed for {network}: {error}")
+        return
+    latency_ms = (time.perf_counter() - started) * 1000
+    for address, balance in balances.items():
+        await _update(_wallet(network, address), balance, latency_ms)
+
+
+async def refresh_gas_balances():
+    """Refresh the gas balances of every chain with a cached handler (one handler per chain, concurrently)"""
+    handlers = {}
+    for handler in get_cached_handlers():
+        handlers.setdefault(handler.network.lower(), handler)
+    await asyncio.gather(*[_refresh_network(network, handler) for network, handler in handlers.items()])
+
+
+async def run_gas_balance_monitor(interval_seconds: float = GAS_MONITOR_INTERVAL_SECONDS):
+    """Background loop refreshing the relayer and fee-payer balances (started in the FastAPI lifespan)"""
+    logger.info(f"[Gas] Gas balance monitor started (interval: {interval_seconds}s)")
+    while True:
+        try:
+            await refresh_gas_balances()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Gas] Gas balance refresh round failed: {e}")
+        await asyncio.sleep(interval_seconds)
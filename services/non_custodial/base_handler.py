@@ -8,8 +8,9 @@ Supported Protocols:
 Design Pattern: Abstract Base Class + Factory Pattern
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 class BaseTransferHandler(ABC):
@@ -121,12 +122,13 @@ class BaseTransferHandler(ABC):
         pass
     
     @abstractmethod
-    async def check_allowance(self, owner_address: str) -> Dict[str, Any]:
+    async def check_allowance(self, owner_address: str, spender: str = None) -> Dict[str, Any]:
         """
         Check the allowance amount
         
         Args:
             owner_address: Authorizer's address
+            spender: Spender/relayer address (defaults to the handler's default spender)
             
         Returns:
             {
@@ -152,6 +154,80 @@ class BaseTransferHandler(ABC):
         """
         pass
     
+    # Optional: Local permit pre-validation (protocols without it accept everything here)
+    def validate_permit(self, owner: str, spender: str, value: int, deadline: int, **kwargs) -> Dict[str, Any]:
+        """
+        Validate a permit locally before any RPC simulation or submission
+        
+        Returns:
+            {"success": bool, "error": str, "error_code": str, "message": str}
+        """
+        return {"success": True, "skipped": True}
+    
+    def mark_permit_used(self, owner: str, spender: str = None, value: int = None):
+        """Record that a permit of the owner was confirmed (advances cached permit nonces and allowances)"""
+        pass
+    
+    def resync_permit_nonce(self, owner: str, error_message: str) -> bool:
+        """Drop the owner's cached permit nonce if the error indicates it is stale"""
+        return False
+    
+    async def wait_for_transaction(self, tx_hash: str, timeout: float, interval_seconds: float = 2) -> Optional[Dict[str, Any]]:
+        """
+        Wait until a transaction is confirmed or failed
+        
+        Args:
+            tx_hash: Transaction hash (EVM) or signature (Solana)
+            timeout: Max seconds to wait
+            interval_seconds: Polling interval (default implementation)
+            
+        Returns:
+            The confirmed/failed status dict (see get_transaction_status), or None on timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                poll = await self.get_transaction_status(tx_hash)
+                if poll.get("status") == "confirmed" and poll.get("success"):
+                    return poll
+                if poll.get("status") == "failed" and not poll.get("success"):
+                    return poll
+            except Exception:
+                pass  # Ignore exceptions during polling, just wait and retry
+            if loop.time() + interval_seconds > deadline:
+                return None
+            await asyncio.sleep(interval_seconds)
+    
+    # Optional: Lifecycle hooks used by the handler registry
+    async def warm_up(self):
+        """Prepare on-chain resources after the handler is built (e.g. nonce accounts)"""
+        pass
+    
+    async def health_check(self) -> bool:
+        """
+        Check that the handler's RPC connection is usable
+        
+        Returns:
+            True if healthy (unhealthy handlers are re-created by the registry)
+        """
+        return True
+    
+    async def get_gas_balances(self) -> Dict[str, float]:
+        """
+        Read the native balances of the wallets paying this handler's gas (relayers / fee payer)
+        
+        Used by the background gas balance monitor; raises on RPC errors.
+        
+        Returns:
+            {address: balance (ETH/BNB/SOL)}
+        """
+        return {}
+    
+    async def close(self):
+        """Release RPC clients held by the handler"""
+        pass
+    
     # Optional: Public helper method
     def get_protocol_type(self) -> str:
         """
@@ -12,15 +12,34 @@ Supported Protocols:
 """
 from log import logger
 import os
+import asyncio
 from web3 import Web3
-from eth_account import Account
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 from services.non_custodial.base_handler import BaseTransferHandler
+from services.non_custodial.relayer_pool import Relayer, get_relayer_pool
+from services.non_custodial.permit_validator import PermitValidator
+from services.token_state_cache import get_token_state_cache
+from services.crypto_executor import get_crypto_executor
+from services.blockchain_errors import BlockchainErrorCode, TransactionStatusUnknown
+from services.retry_policy import classify, retry_async
 
 # Load environment variables
 load_dotenv()
 
+# Send errors after which the node certainly rejected the transaction: sign a new one
+RESIGN_ERRORS = (
+    BlockchainErrorCode.NONCE_TOO_LOW,
+    BlockchainErrorCode.NONCE_TOO_HIGH,
+    BlockchainErrorCode.GAS_PRICE_TOO_LOW,
+)
+# Send errors that leave open whether the node accepted the transaction (None: unclassified)
+SEND_OUTCOME_UNKNOWN_ERRORS = (
+    None,
+    BlockchainErrorCode.RPC_ERROR,
+    BlockchainErrorCode.NETWORK_CONNECTION_FAILED,
+)
+
 # ==================== EVM Multi-Chain Configuration ====================
 
 # Chain configuration dictionary
@@ -30,21 +49,24 @@ CHAIN_CONFIGS = {
         "chain_id": 11155111,  # Ethereum Sepolia testnet
         "rpc_url": os.getenv("SEPOLIA_RPC_URL"),
         "name": "Sepolia",
-        "native_currency": "ETH"
+        "native_currency": "ETH",
+        "block_time": 12  # Seconds per block
     },
     "basesepolia": {
         "protocol": "evm",
         "chain_id": 84532,  # Base Sepolia testnet
         "rpc_url": os.getenv("BASE_SEPOLIA_RPC_URL"),
         "name": "Base Sepolia",
-        "native_currency": "ETH"
+        "native_currency": "ETH",
+        "block_time": 2  # Seconds per block
     },
     "bnbtestnet": {
         "protocol": "evm",
         "chain_id": 97,  # BNB Chain Testnet
         "rpc_url": os.getenv("BNBChain_Testnet_RPC_URL"),
         "name": "BNB Chain Testnet",
-        "native_currency": "BNB"
+        "native_currency": "BNB",
+        "block_time": 3  # Seconds per block
     }
 }
 
@@ -233,15 +255,9 @@ class EVMTransferHandler(BaseTransferHandler):
             env_var = f"{network.upper()}_{token}_ADDRESS"
             raise ValueError(f"{token} address not configured for {network}. Please set {env_var} in .env")
         
-        # Prioritize SPENDER_KEY, otherwise use PRIVATE_KEY
-        self.private_key = os.getenv("SPENDER_KEY") or os.getenv("PRIVATE_KEY")
-        if not self.private_key:
-            raise ValueError("SPENDER_KEY or PRIVATE_KEY not configured")
-        
-        if not self.private_key.startswith("0x"):
-            self.private_key = f"0x{self.private_key}"
-        
-        self.account = Account.from_key(self.private_key)
+        # Relayer pool (SPENDER_KEYS / SPENDER_KEY); the first relayer is the default spender
+        self.relayer_pool = get_relayer_pool(network)
+        self.account = self.relayer_pool.default.account
         
         # Save configuration
         self.network = network
@@ -264,6 +280,14 @@ class EVMTransferHandler(BaseTransferHandler):
             abi=TOKEN_ABI
         )
 
+        # Local EIP-2612 permit validator (cached domain separator and permit nonces)
+        self.permit_validator = PermitValidator(
+            self.w3, token_config["address"], chain_config["chain_id"], token_config["version"]
+        )
+
+        # Allowance/balance cache kept fresh from Approval/Transfer logs
+        self.token_state = get_token_state_cache(network, token_config["address"], self.w3)
+
         # Read payee address (optional)
         self.payee_address = os.getenv("PAYEE_WALLET_ADDRESS")
         if self.payee_address:
@@ -271,11 +295,34 @@ class EVMTransferHandler(BaseTransferHandler):
                 self.payee_address = Web3.to_checksum_address(self.payee_address)
             except Exception as e:
                 raise ValueError(f"Invalid PAYEE_WALLET_ADDRESS: {e}")
+
+        # Batched payouts: deposits are collected by the payout wallet (default relayer)
+        # and paid out to payees by the PayoutExecutor
+        self.batch_payout = os.getenv("PAYOUT_MODE", "INSTANT").upper() == "BATCH"
+    
+    def get_relayer(self, spender: Optional[str] = None) -> Relayer:
+        """
+        Resolve the relayer that signs for a spender address
+        
+        Args:
+            spender: Spender named in the permit (defaults to the pool's default relayer)
+        
+        Returns:
+            Relayer instance
+        """
+        relayer = self.relayer_pool.get(spender)
+        if relayer is None:
+            if spender and spender.lower() != self.relayer_pool.default.address.lower():
+                logger.warning(f"[EVM] Spender {spender} is not a configured relayer, falling back to {self.relayer_pool.default.address}")
+            relayer = self.relayer_pool.default
+        return relayer
     
     async def execute_transfer_from(
         self, 
         owner_address: str, 
-        amount: str = "10000"
+        amount: str = "10000",
+        spender: Optional[str] = None,
+        **kwargs
     ) -> Dict[str, Any]:
         """
         Execute the ERC-20 transferFrom call
@@ -283,19 +330,23 @@ class EVMTransferHandler(BaseTransferHandler):
         Args:
             owner_address: The address authorized to you
             amount: The transfer amount (in the smallest unit)
+            spender: Relayer named as spender in the permit (defaults to the default relayer)
+            gas_price: (kwarg) Gas price prefetched by the caller, read here if absent
         
         Returns:
             A dictionary containing the transaction hash
         """
+        relayer = self.get_relayer(spender)
         try:
             # Convert address format
             owner_address_checksum = Web3.to_checksum_address(owner_address)
             
-            # Check allowance
-            allowance = self.usdc_contract.functions.allowance(
-                owner_address_checksum, 
-                self.account.address
-            ).call()
+            # Check allowance (cached; re-read from the chain before reporting a shortfall)
+            allowance = await asyncio.to_thread(self.token_state.get_allowance, owner_address_checksum, relayer.address)
+            if allowance < int(amount):
+                allowance = await asyncio.to_thread(
+                    self.token_state.get_allowance, owner_address_checksum, relayer.address, refresh=True
+                )
             
             if allowance < int(amount):
                 return {
@@ -304,28 +355,33 @@ class EVMTransferHandler(BaseTransferHandler):
                     "message": "Insufficient allowance for transferFrom"
                 }
             
-            # Get current nonce
-            nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
-            
             # Build transferFrom transaction
-            to_checksum = self.payee_address if self.payee_address else self.account.address
-            transfer_txn = self.usdc_contract.functions.transferFrom(
-                owner_address_checksum,
-                to_checksum,
-                int(amount)
-            ).build_transaction({
-                'from': self.account.address,
-                'gas': 100000,
-                # Note: For EIP-1559 chains (Ethereum, Base), 'maxFeePerGas'/'maxPriorityFeePerGas' should be used instead of 'gasPrice'
-                'gasPrice': self.w3.eth.gas_price, 
-                'nonce': nonce
-            })
+            if self.batch_payout:
+                to_checksum = self.relayer_pool.default.address
+            else:
+                to_checksum = self.payee_address if self.payee_address else relayer.address
+
+            def build_transfer(nonce: int, gas_price: int) -> Dict[str, Any]:
+                return self.usdc_contract.functions.transferFrom(
+                    owner_address_checksum,
+                    to_checksum,
+                    int(amount)
+                ).build_transaction({
+                    'from': relayer.address,
+                    'gas': 100000,
+                    # Note: For EIP-1559 chains (Ethereum, Base), 'maxFeePerGas'/'maxPriorityFeePerGas' should be used instead of 'gasPrice'
+                    'gasPrice': gas_price, 
+                    'nonce': nonce,
+                    'chainId': self.chain_config["chain_id"]  # Known locally, saves an eth_chainId call
+                })
             
-            # Sign and send the transaction
-            signed_txn = self.account.sign_transaction(transfer_txn)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            # Reserve the relayer's next nonce, sign and send (transient failures are retried)
+            tx_hash, transfer_txn = await self._send_transaction(relayer, build_transfer, kwargs.get("gas_price"))
+            nonce = transfer_txn['nonce']
             
             logger.info(f"[EVM] TransferFrom transaction submitted: {tx_hash.hex()}")
+            # Allowance and balance of the owner change with this transfer
+            self.token_state.invalidate_owner(owner_address_checksum)
             
             return {
                 "success": True,
@@ -335,22 +391,19 @@ class EVMTransferHandler(BaseTransferHandler):
                 "polling_required": True,
                 "details": {
                     "owner": owner_address_checksum,
-                    "spender": self.account.address,
+                    "spender": relayer.address,
                     "to": to_checksum,
                     "amount": int(amount),
                     "amount_display": int(amount) / (10 ** self.token_config['decimals']),
                     "gas_limit": transfer_txn['gas'],
-                    "gas_price": transfer_txn['gasPrice']
+                    "gas_price": transfer_txn['gasPrice'],
+                    "nonce": nonce
                 }
             }
                 
         except Exception as e:
             logger.error(f"[EVM] transferFrom execution failed: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to execute transferFrom"
-            }
+            return self._send_failure(e, "Failed to execute transferFrom")
     
     # Helper for checking token balance (not part of ABC but useful)
     async def check_usdc_balance(self) -> Dict[str, Any]:
@@ -371,21 +424,19 @@ class EVMTransferHandler(BaseTransferHandler):
                 "message": "Failed to check token balance"
             }
     
-    async def check_allowance(self, owner_address: str) -> Dict[str, Any]:
-        """Check the allowance amount"""
+    async def check_allowance(self, owner_address: str, spender: Optional[str] = None) -> Dict[str, Any]:
+        """Check the allowance amount granted to a relayer (defaults to the default relayer)"""
         try:
             owner_address_checksum = Web3.to_checksum_address(owner_address)
-            allowance = self.usdc_contract.functions.allowance(
-                owner_address_checksum, 
-                self.account.address
-            ).call()
+            relayer = self.get_relayer(spender)
+            allowance = await asyncio.to_thread(self.token_state.get_allowance, owner_address_checksum, relayer.address)
             decimals = self.token_config['decimals']
             return {
                 "success": True,
                 "allowance": allowance,
                 "allowance_display": allowance / (10 ** decimals),
                 "owner": owner_address_checksum,
-                "spender": self.account.address
+                "spender": relayer.address
             }
         except Exception as e:
             logger.error(f"[EVM] check_allowance failed: {str(e)}")
@@ -399,18 +450,158 @@ class EVMTransferHandler(BaseTransferHandler):
         """Get the native token balance (ETH/BNB) for the specified address"""
         try:
             checksum_address = Web3.to_checksum_address(address)
-            balance_wei = self.w3.eth.get_balance(checksum_address)
-            balance_native = self.w3.from_wei(balance_wei, 'ether')
-            return float(balance_native)
+            balance_wei = await asyncio.to_thread(self.w3.eth.get_balance, checksum_address)
+            balance_native = float(self.w3.from_wei(balance_wei, 'ether'))
+            # Keep the relayer's gas balance current for load balancing
+            relayer = self.relayer_pool.get(checksum_address)
+            if relayer:
+                relayer.update_gas_balance(balance_native)
+            return balance_native
         except Exception as e:
             native_currency = self.chain_config.get("native_currency", "ETH")
             logger.info(f"[EVM] Failed to get {native_currency} balance for {address}: {e}")
             return 0.0
     
+    async def health_check(self) -> bool:
+        """Check the RPC connection by reading the latest block number (off the event loop)"""
+        try:
+            await asyncio.to_thread(lambda: self.w3.eth.block_number)
+            return True
+        except Exception as e:
+            logger.warning(f"[EVM] Health check failed for {self.network}: {e}")
+            return False
+
+    async def get_gas_balances(self) -> Dict[str, float]:
+        """Read every relayer's native balance concurrently and feed it to the relayer pool"""
+        relayers = self.relayer_pool.relayers
+        balances_wei = await asyncio.gather(*[
+            asyncio.to_thread(self.w3.eth.get_balance, relayer.address) for relayer in relayers
+        ])
+        balances = {}
+        for relayer, balance_wei in zip(relayers, balances_wei):
+            balance = float(self.w3.from_wei(balance_wei, 'ether'))
+            relayer.update_gas_balance(balance)
+            balances[relayer.address] = balance
+        return balances
+
+    async def _is_known_transaction(self, tx_hash) -> bool:
+        try:
+            return await asyncio.to_thread(self.w3.eth.get_transaction, tx_hash) is not None
+        except Exception:
+            return False
+
+    async def _send_transaction(self, relayer: Relayer, build_txn: Callable[[int, int], Dict[str, Any]], gas_price: Optional[int] = None):
+        """
+        Reserve a nonce, sign and send a relayer transaction, retrying transient failures
+
+        RPC / connection errors resend the same signed transaction (same nonce, same hash), so a
+        send that reached the node is never doubled. NONCE_TOO_LOW / NONCE_TOO_HIGH give the nonce
+        back and resync the relayer's nonce stream (keeping nonces other payments reserved out of
+        it) and GAS_PRICE_TOO_LOW re-reads the gas price before a new
+        transaction is signed, unless an earlier send may have reached the node: the hash is
+        looked up then, and the error is reported as TRANSACTION_STATUS_UNKNOWN if it is not found.
+
+        Args:
+            relayer: Relayer that signs and pays the gas
+            build_txn: Builds the transaction from (nonce, gas_price)
+            gas_price: Gas price prefetched by the pre-flight (first attempt only)
+
+        Returns:
+            (tx_hash, transaction)
+        """
+        state = {"nonce": None, "signed": None, "txn": None, "gas_price": gas_price, "maybe_sent": False}
+
+        async def attempt(number: int):
+            if state["signed"] is None:
+                nonce, price = await self._reserve_nonce_and_gas_price(relayer, state["gas_price"])
+                state["nonce"] = nonce
+                state["txn"] = build_txn(nonce, price)
+                state["signed"] = await get_crypto_executor().sign_transaction(relayer.account, state["txn"])
+            signed = state["signed"]
+            try:
+                return await asyncio.to_thread(self.w3.eth.send_raw_transaction, signed.raw_transaction)
+            except Exception as e:
+                if (state["maybe_sent"] or "already known" in str(e).lower()) and await self._is_known_transaction(signed.hash):
+                    # An earlier send of this transaction reached the node
+                    return signed.hash
+                error_code = classify(e)
+                if error_code in RESIGN_ERRORS:
+                    if state["maybe_sent"]:
+                        raise TransactionStatusUnknown(signed.hash.hex(), f"an earlier send got no answer, then: {e}")
+                    # Rejected by the node: sign a new transaction with a fresh nonce and gas price
+                    relayer.release_nonce(state["nonce"], resync=True)
+                    state["nonce"] = None
+                    state["signed"] = None
+                    state["gas_price"] = None
+                elif error_code in SEND_OUTCOME_UNKNOWN_ERRORS and "connection refused" not in str(e).lower():
+                    # No answer from the node: the transaction may have reached it
+                    state["maybe_sent"] = True
+                raise
+
+        try:
+            tx_hash = await retry_async("send transaction", attempt, self.network)
+        except Exception as e:
+            if state["nonce"] is not None and state["maybe_sent"]:
+                # The transaction may hold the nonce: resync the stream from the chain
+                relayer.mark_sent(state["nonce"])
+                relayer.reset_nonce()
+            elif state["nonce"] is not None:
+                # The reserved nonce was not used, hand it out again
+                relayer.release_nonce(state["nonce"], resync=True)
+            if state["maybe_sent"] and not isinstance(e, TransactionStatusUnknown):
+                raise TransactionStatusUnknown(state["signed"].hash.hex(), str(e))
+            raise
+        relayer.mark_sent(state["nonce"])
+        return tx_hash, state["txn"]
+
+    @staticmethod
+    def _send_failure(error: Exception, message: str) -> Dict[str, Any]:
+        result = {
+            "success": False,
+            "error": str(error),
+            "message": message
+        }
+        error_code = classify(error)
+        if error_code:
+            result["error_code"] = error_code.code
+        if isinstance(error, TransactionStatusUnknown):
+            # The transaction may still be mined: its hash is what settles the outcome
+            result["tx_hash"] = error.tx_hash
+        return result
+
     async def get_eth_balance(self, address: str) -> float:
         """[Deprecated] Use get_native_balance instead"""
         return await self.get_native_balance(address)
 
+    async def get_gas_price(self) -> int:
+        """Current gas price in wei (read off the event loop)"""
+        return await asyncio.to_thread(lambda: self.w3.eth.gas_price)
+
+    async def _reserve_nonce_and_gas_price(self, relayer: Relayer, gas_price: Optional[int] = None):
+        """
+        Reserve the relayer's next nonce and read the gas price concurrently
+
+        Args:
+            relayer: Relayer that signs the transaction
+            gas_price: Gas price already read by the caller's pre-flight (skips the read)
+
+        Returns:
+            (nonce, gas_price)
+        """
+        if gas_price is not None:
+            return await asyncio.to_thread(relayer.next_nonce, self.w3), gas_price
+        nonce, gas_price = await asyncio.gather(
+            asyncio.to_thread(relayer.next_nonce, self.w3), self.get_gas_price(), return_exceptions=True
+        )
+        if isinstance(gas_price, BaseException):
+            if not isinstance(nonce, BaseException):
+                # The reserved nonce will not be used, hand it out again
+                relayer.release_nonce(nonce)
+            raise gas_price
+        if isinstance(nonce, BaseException):
+            raise nonce
+        return nonce, gas_price
+
     async def execute_permit(
         self, 
         owner: str, 
@@ -432,10 +623,13 @@ class EVMTransferHandler(BaseTransferHandler):
             value: Authorization amount
             deadline: Expiration timestamp
             v, r, s: Signature parameters
+            gas_price: (kwarg) Gas price prefetched by the pre-flight, read here if absent
         
         Returns:
             A dictionary containing the transaction hash
         """
+        # The relayer named as spender submits the permit (and later the transferFrom)
+        relayer = self.get_relayer(spender)
         try:
             logger.info(f"[EVM] Executing EIP-2612 permit authorization...")
             logger.info(f"Owner: {owner}")
@@ -443,41 +637,37 @@ class EVMTransferHandler(BaseTransferHandler):
             logger.info(f"Value: {value}")
             logger.info(f"Deadline: {deadline}")
             
-            # Check spender balance (must have native token to pay for gas)
-            native_currency = self.chain_config.get("native_currency", "ETH")
-            spender_balance = await self.get_native_balance(self.account.address) # Spender is the wallet configured via SPENDER_KEY
-            logger.info(f">>> Spender {native_currency} Balance: {spender_balance} {native_currency}")
+            # The relayer's gas balance was already read by the pre-flight (execute_permit.py)
             
             # Convert address format
             owner_checksum = Web3.to_checksum_address(owner)
             spender_checksum = Web3.to_checksum_address(spender)
             
-            # Get current nonce
-            nonce = self.w3.eth.get_transaction_count(self.account.address, 'pending')
-            
             # Build permit transaction
             # r and s are expected to be bytes32 in Solidity; we handle hex string conversion
             r_bytes = bytes.fromhex(r[2:]) if r.startswith('0x') else bytes.fromhex(r)
             s_bytes = bytes.fromhex(s[2:]) if s.startswith('0x') else bytes.fromhex(s)
+
+            def build_permit(nonce: int, gas_price: int) -> Dict[str, Any]:
+                return self.usdc_contract.functions.permit(
+                    owner_checksum,
+                    spender_checksum,
+                    int(value),
+                    deadline,
+                    v,
+                    r_bytes,
+                    s_bytes
+                ).build_transaction({
+                    'from': relayer.address,
+                    'gas': 150000,
+                    'gasPrice': gas_price,
+                    'nonce': nonce,
+                    'chainId': self.chain_config["chain_id"]  # Known locally, saves an eth_chainId call
+                })
             
-            permit_txn = self.usdc_contract.functions.permit(
-                owner_checksum,
-                spender_checksum,
-                int(value),
-                deadline,
-                v,
-                r_bytes,
-                s_bytes
-            ).build_transaction({
-                'from': self.account.address,
-                'gas': 150000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': nonce
-            })
-            
-            # Sign and send the transaction
-            signed_txn = self.account.sign_transaction(permit_txn)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            # Reserve the relayer's next nonce (with the gas price unless prefetched), sign and send
+            tx_hash, permit_txn = await self._send_transaction(relayer, build_permit, kwargs.get("gas_price"))
+            nonce = permit_txn['nonce']
             
             logger.info(f"[EVM] Permit transaction submitted: {tx_hash.hex()}")
             
@@ -493,22 +683,19 @@ class EVMTransferHandler(BaseTransferHandler):
                     "value": int(value),
                     "deadline": deadline,
                     "gas_limit": permit_txn['gas'],
-                    "gas_price": permit_txn['gasPrice']
+                    "gas_price": permit_txn['gasPrice'],
+                    "nonce": nonce
                 }
             }
                 
         except Exception as e:
             logger.error(f"[EVM] permit execution failed: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "EVM permit execution failed"
-            }
+            return self._send_failure(e, "EVM permit execution failed")
 
     async def get_transaction_status(self, tx_hash: str) -> Dict[str, Any]:
-        """Query transaction status"""
+        """Query transaction status (RPC reads off the event loop)"""
         try:
-            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            receipt = await asyncio.to_thread(self.w3.eth.get_transaction_receipt, tx_hash)
             
             if receipt:
                 if receipt.status == 1:
@@ -537,7 +724,7 @@ class EVMTransferHandler(BaseTransferHandler):
             else:
                 # Transaction not yet confirmed
                 try:
-                    tx = self.w3.eth.get_transaction(tx_hash)
+                    tx = await asyncio.to_thread(self.w3.eth.get_transaction, tx_hash)
                     if tx:
                         return {
                             "success": True,
@@ -562,6 +749,23 @@ class EVMTransferHandler(BaseTransferHandler):
                 "message": "Failed to query transaction status"
             }
 
+    def validate_permit(self, owner, spender, value, deadline, v=None, r=None, s=None, **kwargs) -> Dict[str, Any]:
+        """Validate the permit locally (deadline, nonce, recovered signer) without an RPC round trip"""
+        if v is None or not r or not s:
+            return {"success": False, "error": "Missing permit signature (v, r, s)", "message": "Permit validation failed"}
+        return self.permit_validator.validate(owner, spender, value, deadline, v, r, s, nonce=kwargs.get("nonce"))
+
+    def mark_permit_used(self, owner: str, spender: Optional[str] = None, value: Optional[int] = None):
+        self.permit_validator.mark_nonce_used(owner)
+        if spender and value is not None:
+            # permit() sets the allowance to exactly `value`
+            self.token_state.set_allowance(owner, spender, int(value))
+
+    def resync_permit_nonce(self, owner: str, error_message: str) -> bool:
+        return self.permit_validator.nonce_tracker.resync_on_error(
+            self.permit_validator.chain_id, self.permit_validator.token_address, owner, error_message
+        )
+
     def simulate_permit(self, owner, spender, value, deadline, v, r, s):
         """Locally simulate the permit call"""
         try:
@@ -578,7 +782,7 @@ class EVMTransferHandler(BaseTransferHandler):
                 v,
                 r_bytes,
                 s_bytes
-            ).call({'from': self.account.address})
+            ).call({'from': self.get_relayer(spender).address})
             return {"success": True}
         except Exception as e:
             if hasattr(e, 'args') and len(e.args) > 0:
@@ -1,11 +1,21 @@
 from log import logger
-from services.blockchain_errors import BlockchainErrorClassifier
+from services.blockchain_errors import BlockchainErrorClassifier, BlockchainErrorCode
 
 import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from pydantic import BaseModel
 # Assuming 'create_sepolia_handler' is defined in this module path
 from services.non_custodial.transfer_handler import create_handler
+from services.gas_balance_monitor import get_cached_gas_balance
+from services.retry_policy import retry_async
+
+# Permits are validated locally first; the RPC simulation is an optional second stage
+PERMIT_RPC_SIMULATION = os.getenv("PERMIT_RPC_SIMULATION", "false").lower() == "true"
+# Each pre-flight call (allowance, validation, simulation, balances, gas price) gets this long
+PREFLIGHT_TIMEOUT_SECONDS = float(os.getenv("PREFLIGHT_TIMEOUT_SECONDS", "5"))
 
 class ExecutePermitRequest(BaseModel):
     owner: str
@@ -16,6 +26,7 @@ class ExecutePermitRequest(BaseModel):
     v: int = None
     r: str = None
     s: str = None
+    nonce: int = None  # EIP-2612 nonce the permit was signed with, if known
     # Solana signature parameters (Optional, required for Solana chains)
     signature: str = None  # Solana partial signed transaction (Base64 encoded)
     token: str = "USDC"  # Token symbol (USDC or DAI)
@@ -25,11 +36,154 @@ class ExecutePermitRequest(BaseModel):
 class TransferFromRequest(BaseModel):
     owner: str
     amount: float
+    spender: str = None  # Relayer named as spender in the permit (EVM); defaults to the default relayer
     token: str = "USDC"  # Token symbol (USDC or DAI)
     network: str = "sepolia"  # Reserved for future multi-chain support
 
-async def execute_permit(permit_request: ExecutePermitRequest):
-    """Execute EIP-2612 permit authorization to establish USDC allowance relationship"""
+def _sent_or_unknown(result: Dict[str, Any], operation: str) -> Dict[str, Any]:
+    """
+    Treat a send with an unknown outcome (TRANSACTION_STATUS_UNKNOWN, hash known) as submitted
+
+    The transaction may still be mined, so it is recorded and awaited by its hash instead of failing.
+    """
+    if (not result.get("success") and result.get("tx_hash")
+            and result.get("error_code") == BlockchainErrorCode.TRANSACTION_STATUS_UNKNOWN.code):
+        logger.warning(f" {operation} {result['tx_hash']} may have been sent, awaiting its receipt: {result.get('error')}")
+        return {**result, "success": True, "status": "pending"}
+    return result
+
+
+def _preflight_failure(error: str, error_code: Optional[str] = None) -> Dict[str, Any]:
+    result = {"success": False, "error": error}
+    if error_code:
+        result["error_code"] = error_code
+    return result
+
+
+async def _value(value):
+    return value
+
+
+async def _bounded(name: str, awaitable: Awaitable, fallback: Callable[[str, bool], Any]):
+    """
+    Await one pre-flight call within PREFLIGHT_TIMEOUT_SECONDS
+
+    Args:
+        name: Call name for the logs
+        awaitable: The pre-flight call
+        fallback: Builds the result from (error message, timed out) when the call fails or times out
+    """
+    try:
+        return await asyncio.wait_for(awaitable, PREFLIGHT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f" Pre-flight {name} timed out after {PREFLIGHT_TIMEOUT_SECONDS}s")
+        return fallback(f"{name} timed out after {PREFLIGHT_TIMEOUT_SECONDS}s", True)
+    except Exception as e:
+        logger.warning(f" Pre-flight {name} failed: {e}")
+        return fallback(str(e), False)
+
+
+async def _preflight(handler, permit_request: ExecutePermitRequest) -> Dict[str, Any]:
+    """
+    Run the permit pre-flight checks concurrently, each with its own timeout
+
+    Latency is that of the slowest call instead of the sum of all of them. Sync RPC reads
+    run in threads; local validation runs on the crypto executor.
+
+    Args:
+        handler: Transfer handler of the permit's network
+        permit_request: Signed permit (EVM) or partially signed transaction (Solana)
+
+    Returns:
+        {
+            "allowance": check_allowance result (allowance 0 if it failed or timed out),
+            "validation": validate_permit result,
+            "simulation": simulate_permit result ({"success": True} when disabled),
+            "native_balance": Spender's gas balance or None,
+            "gas_price": Prefetched EVM gas price or None,
+            "elapsed_ms": Wall time of the pre-flight
+        }
+    """
+    signature_params = {}
+    # EVM Parameters
+    if permit_request.v is not None:
+        signature_params.update({"v": permit_request.v, "r": permit_request.r, "s": permit_request.s})
+    # Solana Parameters
+    if permit_request.signature:
+        signature_params["signature"] = permit_request.signature
+    permit_params = {
+        "owner": permit_request.owner,
+        "spender": permit_request.spender,
+        "value": permit_request.value,
+        "deadline": permit_request.deadline,
+        **signature_params
+    }
+
+    def failed_check(error: str, timed_out: bool) -> Dict[str, Any]:
+        # A check that timed out is an RPC problem (retryable), not a bad permit
+        return _preflight_failure(error, BlockchainErrorCode.RPC_ERROR.code if timed_out else None)
+
+    if signature_params:
+        # validate_permit may read the on-chain nonce over RPC, so it runs in a thread
+        # rather than tying up a crypto executor worker
+        validation = asyncio.to_thread(
+            handler.validate_permit,
+            owner=permit_request.owner,
+            spender=permit_request.spender,
+            value=permit_request.value,
+            deadline=permit_request.deadline,
+            v=permit_request.v,
+            r=permit_request.r,
+            s=permit_request.s,
+            nonce=permit_request.nonce,
+            signature=permit_request.signature
+        )
+    else:
+        validation = _value({"success": True})
+    if PERMIT_RPC_SIMULATION:
+        simulation = asyncio.to_thread(handler.simulate_permit, **permit_params)
+    else:
+        simulation = _value({"success": True})
+    # Only EVM handlers quote a gas price; the handler reads it itself if this fails
+    gas_price = handler.get_gas_price() if hasattr(handler, "get_gas_price") else _value(None)
+    # The gas balance monitor keeps the spender's balance; RPC only when it has no fresh value
+    native_balance = get_cached_gas_balance(permit_request.network, permit_request.spender)
+    if native_balance is None:
+        native_balance = handler.get_native_balance(permit_request.spender)
+    else:
+        native_balance = _value(native_balance)
+
+    started = time.perf_counter()
+    allowance, validation, simulation, native_balance, gas_price = await asyncio.gather(
+        _bounded(
+            "allowance check",
+            handler.check_allowance(owner_address=permit_request.owner, spender=permit_request.spender),
+            lambda error, timed_out: _preflight_failure(error)
+        ),
+        _bounded("permit validation", validation, failed_check),
+        _bounded("permit simulation", simulation, failed_check),
+        _bounded("native balance", native_balance, lambda error, timed_out: None),
+        _bounded("gas price", gas_price, lambda error, timed_out: None)
+    )
+    return {
+        "allowance": allowance,
+        "validation": validation,
+        "simulation": simulation,
+        "native_balance": native_balance,
+        "gas_price": gas_price,
+        "elapsed_ms": (time.perf_counter() - started) * 1000
+    }
+
+
+async def execute_permit(permit_request: ExecutePermitRequest, on_submitted: Optional[Callable] = None):
+    """
+    Execute EIP-2612 permit authorization to establish USDC allowance relationship
+
+    Args:
+        permit_request: Signed permit (EVM) or partially signed transaction (Solana)
+        on_submitted: Called with (tx_hash, details) right after the transaction was sent, before confirmation
+    """
+    handler = None
     try:
         logger.info(" Executing permit authorization...")
         logger.info(f"Owner: {permit_request.owner}")
@@ -44,9 +198,19 @@ async def execute_permit(permit_request: ExecutePermitRequest):
         if not handler:
             raise Exception("Transfer handler not available")
         
-        # Check current allowance
-        result = await handler.check_allowance(owner_address=permit_request.owner)
-        if result.get("allowance", 0) >= permit_request.value:
+        # Pre-flight: allowance, local validation, RPC simulation and the spender's gas balance
+        # (plus the EVM gas price) are independent, so they run concurrently
+        preflight = await _preflight(handler, permit_request)
+        logger.info(f" Pre-flight finished in {preflight['elapsed_ms']:.1f}ms")
+
+        # Check current allowance. A permit with a known nonce is skipped only once that nonce
+        # is used: an unused one would leave a gap that blocks the owner's later permits
+        result = preflight["allowance"]
+        nonce_settled = (
+            permit_request.nonce is None
+            or preflight["validation"].get("error_code") == BlockchainErrorCode.SIGNATURE_ALREADY_USED.code
+        )
+        if result.get("allowance", 0) >= permit_request.value and nonce_settled:
             logger.info(f"Skip permit transaction because it already has sufficient allowance. Current: {result.get('allowance')}, Required: {permit_request.value}")
             return {
                 "success": True,
@@ -57,30 +221,20 @@ async def execute_permit(permit_request: ExecutePermitRequest):
                 "details": result.get("details", {})
             }
 
-        # Locally simulate permit call to catch errors in advance
-        simulate_params = {
-            "owner": permit_request.owner,
-            "spender": permit_request.spender,
-            "value": permit_request.value,
-            "deadline": permit_request.deadline
-        }
-        
-        # EVM Parameters
-        if permit_request.v is not None:
-            simulate_params.update({
-                "v": permit_request.v,
-                "r": permit_request.r,
-                "s": permit_request.s
-            })
-        
-        # Solana Parameters
-        if permit_request.signature:
-            # Note: For Solana, permit execution usually includes the transfer, making separate simulation complex/unnecessary
-            # Assuming the BaseTransferHandler or derived class has a simulate_permit method
-            simulate_params["signature"] = permit_request.signature
-        
-        # The BaseTransferHandler is expected to have a simulate_permit method
-        simulate_result = handler.simulate_permit(**simulate_params)
+        # Local validation rejects bad permits without RPC calls
+        # (EVM: signature, deadline, nonce; Solana: fee payer, signers and transfer instruction)
+        validation = preflight["validation"]
+        if not validation.get("success"):
+            error_msg = validation.get('error')
+            error_code = validation.get('error_code')
+            logger.error(f" Local permit validation failed: {error_msg}")
+            if error_code:
+                raise Exception(f"[{error_code}] Permit validation failed: {error_msg}")
+            else:
+                raise Exception(f"Permit validation failed: {error_msg}")
+
+        # RPC simulation catches on-chain errors in advance (optional)
+        simulate_result = preflight["simulation"]
         if not simulate_result.get("success"):
             error_msg = simulate_result.get('error')
             error_code = simulate_result.get('error_code')
@@ -98,13 +252,13 @@ async def execute_permit(permit_request: ExecutePermitRequest):
              # Handler might not have chain_config if it's not an EVM handler, which is fine
              pass
              
-        try:
-            native_balance = await handler.get_native_balance(permit_request.spender)
+        native_balance = preflight["native_balance"]
+        if native_balance is None:
+            logger.warning(f"  Could not retrieve {native_currency} balance for spender")
+        else:
             logger.info(f" Spender {native_currency} Balance (Network: {permit_request.network}): {native_balance} {native_currency}")
             if native_balance < 0.0001:
                 logger.warning(f"  Warning: Spender {native_currency} balance is too low ({native_balance} {native_currency}), may not be enough to pay for gas fees")
-        except Exception as e:
-            logger.warning(f"  Could not retrieve {native_currency} balance for spender: {e}")
         
         # Call the actual permit execution method (submit and poll for confirmation before returning)
         # Pass different parameters based on the protocol type
@@ -127,40 +281,39 @@ async def execute_permit(permit_request: ExecutePermitRequest):
         # Solana Parameters
         if permit_request.signature:
             permit_params["signature"] = permit_request.signature
+
+        # EVM: gas price prefetched by the pre-flight (the handler only reserves the nonce)
+        if preflight["gas_price"] is not None:
+            permit_params["gas_price"] = preflight["gas_price"]
         
-        result = await handler.execute_permit(**permit_params)
+        result = _sent_or_unknown(await handler.execute_permit(**permit_params), "Permit")
         
         if result.get("success"):
             # Compatible with EVM (tx_hash) and Solana (signature)
             tx_hash = result.get("tx_hash") or result.get("signature")
-            max_attempts = 30  # Approximately 60 seconds
-            interval_seconds = 2
-            
-            # Polling loop
-            for _ in range(max_attempts):
-                try:
-                    poll = await handler.get_transaction_status(tx_hash)
-                    if poll.get("success") and poll.get("status") == "confirmed":
-                        return {
-                            "success": True,
-                            "txHash": tx_hash,
-                            "status": "confirmed",
-                            "message": "Permit confirmed",
-                            "polling_required": False,
-                            "details": result.get("details", {})
-                        }
-                    if not poll.get("success") and poll.get("status") == "failed":
-                        return {
-                            "success": False,
-                            "txHash": tx_hash,
-                            "status": "failed",
-                            "message": poll.get("message", "Transaction failed"),
-                            "details": poll.get("details", {})
-                        }
-                except Exception as poll_e:
-                    logger.warning(f"Polling failed for {tx_hash}: {poll_e}")
-                    pass # Ignore exceptions during polling, just wait and retry
-                await asyncio.sleep(interval_seconds)
+            if on_submitted:
+                on_submitted(tx_hash, result.get("details", {}))
+            # Wait approximately 60 seconds (Solana: batched signature status polling, EVM: receipt polling)
+            poll = await handler.wait_for_transaction(tx_hash, timeout=60)
+            if poll and poll.get("success") and poll.get("status") == "confirmed":
+                handler.mark_permit_used(permit_request.owner, permit_request.spender, int(permit_request.value))
+                return {
+                    "success": True,
+                    "txHash": tx_hash,
+                    "status": "confirmed",
+                    "message": "Permit confirmed",
+                    "polling_required": False,
+                    "details": result.get("details", {})
+                }
+            if poll and not poll.get("success") and poll.get("status") == "failed":
+                handler.resync_permit_nonce(permit_request.owner, poll.get("message", ""))
+                return {
+                    "success": False,
+                    "txHash": tx_hash,
+                    "status": "failed",
+                    "message": poll.get("message", "Transaction failed"),
+                    "details": poll.get("details", {})
+                }
             
             # Timed out without confirmation -> Return pending, allowing the upstream service to continue polling
             return {
@@ -171,15 +324,26 @@ async def execute_permit(permit_request: ExecutePermitRequest):
                 "polling_required": True,
                 "details": result.get("details", {})
             }
+        elif result.get("error_code"):
+            raise Exception(f"[{result['error_code']}] {result.get('error', 'Permit execution failed')}")
         else:
             raise Exception(result.get("error", "Permit execution failed"))
     except Exception as e:
         logger.error(f" Permit execution failed: {str(e)}")
+        # A rejected signature usually means the owner's cached permit nonce is stale
+        if handler:
+            handler.resync_permit_nonce(permit_request.owner, str(e))
         # Re-raise the exception for upstream handling
         raise Exception(f"Permit execution failed: {str(e)}")
 
-async def transfer_from(req: TransferFromRequest):
-    """Use the established allowance to transfer token from owner to the backend wallet address (the spender itself, or payee)."""
+async def transfer_from(req: TransferFromRequest, on_submitted: Optional[Callable] = None):
+    """
+    Use the established allowance to transfer token from owner to the backend wallet address (the spender itself, or payee).
+
+    Args:
+        req: Owner, amount and the spender holding the allowance
+        on_submitted: Called with (tx_hash, details) right after the transaction was sent, before confirmation
+    """
     try:
         logger.info(" Executing transferFrom...")
         logger.info(f"Owner: {req.owner}")
@@ -187,7 +351,8 @@ async def transfer_from(req: TransferFromRequest):
         logger.info(f"Network: {req.network}")
 
         network = req.network
-        if network.startswith("solana"):
+        handler = create_handler(network=req.network, token=req.token) if network.startswith("solana") else None
+        if network.startswith("solana") and not getattr(handler, "delegate_mode", False):
             # Solana's 'permit' (approve/delegate) usually includes the 'transferChecked' instruction
             # for a single atomic transaction. No separate transferFrom needed.
             print("[SKIP] Solana does not require a separate transferFrom; the transfer is completed in the permit phase.")
@@ -198,6 +363,9 @@ async def transfer_from(req: TransferFromRequest):
                 "message": "TransferFrom skipped for Solana (completed via permit)",
                 "polling_required": False
             }
+        if network.startswith("solana"):
+            # Delegate mode: the fee payer pulls the amount from the approved budget
+            return await _solana_delegate_transfer(handler, req, on_submitted)
         
         handler = create_handler(network=req.network, token=req.token)
 
@@ -206,19 +374,24 @@ async def transfer_from(req: TransferFromRequest):
                         
         # Locally simulate transferFrom call to catch errors in advance (EVM-specific logic)
         try:
-            # This simulation logic relies on the existence of handler.w3, handler.account, handler.usdc_contract, and handler.payee_address, which are EVM handler properties.
+            # This simulation logic relies on the existence of handler.w3, handler.get_relayer, handler.usdc_contract, and handler.payee_address, which are EVM handler properties.
             owner_checksum = handler.w3.to_checksum_address(req.owner)
-            spender_checksum = handler.account.address
+            spender_checksum = handler.get_relayer(req.spender).address
             # Recipient: prioritize PAYEE_WALLET_ADDRESS
             payee_env = handler.payee_address if hasattr(handler, 'payee_address') else None
             recipient_checksum = payee_env if payee_env else spender_checksum
 
-            # callStatic transferFrom
-            handler.usdc_contract.functions.transferFrom(
+            # callStatic transferFrom (off the event loop; transient RPC errors are retried)
+            simulation = handler.usdc_contract.functions.transferFrom(
                 owner_checksum,
                 recipient_checksum,
                 int(req.amount) # Assuming req.amount is in smallest unit
-            ).call({'from': spender_checksum})
+            )
+
+            async def simulate_transfer(attempt: int):
+                return await asyncio.to_thread(simulation.call, {'from': spender_checksum})
+
+            await retry_async("transferFrom simulation", simulate_transfer, req.network)
         except Exception as e:
             if hasattr(e, 'args') and len(e.args) > 0:
                 error_msg = str(e.args[0])
@@ -238,11 +411,13 @@ async def transfer_from(req: TransferFromRequest):
         # Note: The EVM handler's execute_transfer_from expects 'amount' in its smallest unit, 
         # but the request model uses a float. This requires conversion in the handler or here.
         # Assuming the handler internally handles the float to int conversion based on decimals.
-        result = await handler.execute_transfer_from(req.owner, req.amount) 
+        result = _sent_or_unknown(await handler.execute_transfer_from(req.owner, req.amount, spender=req.spender), "transferFrom")
         
         if result.get("success"):
             # Poll for transaction status until confirmed or timed out (every 2 seconds, max approx 60 seconds)
             tx_hash = result.get("tx_hash")
+            if on_submitted:
+                on_submitted(tx_hash, result.get("details", {}))
             max_attempts = 30
             interval_seconds = 2
             
@@ -282,6 +457,8 @@ async def transfer_from(req: TransferFromRequest):
                 "polling_required": True,
                 "details": result.get("details", {})
             }
+        elif result.get("error_code"):
+            raise Exception(f"[{result['error_code']}] {result.get('error', 'transferFrom failed')}")
         else:
             raise Exception(result.get("error", "transferFrom failed"))
     except Exception as e:
@@ -289,6 +466,45 @@ async def transfer_from(req: TransferFromRequest):
         # Re-raise the exception for upstream handling
         raise Exception(f"transferFrom execution failed: {str(e)}")
 
+async def _solana_delegate_transfer(handler, req: TransferFromRequest, on_submitted: Optional[Callable] = None):
+    """transfer_checked pulled by the fee payer as SPL delegate (Solana delegate mode)"""
+    result = await handler.execute_transfer_from(req.owner, req.amount)
+    if not result.get("success"):
+        if result.get("error_code"):
+            raise Exception(f"[{result['error_code']}] {result.get('error', 'Delegate transfer failed')}")
+        raise Exception(result.get("error", "Delegate transfer failed"))
+
+    tx_hash = result.get("tx_hash")
+    if on_submitted:
+        on_submitted(tx_hash, result.get("details", {}))
+    poll = await handler.wait_for_transaction(tx_hash, timeout=60)
+    if poll and poll.get("success") and poll.get("status") == "confirmed":
+        handler.mark_permit_used(req.owner)
+        return {
+            "success": True,
+            "txHash": tx_hash,
+            "status": "confirmed",
+            "message": "TransferFrom confirmed",
+            "polling_required": False,
+            "details": result.get("details", {})
+        }
+    if poll and not poll.get("success") and poll.get("status") == "failed":
+        return {
+            "success": False,
+            "txHash": tx_hash,
+            "status": "failed",
+            "message": poll.get("message", "Transaction failed"),
+            "details": poll.get("details", {})
+        }
+    return {
+        "success": True,
+        "txHash": tx_hash,
+        "status": "pending",
+        "message": "TransferFrom transaction submitted, waiting for confirmation...",
+        "polling_required": True,
+        "details": result.get("details", {})
+    }
+
 async def get_transaction_status(tx_hash: str, network: str = "sepolia", token: str = "USDC"):
     """
     Query transaction status (multi-chain support)
@@ -0,0 +1,474 @@
+"""
+Batched Payout Executor (Settlement Batches → On-chain Payouts)
+
+In batch payout mode (PAYOUT_MODE=BATCH) every transferFrom deposits into the payout
+wallet (the chain's default relayer) and the settlement detail is recorded as 'ready'
+instead of being released on its own. This executor periodically:
+
+1. Claims ready settlement details of a chain and token (SKIP LOCKED, safe with several
+   executors), leaving out payees whose ready details do not add up to a positive net amount
+2. Aggregates them per payee (one SettlementBatch + PayoutInstruction per payee)
+3. Sends all payees of the chain/asset in a single disperse-style transaction
+   (disperseToken(token, recipients[], values[]))
+4. Records gas_estimate, gas_fee_paid, tx_hash and finality_status on each payout
+
+Details stay 'releasing' while their payout may be on its way. A send with an unknown
+outcome keeps the payout submitted with its hash instead of freeing the details, and every
+cycle first reconciles submitted payouts from their receipts; only a payout the node
+certainly rejected, or one that reverted, returns its details to 'ready'.
+
+Configuration (.env):
+- PAYOUT_MODE: INSTANT (default, one transfer per payment) or BATCH
+- <CHAIN>_DISPERSE_ADDRESS / DISPERSE_CONTRACT_ADDRESS: Disperse contract address
+- PAYOUT_MAX_RECIPIENTS: Max payees per payout transaction (default: 100)
+- PAYOUT_INTERVAL_SECONDS: Interval between payout cycles (default: 300)
+- PAYOUT_DROP_SECONDS: Age after which a submitted payout unknown to the node is marked failed for manual reconciliation (default: 1800)
+- PAYOUT_NETWORKS: Comma-separated networks with a payout loop (default: sepolia);
+  Solana networks are paid by solana_payout_executor.py
+- PAYOUT_TOKENS: Comma-separated tokens paid out on each network, one loop per network and token
+  (default: ACTIVE_TOKEN); tokens a network has no address for are skipped
+"""
+from log import logger
+import os
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Callable, List
+from dotenv import load_dotenv
+from web3 import Web3
+
+from dao.model import (
+    SettlementBatch, PayoutInstruction, SettlementBatchStatus,
+    SettlementDetailStatus, PayoutStatus, FinalityStatus
+)
+from dao.app import (
+    claim_ready_settlement_details, update_settlement_details,
+    add_payout_batch, update_payout_instruction, update_settlement_batch_status,
+    get_submitted_payout_instructions, get_settlement_detail_ids
+)
+from services.blockchain_errors import TransactionStatusUnknown
+from services.constants import ChainID, get_token_asset_id
+
+# Load environment variables
+load_dotenv()
+
+PAYOUT_MODE = os.getenv("PAYOUT_MODE", "INSTANT").upper()
+PAYOUT_MAX_RECIPIENTS = int(os.getenv("PAYOUT_MAX_RECIPIENTS", "100"))
+PAYOUT_INTERVAL_SECONDS = int(os.getenv("PAYOUT_INTERVAL_SECONDS", "300"))
+PAYOUT_DROP_SECONDS = int(os.getenv("PAYOUT_DROP_SECONDS", "1800"))
+PAYOUT_NETWORKS = [n.strip().lower() for n in os.getenv("PAYOUT_NETWORKS", "sepolia").split(",") if n.strip()]
+PAYOUT_TOKENS = [t.strip().upper() for t in os.getenv("PAYOUT_TOKENS", os.getenv("ACTIVE_TOKEN", "USDC")).split(",") if t.strip()]
+
+DISPERSE_ADDRESS_ENVS = {
+    "sepolia": "SEPOLIA_DISPERSE_ADDRESS",
+    "basesepolia": "BASE_SEPOLIA_DISPERSE_ADDRESS",
+    "bnbtestnet": "BNBChain_Testnet_DISPERSE_ADDRESS",
+}
+
+# Disperse.app compatible ABI
+DISPERSE_ABI = [
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "token", "type": "address"},
+            {"name": "recipients", "type": "address[]"},
+            {"name": "values", "type": "uint256[]"}
+        ],
+        "name": "disperseToken",
+        "outputs": [],
+        "payable": False,
+        "stateMutability": "nonpayable",
+        "type": "function"
+    }
+]
+
+# Gas per recipient used when estimate_gas is unavailable (plus a fixed base)
+FALLBACK_GAS_BASE = 60000
+FALLBACK_GAS_PER_RECIPIENT = 35000
+
+
+def is_batch_payout_enabled() -> bool:
+    """Whether settlements are paid out in batches instead of one transfer per payment"""
+    return PAYOUT_MODE == "BATCH"
+
+
+def group_details_by_payee(details: List[Dict[str, Any]],
+                           normalize: Callable[[str], str] = Web3.to_checksum_address) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate settlement details per payee
+
+    Args:
+        details: Settlement detail rows (model_dump dicts)
+        normalize: Payee address normalization (checksum for EVM, str for Solana)
+
+    Returns:
+        {payee_address: {"amount": int, "gross": int, "fee": int, "count": int, "detail_ids": [...]}}
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for detail in details:
+        payee = normalize(detail["payee_address"])
+        group = groups.setdefault(payee, {"amount": 0, "gross": 0, "fee": 0, "count": 0, "detail_ids": []})
+        group["amount"] += int(Decimal(str(detail["net_amount"])))
+        group["gross"] += int(Decimal(str(detail["gross_amount"])))
+        group["fee"] += int(Decimal(str(detail["fee_amount"])))
+        group["count"] += 1
+        group["detail_ids"].append(detail["settlement_detail_id"])
+    return groups
+
+
+class PayoutExecutor:
+    """Sends aggregated settlement payouts of one EVM chain/token as batched transfers"""
+
+    def __init__(self, network: str = "sepolia", token: str = "USDC"):
+        """
+        Initialize the payout executor
+
+        Args:
+            network: EVM network name (sepolia, basesepolia, bnbtestnet)
+            token: Token symbol (USDC, DAI)
+        """
+        # Imported here to avoid a circular import with the handler factory
+        from services.non_custodial.transfer_handler import create_handler
+
+        self.network = network.lower()
+        self.token = token.upper()
+        self.chain_id = ChainID.get(self.network)
+        if not self.chain_id:
+            raise ValueError(f"No chain_id mapping for network: {self.network}")
+
+        disperse_address = os.getenv(DISPERSE_ADDRESS_ENVS.get(self.network, "")) or os.getenv("DISPERSE_CONTRACT_ADDRESS")
+        if not disperse_address:
+            raise ValueError(f"Disperse contract not configured for {self.network}. Please set DISPERSE_CONTRACT_ADDRESS in .env")
+
+        self.handler = create_handler(network=self.network, token=self.token)
+        if not self.handler or self.handler.get_protocol_type() != "evm":
+            raise ValueError(f"EVM transfer handler not available for {self.network}/{self.token}")
+
+        self.w3 = self.handler.w3
+        self.token_address = Web3.to_checksum_address(self.handler.token_config["address"])
+        # Only the settlement details of this token are paid by this executor
+        self.asset_id = get_token_asset_id(self.chain_id, self.token_address)
+        self.disperse_contract = self.w3.eth.contract(
+            address=Web3.to_checksum_address(disperse_address),
+            abi=DISPERSE_ABI
+        )
+        # Payouts are funded by the payout wallet that collected the transferFrom deposits
+        self.relayer = self.handler.relayer_pool.default
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Execute one payout cycle: reconcile earlier payouts, then pay all ready settlement details of the chain/token
+
+        Returns:
+            Summary of the cycle (payees, transactions, failures, reconciled payouts)
+        """
+        reconciled = await self.reconcile_submitted()
+        details = claim_ready_settlement_details(self.chain_id, self.asset_id)
+        if not details:
+            return {"success": True, "payees": 0, "transactions": [], "reconciled": reconciled,
+                    "message": "No ready settlement details"}
+
+        invalid = [detail for detail in details if not Web3.is_address(detail["payee_address"])]
+        if invalid:
+            # Cannot be paid on this chain at all: failed for manual handling instead of being claimed again
+            logger.error(f"[Payout] {len(invalid)} settlement detail(s) on {self.network} have an invalid payee address")
+            update_settlement_details([detail["settlement_detail_id"] for detail in invalid], SettlementDetailStatus.failed)
+            details = [detail for detail in details if detail not in invalid]
+
+        groups = group_details_by_payee(details)
+        payees = [payee for payee, group in groups.items() if group["amount"] > 0]
+        skipped = [payee for payee in groups if payee not in payees]
+        for payee in skipped:
+            # The claim only takes payees with a positive total, unless its limit cut their details short
+            logger.warning(f"[Payout] Skip payee {payee} with non-positive net amount in this cycle")
+            update_settlement_details(groups[payee]["detail_ids"], SettlementDetailStatus.ready)
+
+        transactions = []
+        for start in range(0, len(payees), PAYOUT_MAX_RECIPIENTS):
+            chunk = {payee: groups[payee] for payee in payees[start:start + PAYOUT_MAX_RECIPIENTS]}
+            transactions.append(await self._pay_chunk(chunk))
+
+        return {
+            "success": all(tx.get("success") for tx in transactions),
+            "payees": len(payees),
+            "settlements": len(details),
+            "transactions": transactions,
+            "reconciled": reconciled
+        }
+
+    async def _pay_chunk(self, chunk: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Pay one chunk of payees with a single disperse transaction"""
+        recipients = list(chunk.keys())
+        values = [chunk[payee]["amount"] for payee in recipients]
+        total = sum(values)
+        now = datetime.now()
+
+        # 1. Persist one batch + payout instruction per payee
+        payouts = []
+        for payee in recipients:
+            group = chunk[payee]
+            settlement_batch = SettlementBatch(
+                tenant_id=self.relayer.address, merchant_id="zen7", payee_address=payee,
+                chain_id=self.chain_id, asset_id=self.asset_id, check_date=now.date(),
+                period_start=now, period_end=now, total_count=group["count"],
+                total_amount=group["gross"], fee_total=group["fee"], net_total=group["amount"],
+                settlement_status=SettlementBatchStatus.pending_payout
+            )
+            payout_instruction = PayoutInstruction(
+                to_address=payee, chain_id=self.chain_id, asset_id=self.asset_id,
+                amount=group["amount"], status=PayoutStatus.created,
+                finality_status=FinalityStatus.pending
+            )
+            payouts.append({**add_payout_batch(settlement_batch, payout_instruction, group["detail_ids"]),
+                            "detail_ids": group["detail_ids"]})
+
+        # 2. Build, sign and submit the batched transfer (the handler's send loop: transient
+        # errors resend the same signed transaction, an unknown outcome carries its hash)
+        gas_estimate = FALLBACK_GAS_BASE + FALLBACK_GAS_PER_RECIPIENT * len(recipients)
+        try:
+            await self._ensure_disperse_allowance(total)
+            call = self.disperse_contract.functions.disperseToken(self.token_address, recipients, values)
+            try:
+                gas_estimate = await asyncio.to_thread(call.estimate_gas, {'from': self.relayer.address})
+            except Exception as e:
+                logger.warning(f"[Payout] estimate_gas failed, using fallback: {e}")
+
+            def build_payout(nonce: int, gas_price: int) -> Dict[str, Any]:
+                return call.build_transaction({
+                    'from': self.relayer.address,
+                    'gas': int(gas_estimate * 1.2),
+                    'gasPrice': gas_price,
+                    'nonce': nonce
+                })
+
+            tx_hash, payout_txn = await self.handler._send_transaction(self.relayer, build_payout)
+            tx_hash = tx_hash.hex()
+        except TransactionStatusUnknown as e:
+            # The payout may be on its way: never pay these details again before the hash is resolved
+            logger.error(f"[Payout] Payout for {len(recipients)} payee(s) on {self.network} may have been sent, "
+                         f"kept as submitted for reconciliation: {e}")
+            self._mark_submitted(payouts, e.tx_hash, int(gas_estimate))
+            return {"success": True, "tx_hash": e.tx_hash, "status": "pending", "recipients": recipients}
+        except Exception as e:
+            logger.error(f"[Payout] Failed to submit payout for {len(recipients)} payee(s) on {self.network}: {e}")
+            # The node rejected the payout or never received it: the next cycle picks the details up again
+            self._release_for_retry(payouts, PayoutStatus.canceled)
+            return {"success": False, "error": str(e), "recipients": recipients}
+
+        logger.info(f"[Payout] Submitted batched payout {tx_hash} for {len(recipients)} payee(s), total {total} on {self.network}")
+        self._mark_submitted(payouts, tx_hash, int(gas_estimate))
+
+        # 3. Wait for the receipt and record gas and finality
+        receipt = await self._wait_for_receipt(tx_hash)
+        if receipt is None:
+            logger.warning(f"[Payout] Payout {tx_hash} not confirmed yet, left as submitted for reconciliation")
+            return {"success": True, "tx_hash": tx_hash, "status": "pending", "recipients": recipients}
+        result = await self._record_receipt(tx_hash, receipt, payouts, payout_txn["gasPrice"])
+        return {**result, "recipients": recipients}
+
+    async def reconcile_submitted(self) -> int:
+        """
+        Resolve payouts left submitted by earlier cycles (receipt not seen in time, unknown send outcome)
+
+        Mined payouts are recorded from their receipt. A payout the node does not know for
+        longer than PAYOUT_DROP_SECONDS is marked failed with its details, for manual
+        reconciliation: it may still be pending elsewhere, so it is never paid again automatically.
+
+        Returns:
+            Number of payout transactions resolved
+        """
+        transactions: Dict[str, List[Dict[str, Any]]] = {}
+        for payout in get_submitted_payout_instructions(self.chain_id):
+            if payout.get("tx_hash"):
+                transactions.setdefault(payout["tx_hash"], []).append(payout)
+
+        resolved = 0
+        for tx_hash, instructions in transactions.items():
+            payouts = [{**payout, "detail_ids": get_settlement_detail_ids(payout["settlement_batch_id"])}
+                       for payout in instructions]
+            try:
+                receipt = await asyncio.to_thread(self.w3.eth.get_transaction_receipt, tx_hash)
+            except Exception:
+                receipt = None  # Not mined (or not known)
+            if receipt:
+                result = await self._record_receipt(tx_hash, receipt, payouts)
+                logger.info(f"[Payout] Reconciled payout {tx_hash} on {self.network}: {result['status']}")
+                resolved += 1
+                continue
+            submitted_at = min(datetime.fromisoformat(payout["submitted_at"]) for payout in instructions)
+            age = (datetime.now(submitted_at.tzinfo) - submitted_at).total_seconds()
+            if age < PAYOUT_DROP_SECONDS or await self.handler._is_known_transaction(tx_hash):
+                continue
+            logger.error(f"[Payout] Payout {tx_hash} on {self.network} unknown to the node for {age:.0f}s, "
+                         f"marking {len(payouts)} payout(s) failed; reconcile them manually before paying again")
+            for payout in payouts:
+                update_payout_instruction(payout["payout_id"], status=PayoutStatus.failed)
+                update_settlement_batch_status(payout["settlement_batch_id"], SettlementBatchStatus.failed)
+                update_settlement_details(payout["detail_ids"], SettlementDetailStatus.failed)
+            resolved += 1
+        return resolved
+
+    def _mark_submitted(self, payouts: List[Dict[str, Any]], tx_hash: str, gas_estimate: int):
+        submitted_at = datetime.now()
+        for payout in payouts:
+            update_payout_instruction(
+                payout["payout_id"], status=PayoutStatus.submitted,
+                tx_hash=tx_hash, gas_estimate=gas_estimate // len(payouts), submitted_at=submitted_at
+            )
+
+    def _release_for_retry(self, payouts: List[Dict[str, Any]], status: PayoutStatus, **fields):
+        """Close the payouts and put their details back to ready for the next cycle"""
+        for payout in payouts:
+            update_payout_instruction(payout["payout_id"], status=status, **fields)
+            update_settlement_batch_status(payout["settlement_batch_id"], SettlementBatchStatus.failed)
+            update_settlement_details(payout["detail_ids"], SettlementDetailStatus.ready)
+
+    async def _record_receipt(self, tx_hash: str, receipt, payouts: List[Dict[str, Any]], gas_price: int = 0) -> Dict[str, Any]:
+        """
+        Record the outcome of a mined payout transaction
+
+        Args:
+            tx_hash: Payout transaction hash
+            receipt: Its receipt
+            payouts: [{"payout_id", "settlement_batch_id", "detail_ids"}] paid by the transaction
+            gas_price: Gas price of the transaction, for receipts without effectiveGasPrice
+
+        Returns:
+            {"success", "tx_hash", "status", ...}
+        """
+        executed_at = datetime.now()
+        effective_gas_price = receipt.get("effectiveGasPrice", gas_price)
+        gas_fee_share = (receipt.gasUsed * effective_gas_price) // len(payouts)
+
+        if receipt.status != 1:
+            logger.error(f"[Payout] Payout transaction {tx_hash} reverted")
+            # Nothing was paid: the details are picked up by the next cycle
+            self._release_for_retry(payouts, PayoutStatus.failed, gas_fee_paid=gas_fee_share, executed_at=executed_at)
+            return {"success": False, "tx_hash": tx_hash, "status": "failed"}
+
+        finality_status = await self._finality_status(receipt.blockNumber)
+        for payout in payouts:
+            update_payout_instruction(
+                payout["payout_id"], status=PayoutStatus.confirmed,
+                gas_fee_paid=gas_fee_share, executed_at=executed_at, finality_status=finality_status
+            )
+            update_settlement_batch_status(payout["settlement_batch_id"], SettlementBatchStatus.released)
+            update_settlement_details(
+                payout["detail_ids"], SettlementDetailStatus.released,
+                tx_hash=tx_hash, settled_at=executed_at
+            )
+
+        return {
+            "success": True,
+            "tx_hash": tx_hash,
+            "status": "confirmed",
+            "gas_used": receipt.gasUsed,
+            "finality_status": finality_status.value
+        }
+
+    async def _ensure_disperse_allowance(self, total: int):
+        """Approve the disperse contract once (max allowance) when the current allowance is too low"""
+        token_contract = self.handler.usdc_contract
+        allowance = await asyncio.to_thread(
+            token_contract.functions.allowance(self.relayer.address, self.disperse_contract.address).call
+        )
+        if allowance >= total:
+            return
+        logger.info(f"[Payout] Approving disperse contract {self.disperse_contract.address} for {self.token}")
+        approve = token_contract.functions.approve(self.disperse_contract.address, 2 ** 256 - 1)
+
+        def build_approve(nonce: int, gas_price: int) -> Dict[str, Any]:
+            return approve.build_transaction({
+                'from': self.relayer.address,
+                'gas': 100000,
+                'gasPrice': gas_price,
+                'nonce': nonce
+            })
+
+        tx_hash, _ = await self.handler._send_transaction(self.relayer, build_approve)
+        tx_hash = tx_hash.hex()
+        receipt = await self._wait_for_receipt(tx_hash)
+        if receipt is None:
+            raise Exception(f"Approve for disperse contract not confirmed yet: {tx_hash}")
+        if receipt.status != 1:
+            raise Exception(f"Approve for disperse contract failed: {tx_hash}")
+
+    async def _wait_for_receipt(self, tx_hash: str, max_attempts: int = 60, interval_seconds: int = 2):
+        """Poll for a receipt off the event loop (about 2 minutes by default)"""
+        for _ in range(max_attempts):
+            try:
+                receipt = await asyncio.to_thread(self.w3.eth.get_transaction_receipt, tx_hash)
+                if receipt:
+                    return receipt
+            except Exception:
+                pass  # Not mined yet
+            await asyncio.sleep(interval_seconds)
+        return None
+
+    async def _finality_status(self, block_number: int) -> FinalityStatus:
+        """Map a block number to the chain's safe/finalized checkpoints"""
+        try:
+            if block_number <= (await asyncio.to_thread(self.w3.eth.get_block, "finalized")).number:
+                return FinalityStatus.finalized
+            if block_number <= (await asyncio.to_thread(self.w3.eth.get_block, "safe")).number:
+                return FinalityStatus.safe
+        except Exception as e:
+            logger.info(f"[Payout] Finality tags not supported on {self.network}: {e}")
+        return FinalityStatus.pending
+
+
+async def run_payout_loop(network: str, token: str, interval_seconds: int = PAYOUT_INTERVAL_SECONDS):
+    """
+    Run payout cycles forever (intended as a background task)
+
+    Args:
+        network: Network name (EVM or Solana)
+        token: Token symbol
+        interval_seconds: Pause between cycles
+    """
+    try:
+        if network.startswith("solana"):
+            from services.non_custodial.solana_payout_executor import SolanaPayoutExecutor
+            executor = SolanaPayoutExecutor(network=network, token=token)
+        else:
+            executor = PayoutExecutor(network=network, token=token)
+    except Exception as e:
+        logger.error(f"[Payout] No payout loop for {network}/{token}: {e}")
+        return
+    logger.info(f"[Payout] Batched payout loop started for {network}/{token} (every {interval_seconds}s)")
+    while True:
+        try:
+            result = await executor.run_once()
+            if result.get("payees"):
+                logger.info(f"[Payout] Cycle result for {network}/{token}: {result}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Payout] Payout cycle failed for {network}/{token}: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def start_payout_loops(tokens: List[str] = None) -> List[asyncio.Task]:
+    """
+    Start one background payout loop per configured network and token (no-op unless PAYOUT_MODE=BATCH)
+
+    Args:
+        tokens: Token symbols (defaults to PAYOUT_TOKENS)
+
+    Returns:
+        The started tasks (cancel them on shutdown)
+    """
+    if not is_batch_payout_enabled():
+        return []
+    return [
+        asyncio.create_task(run_payout_loop(network, token))
+        for network in PAYOUT_NETWORKS
+        for token in (tokens or PAYOUT_TOKENS)
+    ]
+
+
+async def stop_payout_loops(tasks: List[asyncio.Task]):
+    """Cancel payout loops started by start_payout_loops"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,214 @@
+"""
+Local EIP-2612 Permit Validator (No RPC Round Trip)
+
+Rebuilds the EIP-712 Permit digest from cached domain data and recovers the signer
+with eth_account, so invalid permits are rejected before any eth_call or transaction:
+
+- Deadline: checked against local time (with a small safety margin)
+- Signature: v/r/s shape, low-s (EIP-2) and recovered signer == owner
+- Nonce: compared against the owner's nonce in the shared permit nonce tracker; a permit
+  whose signing nonce is known (payment.permit_nonce, reserved by execute_sign.sign) is checked
+  with that nonce, so permits signed ahead of the current nonce are told apart from bad ones
+
+Only cold data is read from the chain: the token's DOMAIN_SEPARATOR (once per token)
+and an owner's permit nonce (on first use, and once more before rejecting a signature,
+in case the cached nonce is stale).
+"""
+from log import logger
+import time
+from typing import Dict, Any, Optional
+from eth_account import Account
+from web3 import Web3
+
+from services.blockchain_errors import BlockchainErrorCode
+from services.eip712 import build_domain_separator, build_permit_struct_hash, signable_message
+from services.permit_nonce_tracker import get_permit_nonce_tracker
+
+# secp256k1 group order / 2 (EIP-2: signatures with a higher s are malleable and rejected by OpenZeppelin/USDC)
+SECP256K1_HALF_N = 0x7fffffffffffffffffffffffffffffff5d576e7357a4501ddfe92f46681b20a0
+
+# Permits expiring within this many seconds would likely expire before inclusion
+DEADLINE_MARGIN_SECONDS = 30
+
+PERMIT_VALIDATOR_ABI = [
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "DOMAIN_SEPARATOR",
+        "outputs": [{"name": "", "type": "bytes32"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [{"name": "owner", "type": "address"}],
+        "name": "nonces",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "name",
+        "outputs": [{"name": "", "type": "string"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+def _to_bytes32(value: str) -> bytes:
+    value = value[2:] if value.startswith("0x") else value
+    return bytes.fromhex(value.rjust(64, "0"))
+
+
+class PermitValidator:
+    """Validates EIP-2612 permits for one token locally"""
+
+    def __init__(self, w3: Web3, token_address: str, chain_id: int, version: str, name: Optional[str] = None):
+        """
+        Initialize the validator
+
+        Args:
+            w3: Web3 instance (only used for the cold DOMAIN_SEPARATOR / nonces reads)
+            token_address: Token contract address
+            chain_id: EVM chain id
+            version: EIP-712 domain version of the token
+            name: EIP-712 domain name (read on-chain when the contract has no DOMAIN_SEPARATOR)
+        """
+        self.w3 = w3
+        self.token_address = Web3.to_checksum_address(token_address)
+        self.chain_id = chain_id
+        self.version = version
+        self.name = name
+        self.contract = w3.eth.contract(address=self.token_address, abi=PERMIT_VALIDATOR_ABI)
+        self._domain_separator: Optional[bytes] = None
+        self.nonce_tracker = get_permit_nonce_tracker()
+
+    @property
+    def domain_separator(self) -> bytes:
+        """The token's domain separator (read once, then cached)"""
+        if self._domain_separator is None:
+            try:
+                self._domain_separator = bytes(self.contract.functions.DOMAIN_SEPARATOR().call())
+            except Exception as e:
+                logger.info(f"[Permit] DOMAIN_SEPARATOR() unavailable for {self.token_address}, computing locally: {e}")
+                name = self.name or self.contract.functions.name().call()
+                self._domain_separator = build_domain_separator(name, self.version, self.chain_id, self.token_address)
+        return self._domain_separator
+
+    def get_nonce(self, owner: str, refresh: bool = False) -> int:
+        """Cached permit nonce of an owner (read from the token on first use or when refresh=True)"""
+        return self.nonce_tracker.get(
+            self.chain_id, self.token_address, owner,
+            lambda: self.contract.functions.nonces(Web3.to_checksum_address(owner)).call(),
+            refresh=refresh
+        )
+
+    def mark_nonce_used(self, owner: str):
+        """Advance the cached nonce after a permit of this owner was confirmed"""
+        self.nonce_tracker.increment(self.chain_id, self.token_address, owner)
+
+    def invalidate_nonce(self, owner: str):
+        """Drop the cached nonce so the next validation reads it from the chain"""
+        self.nonce_tracker.invalidate(self.chain_id, self.token_address, owner)
+
+    def recover_signer(self, owner: str, spender: str, value: int, nonce: int, deadline: int, v: int, r: str, s: str) -> str:
+        """Recover the address that signed the Permit with the given nonce"""
+        struct_hash = build_permit_struct_hash(owner, spender, value, nonce, deadline)
+        message = signable_message(self.domain_separator, struct_hash)
+        return Account.recover_message(message, vrs=(v, _to_bytes32(r), _to_bytes32(s)))
+
+    def validate(self, owner: str, spender: str, value: int, deadline: int, v: int, r: str, s: str,
+                 nonce: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Validate a permit without submitting anything
+
+        Args:
+            owner: Token holder's address
+            spender: Authorized address
+            value: Authorization amount (smallest unit)
+            deadline: Expiration timestamp
+            v, r, s: Signature parameters
+            nonce: Nonce the permit was signed with, if known. A permit signed ahead of the
+                owner's current nonce fails with NONCE_TOO_HIGH (retryable: an earlier permit
+                of the owner has to land first), one below it with SIGNATURE_ALREADY_USED
+
+        Returns:
+            {"success": True, "nonce": int} or {"success": False, "error": str, "error_code": str, "message": str}
+        """
+        if int(deadline) <= int(time.time()) + DEADLINE_MARGIN_SECONDS:
+            return self._failure(BlockchainErrorCode.SIGNATURE_EXPIRED, f"Permit deadline {deadline} has passed or expires too soon")
+
+        try:
+            value = int(value)
+            v = int(v)
+            if v < 27:
+                v += 27
+            if v not in (27, 28) or not 0 <= value < 2 ** 256:
+                raise ValueError(f"v={v}, value={value}")
+            s_value = int.from_bytes(_to_bytes32(s), "big")
+            if s_value == 0 or s_value > SECP256K1_HALF_N:
+                raise ValueError("non-canonical s")
+        except Exception as e:
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Malformed permit signature: {e}")
+
+        owner_checksum = Web3.to_checksum_address(owner)
+        if nonce is not None:
+            return self._validate_signed_nonce(owner_checksum, spender, value, deadline, v, r, s, int(nonce))
+        nonce = self.get_nonce(owner_checksum)
+        try:
+            signer = self.recover_signer(owner_checksum, spender, value, nonce, deadline, v, r, s)
+            if signer != owner_checksum:
+                # The cached nonce may be stale (e.g. a permit was submitted elsewhere), check once against the chain
+                fresh_nonce = self.get_nonce(owner_checksum, refresh=True)
+                if fresh_nonce != nonce:
+                    nonce = fresh_nonce
+                    signer = self.recover_signer(owner_checksum, spender, value, nonce, deadline, v, r, s)
+        except Exception as e:
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Failed to recover permit signer: {e}")
+
+        if signer != owner_checksum:
+            return self._failure(
+                BlockchainErrorCode.INVALID_SIGNATURE,
+                f"Recovered signer {signer} does not match owner {owner_checksum} (nonce {nonce})"
+            )
+        return {"success": True, "nonce": nonce}
+
+    def _validate_signed_nonce(self, owner: str, spender: str, value: int, deadline: int, v: int, r: str, s: str,
+                               nonce: int) -> Dict[str, Any]:
+        current = self.get_nonce(owner)
+        if nonce != current:
+            # The cached nonce may lag behind permits confirmed elsewhere
+            current = self.get_nonce(owner, refresh=True)
+        if nonce < current:
+            return self._failure(
+                BlockchainErrorCode.SIGNATURE_ALREADY_USED,
+                f"Permit nonce {nonce} of {owner} was already used (current nonce {current})"
+            )
+        if nonce > current:
+            return self._failure(
+                BlockchainErrorCode.NONCE_TOO_HIGH,
+                f"Permit nonce {nonce} of {owner} is ahead of the current nonce {current}, an earlier permit has to land first"
+            )
+        try:
+            signer = self.recover_signer(owner, spender, value, nonce, deadline, v, r, s)
+        except Exception as e:
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Failed to recover permit signer: {e}")
+        if signer != owner:
+            return self._failure(
+                BlockchainErrorCode.INVALID_SIGNATURE,
+                f"Recovered signer {signer} does not match owner {owner} (nonce {nonce})"
+            )
+        return {"success": True, "nonce": nonce}
+
+    @staticmethod
+    def _failure(error_code: BlockchainErrorCode, error: str) -> Dict[str, Any]:
+        logger.warning(f"[Permit] Local validation failed [{error_code.code}]: {error}")
+        return {
+            "success": False,
+            "error": error,
+            "error_code": error_code.code,
+            "message": error_code.desc
+        }
@@ -0,0 +1,282 @@
+"""
+EVM Relayer Pool (Multi-Spender Wallet Sharding)
+
+Instead of a single SPENDER_KEY, every EVM chain can be served by a pool of
+spender/relayer wallets. Each relayer keeps its own nonce stream and gas balance,
+so permit and transferFrom transactions for different payments are no longer
+serialized behind one account.
+
+Configuration (.env), first match wins:
+- <CHAIN>_SPENDER_KEYS: Comma-separated relayer keys for one chain (e.g. SEPOLIA_SPENDER_KEYS)
+- SPENDER_KEYS: Comma-separated relayer keys shared by all EVM chains
+- SPENDER_KEY / PRIVATE_KEY: Single relayer (original behaviour)
+- RELAYER_AFFINITY_MAX_OWNERS: Owners whose relayer is remembered per chain, least recently used dropped first (default: 10000)
+
+With a remote signer (SIGNER_BACKEND=remote/batching) the keys stay in the signer process and
+the pool is built from addresses instead: <CHAIN>_RELAYER_ADDRESSES, RELAYER_ADDRESSES or
+SPENDER_WALLET_ADDRESS.
+
+Assignment Rules:
+- The permit names the assigned relayer as spender, so the same relayer must later call transferFrom
+- An owner is kept on the relayer it used before (existing allowance can be reused), as long as
+  it is among the RELAYER_AFFINITY_MAX_OWNERS most recent owners of the chain
+- Otherwise the relayer with the fewest in-flight payments and enough gas is chosen
+  (gas balances are kept current by the background monitor, see gas_balance_monitor.py)
+- In-flight payments are the ones this process assigned and has not persisted yet, plus the
+  unfinished persisted payments naming the relayer (passed in by the caller), so the load of
+  payments settled by other processes or resumed after a restart is counted as well
+"""
+from log import logger
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+from web3 import Web3
+
+from services.signer import SIGNER_BACKEND, BaseSigner, create_signer
+
+# Load environment variables
+load_dotenv()
+
+# Per-chain relayer key variables (follows the naming of the *_RPC_URL variables)
+RELAYER_KEY_ENVS = {
+    "sepolia": "SEPOLIA_SPENDER_KEYS",
+    "basesepolia": "BASE_SEPOLIA_SPENDER_KEYS",
+    "bnbtestnet": "BNBChain_Testnet_SPENDER_KEYS",
+}
+
+RELAYER_ADDRESS_ENVS = {
+    "sepolia": "SEPOLIA_RELAYER_ADDRESSES",
+    "basesepolia": "BASE_SEPOLIA_RELAYER_ADDRESSES",
+    "bnbtestnet": "BNBChain_Testnet_RELAYER_ADDRESSES",
+}
+
+# Relayers below this native balance (ETH/BNB) are skipped when assigning new payments
+DEFAULT_MIN_GAS_BALANCE = float(os.getenv("RELAYER_MIN_GAS_BALANCE", "0.0001"))
+RELAYER_AFFINITY_MAX_OWNERS = int(os.getenv("RELAYER_AFFINITY_MAX_OWNERS", "10000"))
+
+
+def _normalize_key(private_key: str) -> str:
+    private_key = private_key.strip()
+    if not private_key.startswith("0x"):
+        private_key = f"0x{private_key}"
+    return private_key
+
+
+def load_relayer_keys(network: str) -> List[str]:
+    """
+    Load the relayer private keys configured for a network
+
+    Args:
+        network: Network name (sepolia, basesepolia, bnbtestnet)
+
+    Returns:
+        List of 0x-prefixed private keys (may be empty)
+    """
+    raw_keys = os.getenv(RELAYER_KEY_ENVS.get(network, "")) or os.getenv("SPENDER_KEYS")
+    if raw_keys:
+        keys = [key for key in raw_keys.split(",") if key.strip()]
+    else:
+        single_key = os.getenv("SPENDER_KEY") or os.getenv("PRIVATE_KEY")
+        keys = [single_key] if single_key else []
+    return [_normalize_key(key) for key in keys]
+
+
+def load_relayer_signers(network: str) -> List[BaseSigner]:
+    """
+    Build the relayer signers of a network for the configured SIGNER_BACKEND
+
+    Args:
+        network: Network name (sepolia, basesepolia, bnbtestnet)
+
+    Returns:
+        List of signers (may be empty)
+    """
+    keys = load_relayer_keys(network)
+    if SIGNER_BACKEND == "local" or keys:
+        return [create_signer(key) for key in keys]
+    raw_addresses = os.getenv(RELAYER_ADDRESS_ENVS.get(network, "")) or os.getenv("RELAYER_ADDRESSES") or os.getenv("SPENDER_WALLET_ADDRESS") or ""
+    return [create_signer(address=address.strip()) for address in raw_addresses.split(",") if address.strip()]
+
+
+class Relayer:
+    """A single spender wallet with its own nonce stream and gas balance"""
+
+    def __init__(self, signer: BaseSigner):
+        # Signer with the LocalAccount surface (address, sign_transaction)
+        self.account = signer
+        self.address = signer.address
+        self.in_flight = 0
+        self.gas_balance: Optional[float] = None
+        self._next_nonce: Optional[int] = None
+        self._reserved: Set[int] = set()  # Handed out, not broadcast yet
+        self._released: List[int] = []  # Handed out, given back unused
+        self._resync = False
+        self._nonce_lock = threading.Lock()
+
+    def next_nonce(self, w3: Web3) -> int:
+        """
+        Reserve the next transaction nonce for this relayer
+
+        The first call reads the pending nonce from the chain; later calls are served locally,
+        nonces given back unused first so the stream has no gaps. After a resync request the
+        pending nonce is read again, without handing out nonces other payments still hold.
+        """
+        with self._nonce_lock:
+            if self._next_nonce is None or self._resync:
+                pending = w3.eth.get_transaction_count(self.address, 'pending')
+                if self._next_nonce is None or not self._reserved:
+                    self._next_nonce = pending
+                    self._released = []
+                else:
+                    self._next_nonce = max(pending, self._next_nonce)
+                    self._released = [nonce for nonce in self._released if nonce >= pending]
+                self._resync = False
+            if self._released:
+                nonce = min(self._released)
+                self._released.remove(nonce)
+            else:
+                nonce = self._next_nonce
+                self._next_nonce += 1
+            self._reserved.add(nonce)
+            return nonce
+
+    def mark_sent(self, nonce: int):
+        """The transaction holding a reserved nonce was broadcast (or may have been)"""
+        with self._nonce_lock:
+            self._reserved.discard(nonce)
+
+    def release_nonce(self, nonce: int, resync: bool = False):
+        """
+        Give back a reserved nonce that was not used
+
+        Args:
+            nonce: The reserved nonce
+            resync: Also read the pending nonce again before the next reservation (node rejected the nonce)
+        """
+        with self._nonce_lock:
+            self._reserved.discard(nonce)
+            self._released.append(nonce)
+            self._resync = self._resync or resync
+
+    def reset_nonce(self):
+        """Resync the nonce stream from the chain before the next reservation"""
+        with self._nonce_lock:
+            self._resync = True
+
+    def update_gas_balance(self, balance: float):
+        self.gas_balance = balance
+
+    def __repr__(self) -> str:
+        return f"Relayer(address={self.address}, in_flight={self.in_flight}, gas_balance={self.gas_balance})"
+
+
+class RelayerPool:
+    """Load-balanced pool of relayers for one EVM chain"""
+
+    def __init__(self, network: str, signers: List[BaseSigner], min_gas_balance: float = DEFAULT_MIN_GAS_BALANCE):
+        """
+        Initialize the relayer pool
+
+        Args:
+            network: Network name (sepolia, basesepolia, bnbtestnet)
+            signers: Relayer signers (at least one)
+            min_gas_balance: Relayers below this native balance receive no new payments
+        """
+        if not signers:
+            raise ValueError("SPENDER_KEY or PRIVATE_KEY not configured")
+
+        self.network = network
+        self.min_gas_balance = min_gas_balance
+        self.relayers: List[Relayer] = [Relayer(signer) for signer in signers]
+        self._by_address: Dict[str, Relayer] = {relayer.address.lower(): relayer for relayer in self.relayers}
+        # Owner -> relayer it authorized, least recently assigned first
+        self._owner_affinity: "OrderedDict[str, Relayer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        logger.info(f">>> [Relayer] {network} pool ready with {len(self.relayers)} relayer(s): {self.addresses}")
+
+    @property
+    def default(self) -> Relayer:
+        return self.relayers[0]
+
+    @property
+    def addresses(self) -> List[str]:
+        return [relayer.address for relayer in self.relayers]
+
+    def get(self, address: Optional[str]) -> Optional[Relayer]:
+        """Look up the relayer owning an address (None if it is not part of the pool)"""
+        if not address:
+            return None
+        return self._by_address.get(address.lower())
+
+    def has_gas(self, relayer: Relayer) -> bool:
+        # Unknown balance counts as healthy until it has been read once
+        return relayer.gas_balance is None or relayer.gas_balance >= self.min_gas_balance
+
+    def assign(self, owner: Optional[str] = None, persisted_in_flight: Optional[Dict[str, int]] = None) -> Relayer:
+        """
+        Assign a relayer to a new payment
+
+        Args:
+            owner: Token holder address; keeps the owner on the relayer it already authorized
+            persisted_in_flight: Unfinished persisted payments per relayer (lowercase address)
+
+        Returns:
+            The relayer that must be named as spender in the permit
+        """
+        persisted_in_flight = persisted_in_flight or {}
+
+        def load(relayer: Relayer) -> int:
+            return relayer.in_flight + persisted_in_flight.get(relayer.address.lower(), 0)
+
+        with self._lock:
+            owner_key = owner.lower() if owner else None
+            relayer = self._owner_affinity.get(owner_key) if owner_key else None
+            if relayer is None or not self.has_gas(relayer):
+                candidates = [r for r in self.relayers if self.has_gas(r)]
+                if not candidates:
+                    logger.error(f"[Relayer] Every {self.network} relayer is below {self.min_gas_balance} gas, assigning anyway")
+                    candidates = self.relayers
+                relayer = min(candidates, key=load)
+            if owner_key:
+                self._owner_affinity[owner_key] = relayer
+                self._owner_affinity.move_to_end(owner_key)
+                while len(self._owner_affinity) > RELAYER_AFFINITY_MAX_OWNERS:
+                    self._owner_affinity.popitem(last=False)
+            relayer.in_flight += 1
+            logger.info(f"[Relayer] Assigned {relayer.address} on {self.network} (owner: {owner}, in-flight: {load(relayer)})")
+            return relayer
+
+    def release(self, address: Optional[str]):
+        """Mark a payment previously assigned to a relayer as finished (or persisted, then it is counted from the DB)"""
+        relayer = self.get(address)
+        if relayer:
+            with self._lock:
+                relayer.in_flight = max(0, relayer.in_flight - 1)
+
+
+# ==================== Global Pool Cache ====================
+
+_relayer_pools: Dict[str, RelayerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_relayer_pool(network: str) -> RelayerPool:
+    """
+    Get (or lazily build) the relayer pool for an EVM network
+
+    Args:
+        network: Network name (sepolia, basesepolia, bnbtestnet)
+
+    Returns:
+        RelayerPool instance
+    """
+    network = network.lower()
+    with _pools_lock:
+        pool = _relayer_pools.get(network)
+        if pool is None:
+            pool = RelayerPool(network, load_relayer_signers(network))
+            _relayer_pools[network] = pool
+        return pool
@@ -0,0 +1,492 @@
+"""
+Batched Solana Payouts (v0 Transactions + Address Lookup Table)
+
+Solana counterpart of payout_executor.py: in batch payout mode the Solana deposits are
+collected in the fee payer's token account and paid out per payee by this executor:
+
+1. Claims ready settlement details of the cluster and mint and aggregates them per payee
+2. Packs one transfer_checked per payee (plus an idempotent create of the payee's token
+   account when it is not known to exist) into v0 transactions, as many as fit the
+   1232-byte packet limit and the compute budget
+3. Resolves the mint, programs, the payout token account and known payee token accounts
+   through an address lookup table (1-byte index instead of a 32-byte key), so one
+   transaction carries several times more transfers than a legacy one
+4. Signs once per transaction and confirms all of them through the batched confirmation tracker
+
+A payout whose send had no clear answer stays in flight (details 'releasing', instruction
+submitted with its signature) until it lands or its blockhash expires; each cycle first
+reconciles the submitted payouts of earlier cycles from their signature statuses.
+
+The lookup table is created on first use (set SOLANA_PAYOUT_LOOKUP_TABLE to reuse it after
+a restart) and extended with new payee token accounts after each cycle. Extended addresses
+become active one slot later, so they are used from the next cycle on.
+
+Configuration (.env):
+- SOLANA_PAYOUT_LOOKUP_TABLE: Address lookup table owned by the fee payer (default: created on first use)
+- SOLANA_PAYOUT_MAX_TRANSFERS: Max transfers per transaction (default: 64)
+- SOLANA_PAYOUT_CONFIRM_TIMEOUT_SECONDS: Max wait for a payout confirmation (default: 120)
+- SOLANA_PAYOUT_EXPIRY_SECONDS: After a restart, age after which an unknown payout signature counts as expired (default: 300)
+"""
+from log import logger
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from dao.model import (
+    SettlementBatch, PayoutInstruction, SettlementBatchStatus,
+    SettlementDetailStatus, PayoutStatus, FinalityStatus
+)
+from dao.app import (
+    claim_ready_settlement_details, update_settlement_details,
+    add_payout_batch, update_payout_instruction, update_settlement_batch_status,
+    get_submitted_payout_instructions, get_settlement_detail_ids
+)
+from services.constants import ChainID, get_token_asset_id
+from services.crypto_executor import get_crypto_executor
+from services.solana_priority_fees import MAX_COMPUTE_UNITS
+from services.solana_confirmation_tracker import MAX_SIGNATURES_PER_REQUEST
+from services.non_custodial.payout_executor import group_details_by_payee
+
+try:
+    from solders.address_lookup_table_account import AddressLookupTable, AddressLookupTableAccount  # type: ignore
+    from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
+    from solders.hash import Hash  # type: ignore
+    from solders.message import Message, MessageV0, to_bytes_versioned  # type: ignore
+    from solders.pubkey import Pubkey  # type: ignore
+    from solders.signature import Signature  # type: ignore
+    from solders.system_program import ID as SYSTEM_PROGRAM_ID, create_lookup_table, extend_lookup_table  # type: ignore
+    from solders.transaction import Transaction  # type: ignore
+    from solana.rpc.commitment import Finalized  # type: ignore
+    from solana.rpc.core import RPCException  # type: ignore
+    from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID  # type: ignore
+    from spl.token.instructions import (  # type: ignore
+        get_associated_token_address, transfer_checked, TransferCheckedParams,
+        create_idempotent_associated_token_account
+    )
+except ImportError:
+    pass
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_PAYOUT_LOOKUP_TABLE = os.getenv("SOLANA_PAYOUT_LOOKUP_TABLE")
+SOLANA_PAYOUT_MAX_TRANSFERS = int(os.getenv("SOLANA_PAYOUT_MAX_TRANSFERS", "64"))
+SOLANA_PAYOUT_CONFIRM_TIMEOUT_SECONDS = float(os.getenv("SOLANA_PAYOUT_CONFIRM_TIMEOUT_SECONDS", "120"))
+SOLANA_PAYOUT_EXPIRY_SECONDS = float(os.getenv("SOLANA_PAYOUT_EXPIRY_SECONDS", "300"))
+
+# Max serialized transaction size (IPv6 MTU minus headers)
+PACKET_DATA_SIZE = 1232
+# Max addresses per lookup table, and per extend transaction (keeps it within the packet limit)
+LOOKUP_TABLE_MAX_ADDRESSES = 256
+LOOKUP_TABLE_EXTEND_CHUNK = 20
+# Compute units budgeted per instruction (transfer_checked ~6k, ATA create ~25k)
+COMPUTE_UNITS_BASE = 5000
+COMPUTE_UNITS_PER_TRANSFER = 8000
+COMPUTE_UNITS_PER_ATA_CREATE = 30000
+# Base fee per signature (lamports)
+LAMPORTS_PER_SIGNATURE = 5000
+
+
+def transaction_size(message) -> int:
+    """Serialized size of a transaction signed by all of the message's required signers"""
+    signatures = message.header.num_required_signatures
+    return 1 + 64 * signatures + len(to_bytes_versioned(message))
+
+
+def pack_payout_transfers(fee_payer, transfers: List[Tuple[List, int]], lookup_tables: List,
+                          max_transfers: int = SOLANA_PAYOUT_MAX_TRANSFERS) -> List[List[int]]:
+    """
+    Split transfers into v0 transactions that fit the packet limit and compute budget
+
+    Args:
+        fee_payer: Fee payer Pubkey
+        transfers: (instructions, compute units) per payee
+        lookup_tables: AddressLookupTableAccounts the messages are compiled with
+        max_transfers: Max transfers per transaction
+
+    Returns:
+        Index lists into transfers, one per transaction
+    """
+    # Size is independent of the actual blockhash and budget values
+    budget_ixs = [set_compute_unit_limit(MAX_COMPUTE_UNITS), set_compute_unit_price(0)]
+    placeholder_blockhash = Hash.default()
+
+    batches: List[List[int]] = []
+    current: List[int] = []
+    instructions: List = []
+    units = COMPUTE_UNITS_BASE
+    for index, (transfer_ixs, transfer_units) in enumerate(transfers):
+        if current and len(current) < max_transfers and units + transfer_units <= MAX_COMPUTE_UNITS:
+            message = MessageV0.try_compile(fee_payer, budget_ixs + instructions + transfer_ixs, lookup_tables, placeholder_blockhash)
+            if transaction_size(message) <= PACKET_DATA_SIZE:
+                current.append(index)
+                instructions += transfer_ixs
+                units += transfer_units
+                continue
+        if current:
+            batches.append(current)
+        current, instructions, units = [index], list(transfer_ixs), COMPUTE_UNITS_BASE + transfer_units
+    if current:
+        batches.append(current)
+    return batches
+
+
+class SolanaPayoutExecutor:
+    """Sends aggregated settlement payouts of one Solana cluster/token as packed v0 transactions"""
+
+    def __init__(self, network: str = "solana-devnet", token: str = "USDC"):
+        """
+        Initialize the payout executor
+
+        Args:
+            network: Solana network name (solana-devnet)
+            token: Token symbol (USDC)
+        """
+        # Imported here to avoid a circular import with the handler factory
+        from services.non_custodial.transfer_handler import create_handler
+
+        self.network = network.lower()
+        self.token = token.upper()
+        self.chain_id = ChainID.get(self.network)
+        if not self.chain_id:
+            raise ValueError(f"No chain_id mapping for network: {self.network}")
+
+        self.handler = create_handler(network=self.network, token=self.token)
+        if not self.handler or self.handler.get_protocol_type() != "solana":
+            raise ValueError(f"Solana transfer handler not available for {self.network}/{self.token}")
+
+        # Payouts are funded from the fee payer's token account that collected the deposits
+        self.fee_payer = self.handler.backend_keypair
+        if self.handler.payee_pubkey != self.fee_payer.pubkey():
+            raise ValueError("Solana batch payouts require the deposits to be collected by the fee payer (PAYEE_ADDRESS unset)")
+        self.mint = self.handler.token_mint
+        # Only the settlement details of this mint are paid by this executor
+        self.asset_id = get_token_asset_id(self.chain_id, str(self.mint))
+        self.decimals = self.handler.token_config["decimals"]
+        self.source = get_associated_token_address(self.fee_payer.pubkey(), self.mint)
+        self.lookup_table_address = Pubkey.from_string(SOLANA_PAYOUT_LOOKUP_TABLE) if SOLANA_PAYOUT_LOOKUP_TABLE else None
+        # Last valid block height of the blockhash of each payout sent by this process
+        self._in_flight: Dict[str, int] = {}
+
+    @property
+    def client(self):
+        return self.handler.client
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Execute one payout cycle: reconcile earlier payouts, then pay all ready settlement details of the cluster/mint
+
+        Returns:
+            Summary of the cycle (payees, transactions, failures, reconciled payouts)
+        """
+        reconciled = await self.reconcile_submitted()
+        details = claim_ready_settlement_details(self.chain_id, self.asset_id)
+        if not details:
+            return {"success": True, "payees": 0, "transactions": [], "reconciled": reconciled,
+                    "message": "No ready settlement details"}
+
+        groups = group_details_by_payee(details, normalize=str)
+        payees = []
+        for payee, group in groups.items():
+            try:
+                Pubkey.from_string(payee)
+            except ValueError:
+                # Cannot be paid on this cluster at all: failed for manual handling instead of being claimed again
+                logger.error(f"[Payout] Invalid Solana payee address {payee}, marking its settlement details failed")
+                update_settlement_details(group["detail_ids"], SettlementDetailStatus.failed)
+                continue
+            if group["amount"] > 0:
+                payees.append(payee)
+            else:
+                # The claim only takes payees with a positive total, unless its limit cut their details short
+                logger.warning(f"[Payout] Skip Solana payee {payee} with non-positive net amount in this cycle")
+                update_settlement_details(group["detail_ids"], SettlementDetailStatus.ready)
+
+        try:
+            lookup_table = await self._load_lookup_table()
+        except Exception as e:
+            logger.warning(f"[Payout] Payout lookup table unavailable, packing without it: {e}")
+            lookup_table = None
+        lookup_tables = [lookup_table] if lookup_table else []
+        transfers = await asyncio.gather(*[self._transfer_instructions(payee, groups[payee]["amount"]) for payee in payees])
+        batches = pack_payout_transfers(self.fee_payer.pubkey(), transfers, lookup_tables)
+        logger.info(f"[Payout] Packed {len(payees)} Solana payee(s) into {len(batches)} v0 transaction(s) on {self.network}")
+
+        transactions = await asyncio.gather(*[
+            self._pay_batch({payees[i]: groups[payees[i]] for i in batch}, [transfers[i] for i in batch], lookup_tables)
+            for batch in batches
+        ])
+
+        # Known payee token accounts join the lookup table for the next cycles
+        try:
+            await self._extend_lookup_table(lookup_table, [get_associated_token_address(Pubkey.from_string(p), self.mint) for p in payees])
+        except Exception as e:
+            logger.warning(f"[Payout] Failed to extend the payout lookup table: {e}")
+
+        return {
+            "success": all(tx.get("success") for tx in transactions),
+            "payees": len(payees),
+            "settlements": len(details),
+            "transactions": list(transactions),
+            "reconciled": reconciled
+        }
+
+    async def _transfer_instructions(self, payee: str, amount: int) -> Tuple[List, int]:
+        """transfer_checked to the payee's token account (created idempotently unless known to exist)"""
+        payee_pubkey = Pubkey.from_string(payee)
+        payee_token_account = get_associated_token_address(payee_pubkey, self.mint)
+        instructions = []
+        units = COMPUTE_UNITS_PER_TRANSFER
+        if not await self.handler.ata_cache.exists(payee_pubkey, self.mint, payee_token_account):
+            instructions.append(create_idempotent_associated_token_account(
+                payer=self.fee_payer.pubkey(), owner=payee_pubkey, mint=self.mint
+            ))
+            units += COMPUTE_UNITS_PER_ATA_CREATE
+        instructions.append(transfer_checked(TransferCheckedParams(
+            program_id=TOKEN_PROGRAM_ID, source=self.source, mint=self.mint, dest=payee_token_account,
+            owner=self.fee_payer.pubkey(), amount=amount, decimals=self.decimals
+        )))
+        return instructions, units
+
+    async def _pay_batch(self, chunk: Dict[str, Dict[str, Any]], transfers: List[Tuple[List, int]], lookup_tables: List) -> Dict[str, Any]:
+        """Pay one packed batch of payees with a single v0 transaction"""
+        recipients = list(chunk.keys())
+        total = sum(chunk[payee]["amount"] for payee in recipients)
+        now = datetime.now()
+
+        # 1. Persist one batch + payout instruction per payee
+        payouts = []
+        for payee in recipients:
+            group = chunk[payee]
+            settlement_batch = SettlementBatch(
+                tenant_id=str(self.fee_payer.pubkey()), merchant_id="zen7", payee_address=payee,
+                chain_id=self.chain_id, asset_id=self.asset_id, check_date=now.date(),
+                period_start=now, period_end=now, total_count=group["count"],
+                total_amount=group["gross"], fee_total=group["fee"], net_total=group["amount"],
+                settlement_status=SettlementBatchStatus.pending_payout
+            )
+            payout_instruction = PayoutInstruction(
+                to_address=payee, chain_id=self.chain_id, asset_id=self.asset_id,
+                amount=group["amount"], status=PayoutStatus.created,
+                finality_status=FinalityStatus.pending
+            )
+            payouts.append({**add_payout_batch(settlement_batch, payout_instruction, group["detail_ids"]),
+                            "payee": payee, "detail_ids": group["detail_ids"]})
+
+        # 2. Compile and sign the packed v0 transaction; its signature identifies it before it is sent
+        try:
+            compute_units = min(COMPUTE_UNITS_BASE + sum(units for _, units in transfers), MAX_COMPUTE_UNITS)
+            price = await self.handler.fee_oracle.get_fee()
+            instructions = [set_compute_unit_limit(compute_units), set_compute_unit_price(price)]
+            for transfer_ixs, _ in transfers:
+                instructions += transfer_ixs
+            recent_blockhash, last_valid_block_height = await self.handler.blockhash_cache.get_blockhash()
+            message = MessageV0.try_compile(self.fee_payer.pubkey(), instructions, lookup_tables, recent_blockhash)
+            transaction = await get_crypto_executor().sign_versioned(message, [self.fee_payer])
+            tx_hash = str(transaction.signatures[0])
+        except Exception as e:
+            logger.error(f"[Payout] Failed to build Solana payout for {len(recipients)} payee(s) on {self.network}: {e}")
+            self._release_for_retry(payouts, PayoutStatus.canceled)
+            return {"success": False, "error": str(e), "recipients": recipients}
+
+        # 3. Submit: only an error answer of the node means it was not sent; a timeout or a
+        # missing signature leaves the payout in flight until its blockhash expires
+        try:
+            response = await self.client.send_transaction(transaction)
+            if response.value is None:
+                raise Exception("Solana RPC returned a null signature")
+            if str(response.value) != tx_hash:
+                raise Exception(f"Solana RPC returned signature {response.value} for {tx_hash}")
+        except RPCException as e:
+            logger.error(f"[Payout] Solana payout for {len(recipients)} payee(s) rejected on {self.network}: {e}")
+            self._release_for_retry(payouts, PayoutStatus.canceled)
+            return {"success": False, "error": str(e), "recipients": recipients}
+        except Exception as e:
+            logger.error(f"[Payout] Solana payout {tx_hash} on {self.network} may have been sent, "
+                         f"kept in flight until its blockhash expires: {e}")
+
+        logger.info(f"[Payout] Submitted Solana payout {tx_hash} for {len(recipients)} payee(s), total {total} "
+                    f"({transaction_size(message)} bytes) on {self.network}")
+        self._in_flight[tx_hash] = last_valid_block_height
+        submitted_at = datetime.now()
+        for payout in payouts:
+            update_payout_instruction(
+                payout["payout_id"], status=PayoutStatus.submitted,
+                tx_hash=tx_hash, gas_estimate=compute_units // len(payouts), submitted_at=submitted_at
+            )
+
+        # 4. Wait for the confirmation and record fees and finality
+        poll = await self.handler.wait_for_transaction(tx_hash, timeout=SOLANA_PAYOUT_CONFIRM_TIMEOUT_SECONDS)
+        if poll is None:
+            logger.warning(f"[Payout] Solana payout {tx_hash} not confirmed yet, left as submitted for reconciliation")
+            return {"success": True, "tx_hash": tx_hash, "status": "pending", "recipients": recipients}
+        fee_lamports = LAMPORTS_PER_SIGNATURE + price * compute_units // 1_000_000
+        result = self._record_status(tx_hash, poll, payouts, gas_fee_paid=fee_lamports // len(payouts))
+        return {**result, "recipients": recipients, "fee_lamports": fee_lamports}
+
+    async def reconcile_submitted(self) -> int:
+        """
+        Resolve payouts left submitted by earlier cycles (not confirmed in time, unknown send outcome)
+
+        Landed payouts are recorded from their signature status. A signature the cluster does
+        not know is released for a new payout once its blockhash expired (block height past
+        the blockhash's last valid height; after a restart, SOLANA_PAYOUT_EXPIRY_SECONDS after
+        submission), since the transaction can no longer land.
+
+        Returns:
+            Number of payout transactions resolved
+        """
+        transactions: Dict[str, List[Dict[str, Any]]] = {}
+        for payout in get_submitted_payout_instructions(self.chain_id):
+            if payout.get("tx_hash"):
+                transactions.setdefault(payout["tx_hash"], []).append(payout)
+        if not transactions:
+            return 0
+
+        signatures = list(transactions.keys())
+        statuses = []
+        for start in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST):
+            response = await self.client.get_signature_statuses(
+                [Signature.from_string(signature) for signature in signatures[start:start + MAX_SIGNATURES_PER_REQUEST]],
+                search_transaction_history=True
+            )
+            statuses += list(response.value)
+        block_height = None
+
+        resolved = 0
+        for signature, status in zip(signatures, statuses):
+            instructions = transactions[signature]
+            payouts = [{**payout, "payee": payout["to_address"], "detail_ids": get_settlement_detail_ids(payout["settlement_batch_id"])}
+                       for payout in instructions]
+            if status is not None:
+                result = self.handler.confirmation_tracker.status_result(signature, status)
+                if result is not None:
+                    result = self._record_status(signature, result, payouts)
+                    logger.info(f"[Payout] Reconciled Solana payout {signature} on {self.network}: {result['status']}")
+                    resolved += 1
+                continue  # Landed, below the commitment level yet
+
+            last_valid_block_height = self._in_flight.get(signature)
+            if last_valid_block_height is not None:
+                if block_height is None:
+                    block_height = (await self.client.get_block_height()).value
+                expired = block_height > last_valid_block_height
+            else:
+                submitted_at = min(datetime.fromisoformat(payout["submitted_at"]) for payout in instructions)
+                expired = (datetime.now(submitted_at.tzinfo) - submitted_at).total_seconds() > SOLANA_PAYOUT_EXPIRY_SECONDS
+            if expired:
+                logger.warning(f"[Payout] Solana payout {signature} on {self.network} expired without landing, "
+                               f"its {len(payouts)} payee(s) are paid again by the next cycle")
+                self._in_flight.pop(signature, None)
+                self._release_for_retry(payouts, PayoutStatus.failed)
+                resolved += 1
+        return resolved
+
+    def _release_for_retry(self, payouts: List[Dict[str, Any]], status: PayoutStatus, **fields):
+        """Close the payouts and put their details back to ready for the next cycle"""
+        for payout in payouts:
+            update_payout_instruction(payout["payout_id"], status=status, **fields)
+            update_settlement_batch_status(payout["settlement_batch_id"], SettlementBatchStatus.failed)
+            update_settlement_details(payout["detail_ids"], SettlementDetailStatus.ready)
+
+    def _record_status(self, tx_hash: str, poll: Dict[str, Any], payouts: List[Dict[str, Any]], **fields) -> Dict[str, Any]:
+        """
+        Record the outcome of a landed payout transaction
+
+        Args:
+            tx_hash: Payout transaction signature
+            poll: Its status dict (confirmed / failed)
+            payouts: [{"payout_id", "settlement_batch_id", "payee", "detail_ids"}] paid by the transaction
+            fields: Extra payout instruction fields (gas_fee_paid when known)
+
+        Returns:
+            {"success", "tx_hash", "status", ...}
+        """
+        self._in_flight.pop(tx_hash, None)
+        executed_at = datetime.now()
+        if poll.get("status") != "confirmed":
+            logger.error(f"[Payout] Solana payout transaction {tx_hash} failed: {poll.get('message')}")
+            # Nothing was paid: the details are picked up by the next cycle
+            self._release_for_retry(payouts, PayoutStatus.failed, executed_at=executed_at, **fields)
+            return {"success": False, "tx_hash": tx_hash, "status": "failed"}
+
+        finality_status = (
+            FinalityStatus.finalized if self.handler.confirmation_tracker.commitment == "finalized" else FinalityStatus.pending
+        )
+        for payout in payouts:
+            self.handler.ata_cache.mark_exists(Pubkey.from_string(payout["payee"]), self.mint)
+            update_payout_instruction(
+                payout["payout_id"], status=PayoutStatus.confirmed,
+                executed_at=executed_at, finality_status=finality_status, **fields
+            )
+            update_settlement_batch_status(payout["settlement_batch_id"], SettlementBatchStatus.released)
+            update_settlement_details(
+                payout["detail_ids"], SettlementDetailStatus.released,
+                tx_hash=tx_hash, settled_at=executed_at
+            )
+
+        return {
+            "success": True,
+            "tx_hash": tx_hash,
+            "status": "confirmed",
+            "finality_status": finality_status.value
+        }
+
+    # ==================== Address Lookup Table ====================
+
+    def _common_addresses(self) -> List["Pubkey"]:
+        """Accounts referenced by every payout transaction"""
+        return [self.mint, self.source, TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, SYSTEM_PROGRAM_ID]
+
+    async def _load_lookup_table(self) -> Optional["AddressLookupTableAccount"]:
+        """Current addresses of the payout lookup table (created with the common accounts if missing)"""
+        if self.lookup_table_address is None:
+            await self._create_lookup_table()
+            return None  # Not active before the next slot
+        response = await self.client.get_account_info(self.lookup_table_address)
+        if not response.value:
+            logger.warning(f"[Payout] Lookup table {self.lookup_table_address} not found, payouts use no lookup table")
+            return None
+        table = AddressLookupTable.deserialize(bytes(response.value.data))
+        return AddressLookupTableAccount(self.lookup_table_address, list(table.addresses))
+
+    async def _create_lookup_table(self):
+        authority = self.fee_payer.pubkey()
+        slot = (await self.client.get_slot(commitment=Finalized)).value
+        create_ix, address = create_lookup_table({
+            "authority_address": authority, "payer_address": authority, "recent_slot": slot
+        })
+        extend_ix = extend_lookup_table({
+            "payer_address": authority, "lookup_table_address": address,
+            "authority_address": authority, "new_addresses": self._common_addresses()
+        })
+        await self._send_legacy([create_ix, extend_ix])
+        self.lookup_table_address = address
+        logger.info(f"[Payout] Created payout lookup table {address} (set SOLANA_PAYOUT_LOOKUP_TABLE={address} to reuse it)")
+
+    async def _extend_lookup_table(self, lookup_table: Optional["AddressLookupTableAccount"], addresses: List["Pubkey"]):
+        """Add addresses that are not in the table yet (up to the table capacity)"""
+        if lookup_table is None:
+            return
+        known = set(lookup_table.addresses)
+        missing = []
+        for address in self._common_addresses() + addresses:
+            if address not in known:
+                known.add(address)
+                missing.append(address)
+        missing = missing[:max(0, LOOKUP_TABLE_MAX_ADDRESSES - len(lookup_table.addresses))]
+        for start in range(0, len(missing), LOOKUP_TABLE_EXTEND_CHUNK):
+            await self._send_legacy([extend_lookup_table({
+                "payer_address": self.fee_payer.pubkey(), "lookup_table_address": lookup_table.key,
+                "authority_address": self.fee_payer.pubkey(), "new_addresses": missing[start:start + LOOKUP_TABLE_EXTEND_CHUNK]
+            })])
+        if missing:
+            logger.info(f"[Payout] Extended payout lookup table {lookup_table.key} with {len(missing)} address(es)")
+
+    async def _send_legacy(self, instructions: List):
+        recent_blockhash, _ = await self.handler.blockhash_cache.get_blockhash()
+        transaction = Transaction.new_unsigned(Message.new_with_blockhash(instructions, self.fee_payer.pubkey(), recent_blockhash))
+        transaction = await get_crypto_executor().partial_sign(transaction, [self.fee_payer], recent_blockhash)
+        await self.client.send_transaction(transaction)
@@ -0,0 +1,178 @@
+"""
+Local Validator for User-Signed Solana Transfers (Fee Payer Mode)
+
+The backend co-signs the user's partially signed transaction as fee payer, so the
+transaction must be checked before it gets our signature. The message is parsed once and
+every instruction is checked against the order:
+
+- Fee payer: account 0 is the backend fee payer; the only other signer is the owner,
+  whose signature is present and valid
+- transfer_checked: exactly one, of the configured mint/decimals, for exactly the ordered
+  amount, from an account of the owner into the payee's associated token account
+- approve_checked (delegate mode): instead of the transfer, exactly one approval of the
+  ordered budget to the fee payer as delegate, on the owner's associated token account
+- Allowed extras: ComputeBudget limit/price (price capped) and creation of the payee's
+  associated token account; any other instruction is rejected (it could spend the fee payer's SOL)
+- Durable nonce: AdvanceNonceAccount as the first instruction, only for a nonce account of
+  the fee payer's pool (see solana_nonce_pool.py)
+
+A transaction that passes can be submitted with skip_preflight: the RPC simulation would
+not tell us anything the checks above did not.
+"""
+from log import logger
+from typing import Dict, Any
+
+from services.blockchain_errors import BlockchainErrorCode
+from services.solana_priority_fees import (
+    COMPUTE_BUDGET_PROGRAM_ID, MAX_COMPUTE_UNITS, SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS
+)
+
+try:
+    from solders.pubkey import Pubkey  # type: ignore
+    from solders.system_program import ID as SYSTEM_PROGRAM_ID  # type: ignore
+    from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID  # type: ignore
+    from spl.token.instructions import get_associated_token_address  # type: ignore
+except ImportError:
+    pass
+
+# SPL Token instruction tags of TransferChecked / ApproveChecked
+TRANSFER_CHECKED_TAG = 12
+APPROVE_CHECKED_TAG = 13
+# Associated Token Account program: empty data / 0 = Create, 1 = CreateIdempotent
+ATA_CREATE_TAGS = (b"", b"\x00", b"\x01")
+# ComputeBudget tags: SetComputeUnitLimit, SetComputeUnitPrice
+SET_COMPUTE_UNIT_LIMIT_TAG = 2
+SET_COMPUTE_UNIT_PRICE_TAG = 3
+# System program instruction index of AdvanceNonceAccount (u32 LE)
+ADVANCE_NONCE_ACCOUNT_DATA = (4).to_bytes(4, "little")
+
+
+class SolanaTransferValidator:
+    """Validates user-signed transfer transactions for one (cluster, mint, payee)"""
+
+    def __init__(self, fee_payer: "Pubkey", mint: "Pubkey", decimals: int, payee: "Pubkey", nonce_pool=None):
+        """
+        Initialize the validator
+
+        Args:
+            fee_payer: Backend fee payer
+            mint: Token mint the transfer must use
+            decimals: Token decimals (checked by transfer_checked)
+            payee: Recipient whose associated token account must receive the tokens
+            nonce_pool: NonceAccountPool of the fee payer (None = durable nonces not accepted)
+        """
+        self.fee_payer = fee_payer
+        self.mint = mint
+        self.decimals = decimals
+        self.payee = payee
+        self.payee_token_account = get_associated_token_address(payee, mint)
+        self.nonce_pool = nonce_pool
+
+    def validate(self, transaction, owner: str, amount: int) -> Dict[str, Any]:
+        """
+        Validate a partially signed transaction against the order
+
+        Args:
+            transaction: solders Transaction (decoded once by the caller)
+            owner: Token holder that must authorize the transfer
+            amount: Ordered amount (smallest unit)
+
+        Returns:
+            {"success": True, "instruction": "transfer_checked" | "approve_checked"}
+            or {"success": False, "error": str, "error_code": str, "message": str}
+        """
+        try:
+            owner_pubkey = Pubkey.from_string(owner)
+        except Exception as e:
+            return self._failure(BlockchainErrorCode.WRONG_SIGNER, f"Invalid owner address {owner}: {e}")
+
+        message = transaction.message
+        account_keys = message.account_keys
+        num_signers = message.header.num_required_signatures
+
+        # Signers: fee payer first, the owner, nobody else
+        if not account_keys or account_keys[0] != self.fee_payer:
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Fee payer must be {self.fee_payer}")
+        signers = list(account_keys[:num_signers])
+        if owner_pubkey not in signers:
+            return self._failure(BlockchainErrorCode.WRONG_SIGNER, f"Owner {owner} did not sign the transaction")
+        unexpected = [str(key) for key in signers if key not in (self.fee_payer, owner_pubkey)]
+        if unexpected:
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Unexpected signers: {unexpected}")
+        owner_index = signers.index(owner_pubkey)
+        if not transaction.signatures[owner_index].verify(owner_pubkey, bytes(message)):
+            return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Owner signature does not verify")
+
+        transfers = 0
+        approvals = 0
+        for position, ix in enumerate(message.instructions):
+            program_id = account_keys[ix.program_id_index]
+            accounts = [account_keys[index] for index in ix.accounts]
+            data = bytes(ix.data)
+
+            if position == 0 and program_id == SYSTEM_PROGRAM_ID and data == ADVANCE_NONCE_ACCOUNT_DATA:
+                # AdvanceNonceAccount accounts: nonce account, RecentBlockhashes sysvar, nonce authority
+                if self.nonce_pool is None or len(accounts) < 3 or not self.nonce_pool.is_pool_account(accounts[0]):
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Durable nonce account is not one of the fee payer's nonce accounts")
+                if accounts[2] != self.fee_payer:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Nonce authority must be {self.fee_payer}")
+            elif program_id == TOKEN_PROGRAM_ID and data[:1] == bytes([TRANSFER_CHECKED_TAG]):
+                # TransferChecked accounts: source, mint, destination, authority
+                if len(data) != 10 or len(accounts) < 4:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Malformed transfer_checked instruction")
+                source, mint, destination, authority = accounts[:4]
+                ix_amount = int.from_bytes(data[1:9], "little")
+                if mint != self.mint or data[9] != self.decimals:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Transfer mint {mint} does not match {self.mint}")
+                if ix_amount != int(amount):
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Transfer amount {ix_amount} does not match ordered {int(amount)}")
+                if destination != self.payee_token_account:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Transfer destination {destination} is not the payee account {self.payee_token_account}")
+                if authority != owner_pubkey or source == destination:
+                    return self._failure(BlockchainErrorCode.WRONG_SIGNER, f"Transfer authority {authority} is not the owner {owner}")
+                transfers += 1
+            elif program_id == TOKEN_PROGRAM_ID and data[:1] == bytes([APPROVE_CHECKED_TAG]):
+                # ApproveChecked accounts: source, mint, delegate, owner
+                if len(data) != 10 or len(accounts) < 4:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Malformed approve_checked instruction")
+                source, mint, delegate, authority = accounts[:4]
+                ix_amount = int.from_bytes(data[1:9], "little")
+                if mint != self.mint or data[9] != self.decimals:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Approve mint {mint} does not match {self.mint}")
+                if ix_amount != int(amount):
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Approve amount {ix_amount} does not match ordered {int(amount)}")
+                if delegate != self.fee_payer:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Approve delegate {delegate} is not the fee payer {self.fee_payer}")
+                if authority != owner_pubkey or source != get_associated_token_address(owner_pubkey, self.mint):
+                    return self._failure(BlockchainErrorCode.WRONG_SIGNER, f"Approve authority {authority} is not the owner {owner}")
+                approvals += 1
+            elif program_id == ASSOCIATED_TOKEN_PROGRAM_ID and data in ATA_CREATE_TAGS:
+                # Create(Idempotent) accounts: payer, associated account, wallet, mint, ...
+                if len(accounts) < 4 or accounts[1] != self.payee_token_account or accounts[2] != self.payee or accounts[3] != self.mint:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Token account creation is only allowed for the payee")
+            elif str(program_id) == COMPUTE_BUDGET_PROGRAM_ID and data[:1] == bytes([SET_COMPUTE_UNIT_PRICE_TAG]):
+                price = int.from_bytes(data[1:9], "little")
+                if price > SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Compute unit price {price} exceeds {SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS}")
+            elif str(program_id) == COMPUTE_BUDGET_PROGRAM_ID and data[:1] == bytes([SET_COMPUTE_UNIT_LIMIT_TAG]):
+                if int.from_bytes(data[1:5], "little") > MAX_COMPUTE_UNITS:
+                    return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, "Compute unit limit too high")
+            else:
+                return self._failure(BlockchainErrorCode.INVALID_SIGNATURE, f"Instruction of program {program_id} is not allowed")
+
+        if transfers + approvals != 1:
+            return self._failure(
+                BlockchainErrorCode.INVALID_SIGNATURE,
+                f"Expected exactly one transfer_checked or approve_checked instruction, found {transfers + approvals}"
+            )
+        return {"success": True, "instruction": "approve_checked" if approvals else "transfer_checked"}
+
+    @staticmethod
+    def _failure(error_code: BlockchainErrorCode, error: str) -> Dict[str, Any]:
+        logger.warning(f"[Solana] Transaction validation failed [{error_code.code}]: {error}")
+        return {
+            "success": False,
+            "error": error,
+            "error_code": error_code.code,
+            "message": error_code.desc
+        }
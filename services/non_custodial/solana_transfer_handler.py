@@ -13,14 +13,33 @@ Workflow (Similar to EVM's EIP-2612):
 2. The partial signature is sent to the backend
 3. The backend acts as the fee_payer, adds its signature, and submits the transaction
 4. The backend pays all gas fees (approx. $0.00025)
+
+Pre-signed payments (SOLANA_NONCE_POOL_SIZE > 0): transactions built on a durable nonce of
+the fee payer's nonce pool do not expire with the blockhash; they are checked against the
+pool's current nonce instead, so they can wait in the settlement queue for a free worker.
+
+Delegate mode (SOLANA_DELEGATE_MODE=true): the user's transaction is an approve_checked of a
+budget to the fee payer; payments are then pulled by execute_transfer_from as delegate
+without a new user signature, until the tracked delegated amount is used up.
 """
 
 import os
 import base64
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 # Note: Assuming BaseTransferHandler is correctly imported from services.non_custodial.base_handler
 from services.non_custodial.base_handler import BaseTransferHandler
+from services.crypto_executor import get_crypto_executor
+from services.solana_client_pool import get_solana_client
+from services.solana_blockhash_cache import get_blockhash_cache
+from services.solana_ata_cache import get_ata_cache
+from services.solana_confirmation_tracker import get_confirmation_tracker
+from services.solana_priority_fees import get_priority_fee_oracle
+from services.solana_nonce_pool import SOLANA_NONCE_POOL_SIZE, get_nonce_pool, durable_nonce_account_of
+from services.solana_delegation_tracker import SOLANA_DELEGATE_MODE, get_delegation_tracker
+from services.non_custodial.solana_transaction_validator import SolanaTransferValidator
+from services.blockchain_errors import BlockchainErrorCode
 
 # The original code imported Web3 and eth_account, which are not strictly needed for Solana logic
 # from web3 import Web3
@@ -36,12 +55,16 @@ try:
     # from solders.message import Message  # type: ignore # Not strictly needed here
     from solana.rpc.async_api import AsyncClient  # type: ignore
     from solana.rpc.commitment import Confirmed  # type: ignore
+    from solana.rpc.types import TxOpts  # type: ignore
+    from solders.message import Message  # type: ignore
     from spl.token.instructions import (  # type: ignore
         get_associated_token_address,
-        # transfer_checked, # Not used in handler, as the user creates the instruction
-        # TransferCheckedParams
+        # Used for delegate pulls; in the default mode the user creates the instruction
+        transfer_checked,
+        TransferCheckedParams,
+        create_idempotent_associated_token_account,
     )
-    # from spl.token.constants import TOKEN_PROGRAM_ID  # type: ignore # Not strictly needed here
+    from spl.token.constants import TOKEN_PROGRAM_ID  # type: ignore
     SOLANA_AVAILABLE = True
 except ImportError:
     SOLANA_AVAILABLE = False
@@ -50,6 +73,12 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+# Submit locally validated transactions without the RPC preflight simulation
+SOLANA_SKIP_PREFLIGHT = os.getenv("SOLANA_SKIP_PREFLIGHT", "true").lower() == "true"
+
+# Decoded transactions kept between validation and submission
+MAX_DECODED_TRANSACTIONS = 256
+
 # ==================== Solana Configuration ====================
 
 CHAIN_CONFIGS = {
@@ -58,7 +87,8 @@ CHAIN_CONFIGS = {
         "cluster": "devnet",
         "rpc_url": os.getenv("SOLANA_DEVNET_RPC_URL") or "https://api.devnet.solana.com",
         "name": "Solana Devnet",
-        "native_currency": "SOL"
+        "native_currency": "SOL",
+        "block_time": 0.4  # Seconds per slot
     },
     # Mainnet and Testnet support are commented out
 }
@@ -145,9 +175,16 @@ class SolanaTransferHandler(BaseTransferHandler):
         self.token_config = token_config
         self.token_symbol = token
         
-        # Create Solana RPC client
-        # The AsyncClient should be closed in the close() method
-        self.client = AsyncClient(chain_config["rpc_url"], commitment=Confirmed)
+        # Shared pooled Solana RPC client (closed on server shutdown, not by the handler)
+        self.client = get_solana_client(chain_config["rpc_url"])
+        # Recent blockhash of the cluster (refreshed in the background, see run_blockhash_refresh)
+        self.blockhash_cache = get_blockhash_cache(chain_config["rpc_url"])
+        # Known associated token accounts (filled from confirmed transfers)
+        self.ata_cache = get_ata_cache(chain_config["rpc_url"])
+        # Batched getSignatureStatuses polling shared by all pending payments of the cluster
+        self.confirmation_tracker = get_confirmation_tracker(chain_config["rpc_url"])
+        # Priority fee tiers and landing latency metrics
+        self.fee_oracle = get_priority_fee_oracle(chain_config["rpc_url"])
         
         # Token Mint Address
         self.token_mint = Pubkey.from_string(token_config["mint_address"])
@@ -156,11 +193,54 @@ class SolanaTransferHandler(BaseTransferHandler):
         payee_env = os.getenv("PAYEE_ADDRESS") or os.getenv("SOLANA_PAYEE_ADDRESS")
         self.payee_pubkey = Pubkey.from_string(payee_env) if payee_env else self.backend_keypair.pubkey()
         
+        # Durable-nonce accounts of the fee payer for pre-signed payments (created in warm_up)
+        self.nonce_pool = (
+            get_nonce_pool(chain_config["rpc_url"], str(self.backend_keypair.pubkey()))
+            if SOLANA_NONCE_POOL_SIZE > 0 else None
+        )
+        # Submitted durable-nonce transactions: signature -> nonce account (released once landed)
+        self._nonce_submissions: Dict[str, str] = {}
+        
+        # Delegate mode: remaining approved amounts, approvals awaiting confirmation (owner -> amount)
+        # and submitted pulls (signature -> (owner, amount))
+        self.delegate_mode = SOLANA_DELEGATE_MODE
+        self.delegations = get_delegation_tracker(chain_config["rpc_url"], str(self.backend_keypair.pubkey()))
+        self._pending_approvals: Dict[str, int] = {}
+        self._pulls: Dict[str, tuple] = {}
+        
+        # Local check of the user's transaction before we co-sign it (see solana_transaction_validator.py)
+        self.transaction_validator = SolanaTransferValidator(
+            self.backend_keypair.pubkey(), self.token_mint, token_config["decimals"], self.payee_pubkey,
+            nonce_pool=self.nonce_pool
+        )
+        # Transactions decoded (and validated) once per payment: base64 -> (Transaction, validated instruction)
+        self._decoded: "OrderedDict[str, list]" = OrderedDict()
+        
         print(f">>> [Solana] Connected to {chain_config['name']}: {chain_config['rpc_url']}")
         print(f">>> [Solana] Current Token: {token} (Mint: {token_config['mint_address']})")
         print(f">>> [Solana] Fee Payer (Gas Payer): {str(self.backend_keypair.pubkey())}")
         print(f">>> [Solana] Payee (Token Recipient): {str(self.payee_pubkey)}")
     
+    def _decode_transaction(self, signature: str):
+        """Decode the base64 partially signed transaction once per payment"""
+        entry = self._decoded.get(signature)
+        if entry is None:
+            entry = [Transaction.from_bytes(base64.b64decode(signature)), False]
+            self._decoded[signature] = entry
+            while len(self._decoded) > MAX_DECODED_TRANSACTIONS:
+                self._decoded.popitem(last=False)
+        return entry[0]
+    
+    def validate_permit(self, owner: str, spender: str, value: int, deadline: int, signature: str = None, **kwargs) -> Dict[str, Any]:
+        """Validate the user's transaction locally (fee payer, signers, transfer mint/amount/destination)"""
+        basic = self.simulate_permit(owner, spender, value, deadline, signature=signature)
+        if not basic.get("success"):
+            return basic
+        result = self.transaction_validator.validate(self._decode_transaction(signature), owner, int(value))
+        if result.get("success"):
+            self._decoded[signature][1] = result["instruction"]
+        return result
+    
     def simulate_permit(
         self,
         owner: str,
@@ -208,17 +288,15 @@ class SolanaTransferHandler(BaseTransferHandler):
             
             # Validate signature format (Base64)
             try:
-                tx_bytes = base64.b64decode(signature)
-                # Attempt to deserialize the transaction to check integrity
-                Transaction.from_bytes(tx_bytes)
+                # Attempt to deserialize the transaction to check integrity (kept for validation/submission)
+                self._decode_transaction(signature)
             except Exception as e:
                 return {
                     "success": False,
                     "error": f"Invalid transaction signature format or decoding failed: {e}"
                 }
             
-            # NOTE: For a real application, you should also deserialize the transaction
-            # and verify the instructions (amount, recipient, source account) match expectations.
+            # The instructions themselves are checked by validate_permit
             
             return {
                 "success": True,
@@ -284,10 +362,9 @@ class SolanaTransferHandler(BaseTransferHandler):
                     "message": "Solana requires the user's partial signed transaction"
                 }
             
-            # 1. Deserialize the user's partial signed transaction
+            # 1. Deserialize the user's partial signed transaction (decoded once, usually already by validate_permit)
             try:
-                tx_bytes = base64.b64decode(signature)
-                transaction = Transaction.from_bytes(tx_bytes)
+                transaction = self._decode_transaction(signature)
             except Exception as e:
                 print(f"[Solana] Error decoding transaction: {e}")
                 return {
@@ -296,25 +373,48 @@ class SolanaTransferHandler(BaseTransferHandler):
                     "message": "Could not parse user signature"
                 }
             
-            # 2. Validate transaction content (Security Check)
-            # IMPORTANT: In a production system, a full validation of the instructions 
-            # (token, amount, recipient, source account, deadline/recent_blockhash validity) 
-            # should happen here to prevent malicious transactions. 
-            print("[Solana] Transaction content validation (TODO: Implement full security check)")
+            # 2. Validate transaction content (Security Check) unless validate_permit already did
+            validated = self._decoded.pop(signature, [None, None])[1]
+            if not validated:
+                validation = self.transaction_validator.validate(transaction, owner, amount_in_smallest_unit)
+                if not validation.get("success"):
+                    return validation
+                validated = validation["instruction"]
             
-            # 3. Backend signs as fee_payer
-            # Solana transactions require a recent blockhash to be valid. The client signing
-            # must ensure this blockhash is still valid when submitting.
-            # We assume the user-provided transaction's blockhash is valid for a short period.
-            transaction.partial_sign([self.backend_keypair], transaction.message.recent_blockhash)
+            # 3. Refuse transactions whose blockhash is expired or about to expire
+            #    (durable-nonce transactions: whose nonce was already used)
+            nonce_account = durable_nonce_account_of(transaction.message)
+            if nonce_account:
+                blockhash_error = await self._check_durable_nonce(nonce_account, transaction.message.recent_blockhash)
+            else:
+                blockhash_error = await self.blockhash_cache.check_blockhash(transaction.message.recent_blockhash)
+            if blockhash_error:
+                print(f"[Solana] {blockhash_error}")
+                return {
+                    "success": False,
+                    "error": blockhash_error,
+                    "error_code": BlockchainErrorCode.SIGNATURE_EXPIRED.code,
+                    "message": BlockchainErrorCode.SIGNATURE_EXPIRED.desc
+                }
+            
+            # 4. Backend signs as fee_payer
+            transaction = await get_crypto_executor().partial_sign(
+                transaction, [self.backend_keypair], transaction.message.recent_blockhash
+            )
             print("[Solana] Backend signed the transaction.")
             
-            # 4. Submit transaction
-            response = await self.client.send_transaction(transaction)
+            # 5. Submit transaction (validated locally, so the preflight simulation is skipped by default)
+            response = await self.client.send_transaction(transaction, opts=TxOpts(skip_preflight=SOLANA_SKIP_PREFLIGHT))
             
             if response.value:
                 tx_signature = str(response.value)
                 print(f"[Solana] Transaction submitted: {tx_signature}")
+                self.fee_oracle.record_submission(tx_signature, transaction.message)
+                if nonce_account:
+                    self._nonce_submissions[tx_signature] = nonce_account
+                if validated == "approve_checked":
+                    # The delegation is recorded once the approval is confirmed (mark_permit_used)
+                    self._pending_approvals[owner] = amount_in_smallest_unit
                 
                 return {
                     "success": True,
@@ -347,6 +447,18 @@ class SolanaTransferHandler(BaseTransferHandler):
                 "message": "Solana transfer execution failed"
             }
     
+    async def _check_durable_nonce(self, nonce_account: str, nonce) -> Optional[str]:
+        """Reason to refuse a durable-nonce transaction (its nonce was advanced), None if it is still valid"""
+        current = self.nonce_pool.current_nonce(nonce_account)
+        if current is None:
+            try:
+                current = await self.nonce_pool.fetch_nonce(nonce_account)
+            except Exception as e:
+                return f"Cannot read durable nonce account {nonce_account}: {e}"
+        if current != str(nonce):
+            return f"Durable nonce of {nonce_account} was already used (current {current})"
+        return None
+    
     async def execute_transfer_from(
         self,
         owner_address: str,
@@ -354,10 +466,11 @@ class SolanaTransferHandler(BaseTransferHandler):
         **kwargs
     ) -> Dict[str, Any]:
         """
-        Executes Solana SPL Token transfer
+        Pulls an SPL Token transfer from the owner as delegate (delegate mode)
         
-        Note: In Fee Payer mode, this method is typically not called separately.
-        The transfer and authorization are done together in execute_permit (Fee Payer mode).
+        The fee payer signs alone: it is both the fee payer and the delegate the owner
+        approved. The amount is reserved from the tracked delegation before submission.
+        In the default Fee Payer mode the transfer is done by execute_permit instead.
         
         Args:
             owner_address: Token holder address
@@ -366,13 +479,96 @@ class SolanaTransferHandler(BaseTransferHandler):
         Returns:
             Dictionary containing the transaction signature (or error)
         """
-        # In Fee Payer mode, this method is usually not used independently
-        # Users should call execute_permit and pass the partial signature
-        print("[Solana] WARNING: execute_transfer_from called in Fee Payer mode, which is not the standard workflow.")
+        if not self.delegate_mode:
+            # In Fee Payer mode, this method is usually not used independently
+            # Users should call execute_permit and pass the partial signature
+            print("[Solana] WARNING: execute_transfer_from called in Fee Payer mode, which is not the standard workflow.")
+            return {
+                "success": False,
+                "error": "Use execute_permit with user signature for Fee Payer mode",
+                "message": "Please use execute_permit for Solana Fee Payer mode"
+            }
+        
+        try:
+            owner_pubkey = Pubkey.from_string(owner_address)
+            amount_in_smallest_unit = int(amount)
+        except (ValueError, TypeError) as e:
+            return {
+                "success": False,
+                "error": f"Invalid owner address or amount: {e}",
+                "message": "Solana delegate transfer failed"
+            }
+        owner_token_account = get_associated_token_address(owner_pubkey, self.token_mint)
+        
+        try:
+            await self.delegations.remaining(owner_pubkey, self.token_mint, owner_token_account)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Failed to read the delegation of {owner_address}: {e}",
+                "message": "Solana delegate transfer failed"
+            }
+        if not self.delegations.reserve(owner_pubkey, self.token_mint, amount_in_smallest_unit):
+            return {
+                "success": False,
+                "error": f"Delegated amount of {owner_address} does not cover {amount_in_smallest_unit}",
+                "error_code": BlockchainErrorCode.INSUFFICIENT_ALLOWANCE.code,
+                "message": BlockchainErrorCode.INSUFFICIENT_ALLOWANCE.desc
+            }
+        
+        try:
+            fee_payer = self.backend_keypair.pubkey()
+            payee_token_account = get_associated_token_address(self.payee_pubkey, self.token_mint)
+            instructions = []
+            if not await self.ata_cache.exists(self.payee_pubkey, self.token_mint, payee_token_account):
+                instructions.append(create_idempotent_associated_token_account(
+                    payer=fee_payer, owner=self.payee_pubkey, mint=self.token_mint
+                ))
+            instructions.append(transfer_checked(TransferCheckedParams(
+                program_id=TOKEN_PROGRAM_ID,
+                source=owner_token_account,
+                mint=self.token_mint,
+                dest=payee_token_account,
+                owner=fee_payer,  # Authority: the fee payer as the approved delegate
+                amount=amount_in_smallest_unit,
+                decimals=self.token_config['decimals']
+            )))
+            recent_blockhash, _ = await self.blockhash_cache.get_blockhash()
+            instructions = await self.fee_oracle.compute_budget_instructions(
+                instructions, fee_payer, recent_blockhash
+            ) + instructions
+            transaction = Transaction.new_unsigned(Message.new_with_blockhash(instructions, fee_payer, recent_blockhash))
+            transaction = await get_crypto_executor().partial_sign(transaction, [self.backend_keypair], recent_blockhash)
+            response = await self.client.send_transaction(transaction)
+            if not response.value:
+                raise Exception(response.error.message if getattr(response, "error", None) else "Unknown RPC error")
+        except Exception as e:
+            self.delegations.restore(owner_pubkey, self.token_mint, amount_in_smallest_unit)
+            print(f"[Solana] Delegate transfer failed: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Solana delegate transfer failed"
+            }
+        
+        tx_signature = str(response.value)
+        print(f"[Solana] Delegate transfer submitted: {tx_signature}")
+        self.fee_oracle.record_submission(tx_signature, transaction.message)
+        self._pulls[tx_signature] = (owner_address, amount_in_smallest_unit)
         return {
-            "success": False,
-            "error": "Use execute_permit with user signature for Fee Payer mode",
-            "message": "Please use execute_permit for Solana Fee Payer mode"
+            "success": True,
+            "signature": tx_signature,
+            "tx_hash": tx_signature,
+            "status": "pending",
+            "message": "Solana delegate transfer submitted (backend paid gas)",
+            "polling_required": True,
+            "details": {
+                "owner": owner_address,
+                "delegate": str(fee_payer),
+                "recipient": str(self.payee_pubkey),
+                "amount": amount_in_smallest_unit,
+                "amount_display": amount_in_smallest_unit / (10 ** self.token_config['decimals'])
+            }
         }
     
     async def get_transaction_status(self, tx_hash: str) -> Dict[str, Any]:
@@ -444,18 +640,20 @@ class SolanaTransferHandler(BaseTransferHandler):
                 "message": "Failed to query Solana transaction status"
             }
     
-    async def check_allowance(self, owner_address: str) -> Dict[str, Any]:
+    async def check_allowance(self, owner_address: str, spender: str = None) -> Dict[str, Any]:
         """
-        Checks the token balance (Solana does not have the EVM allowance concept)
+        Checks the amount the owner has delegated to the fee payer (SPL approve)
         
-        Solana's Token Account Delegate mechanism is different from EVM's allowance.
-        Here, we return the user's Token Account balance as a reference.
+        The delegated amount is the Solana counterpart of an EVM allowance. It is read from
+        the owner's token account once and tracked locally afterwards (see
+        solana_delegation_tracker.py); it is 0 unless the owner approved the fee payer.
         
         Args:
             owner_address: User's public key (address)
+            spender: Unused for Solana (the fee payer is the only delegate), kept for interface consistency
             
         Returns:
-            Dictionary containing balance information (used as 'allowance' in the service layer)
+            Dictionary containing the delegated amount as 'allowance'
         """
         try:
             owner_pubkey = Pubkey.from_string(owner_address)
@@ -466,38 +664,23 @@ class SolanaTransferHandler(BaseTransferHandler):
                 self.token_mint
             )
             
-            # Query balance
-            response = await self.client.get_token_account_balance(user_token_account)
+            delegated = await self.delegations.remaining(owner_pubkey, self.token_mint, user_token_account)
+            decimals = self.token_config['decimals']
             
-            if response.value:
-                balance_info = response.value
-                balance = int(balance_info.amount)
-                decimals = self.token_config['decimals']
-                
-                return {
-                    "success": True,
-                    "allowance": balance,  # Solana has no allowance, return balance
-                    "allowance_display": balance / (10 ** decimals),
-                    "owner": owner_address,
-                    "spender": str(self.backend_keypair.pubkey()),
-                    "note": "Solana uses Token Account balance, not allowance"
-                }
-            else:
-                # Token Account might not exist, meaning balance is 0
-                return {
-                    "success": True,
-                    "allowance": 0,
-                    "allowance_display": 0.0,
-                    "owner": owner_address,
-                    "spender": str(self.backend_keypair.pubkey()),
-                    "note": f"User's {self.token_symbol} Token Account not found (treated as 0 balance)"
-                }
+            return {
+                "success": True,
+                "allowance": delegated,
+                "allowance_display": delegated / (10 ** decimals),
+                "owner": owner_address,
+                "spender": str(self.backend_keypair.pubkey()),
+                "note": "Solana SPL delegated amount (approve_checked to the fee payer)"
+            }
                 
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "message": "Failed to query Token Account balance"
+                "message": "Failed to query the SPL delegation"
             }
     
     async def get_native_balance(self, address: str) -> float:
@@ -533,11 +716,54 @@ class SolanaTransferHandler(BaseTransferHandler):
             print(f"[Solana] Detailed Error: {traceback.format_exc()}")
             return 0.0
     
-    async def close(self):
-        """Closes the Solana RPC connection"""
+    async def wait_for_transaction(self, tx_hash: str, timeout: float, interval_seconds: float = 2) -> Optional[Dict[str, Any]]:
+        """Wait for a signature via the cluster's confirmation tracker (one getSignatureStatuses call per poll for all payments)"""
+        result = await self.confirmation_tracker.wait(tx_hash, timeout)
+        if result is not None:
+            self.fee_oracle.record_landing(tx_hash, result.get("status") == "confirmed")
+            # Landed (confirmed or failed) durable-nonce transactions have advanced their nonce
+            nonce_account = self._nonce_submissions.pop(tx_hash, None)
+            if nonce_account:
+                self.nonce_pool.release(nonce_account)
+            # A failed delegate pull may mean the delegation was revoked or changed on-chain
+            pull = self._pulls.pop(tx_hash, None)
+            if pull and result.get("status") == "failed":
+                self.delegations.invalidate(Pubkey.from_string(pull[0]), self.token_mint)
+        return result
+    
+    def mark_permit_used(self, owner: str, spender: str = None, value: int = None):
+        """A confirmed transfer proves the source and payee token accounts exist; a confirmed approve sets the delegation"""
+        try:
+            owner_pubkey = Pubkey.from_string(owner)
+        except Exception:
+            return
+        approved = self._pending_approvals.pop(owner, None)
+        if approved is not None:
+            self.delegations.set(owner_pubkey, self.token_mint, approved)
+            self.ata_cache.mark_exists(owner_pubkey, self.token_mint)
+            return
+        self.ata_cache.mark_exists(owner_pubkey, self.token_mint)
+        self.ata_cache.mark_exists(self.payee_pubkey, self.token_mint)
+    
+    async def warm_up(self):
+        """Create missing durable-nonce accounts and load their nonces"""
+        if self.nonce_pool is not None:
+            await self.nonce_pool.ensure_accounts(self.backend_keypair)
+    
+    async def health_check(self) -> bool:
+        """Check the Solana RPC connection (getHealth)"""
         try:
-            # Note: This requires the solana.rpc.async_api.AsyncClient to be implemented correctly
-            await self.client.close()
-            print("[Solana] RPC connection closed.")
+            return await self.client.is_connected()
         except Exception as e:
-            print(f"[Solana] Failed to close connection: {e}")
\ No newline at end of file
+            print(f"[Solana] Health check failed for {self.network}: {e}")
+            return False
+    
+    async def get_gas_balances(self) -> Dict[str, float]:
+        """Reads the fee payer's SOL balance (raises on RPC errors, unlike get_native_balance)"""
+        fee_payer = self.backend_keypair.pubkey()
+        response = await self.client.get_balance(fee_payer)
+        return {str(fee_payer): (response.value or 0) / 1_000_000_000}
+    
+    async def close(self):
+        """Releases the handler's RPC client (the shared client itself is closed by close_solana_clients)"""
+        self.client = None
\ No newline at end of file
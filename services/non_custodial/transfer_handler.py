@@ -13,7 +13,8 @@ Backward Compatibility Notes:
 """
 from log import logger
 import os
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
 from services.non_custodial.base_handler import BaseTransferHandler
 
@@ -120,6 +121,122 @@ def create_handler(network: str = "sepolia", token: str = "USDC") -> Optional[Ba
         return None
 
 
+# ==================== Handler Registry Lifecycle ====================
+
+# Handler health check interval and timeout (seconds)
+HANDLER_HEALTH_INTERVAL_SECONDS = float(os.getenv("HANDLER_HEALTH_INTERVAL_SECONDS", "30"))
+HANDLER_HEALTH_TIMEOUT_SECONDS = float(os.getenv("HANDLER_HEALTH_TIMEOUT_SECONDS", "10"))
+
+
+def get_configured_handlers() -> List[Tuple[str, str]]:
+    """
+    (network, token) pairs to build at startup
+
+    Uses HANDLER_PRELOAD (e.g. "sepolia:USDC,solana-devnet:USDC") when set, otherwise every
+    network with an RPC URL and every token with an address/mint configured.
+    """
+    preload = os.getenv("HANDLER_PRELOAD")
+    if preload:
+        pairs = []
+        for item in preload.split(","):
+            if ":" in item:
+                network, token = item.split(":", 1)
+                pairs.append((network.strip().lower(), token.strip().upper()))
+        return pairs
+
+    pairs = []
+    for network, chain_config in CHAIN_CONFIGS.items():
+        if not chain_config.get("rpc_url"):
+            continue
+        for token, token_config in TOKEN_CONFIGS.get(network, {}).items():
+            if token_config.get("address") or token_config.get("mint_address"):
+                pairs.append((network, token))
+    return pairs
+
+
+async def build_handlers(pairs: Optional[List[Tuple[str, str]]] = None) -> Dict[tuple, BaseTransferHandler]:
+    """
+    Build handlers concurrently (each construction runs in a worker thread)
+
+    Args:
+        pairs: (network, token) pairs, defaults to get_configured_handlers()
+
+    Returns:
+        The handlers that were built successfully
+    """
+    pairs = pairs if pairs is not None else get_configured_handlers()
+    handlers = await asyncio.gather(*[
+        asyncio.to_thread(create_handler, network, token) for network, token in pairs
+    ])
+    built = {pair: handler for pair, handler in zip(pairs, handlers) if handler}
+    warm_ups = await asyncio.gather(*[handler.warm_up() for handler in built.values()], return_exceptions=True)
+    for pair, result in zip(built, warm_ups):
+        if isinstance(result, Exception):
+            logger.warning(f"[Registry] Warm-up of {pair} TransferHandler failed: {result}")
+    logger.info(f"[Registry] Built {len(built)}/{len(pairs)} TransferHandler instances: {list(built.keys())}")
+    return built
+
+
+async def _check_handler(cache_key: tuple, handler: BaseTransferHandler):
+    try:
+        healthy = await asyncio.wait_for(handler.health_check(), timeout=HANDLER_HEALTH_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"[Registry] Health check of {cache_key} raised: {e}")
+        healthy = False
+    if healthy:
+        return
+
+    logger.warning(f"[Registry] {cache_key} TransferHandler is unhealthy, re-creating it")
+    if _handler_cache.get(cache_key) is handler:
+        del _handler_cache[cache_key]
+    try:
+        await handler.close()
+    except Exception as e:
+        logger.warning(f"[Registry] Failed to close {cache_key} TransferHandler: {e}")
+    new_handler = await asyncio.to_thread(create_handler, *cache_key)
+    if not new_handler:
+        return
+    try:
+        await new_handler.warm_up()
+    except Exception as e:
+        logger.warning(f"[Registry] Warm-up of {cache_key} TransferHandler failed: {e}")
+
+
+async def check_handlers():
+    """Health-check all cached handlers concurrently and re-create the unhealthy ones"""
+    await asyncio.gather(*[
+        _check_handler(cache_key, handler) for cache_key, handler in list(_handler_cache.items())
+    ])
+
+
+async def run_handler_health_checks(interval_seconds: float = HANDLER_HEALTH_INTERVAL_SECONDS):
+    """Periodically health-check the cached handlers (intended as a background task)"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await check_handlers()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Registry] Handler health check round failed: {e}")
+
+
+def get_cached_handlers() -> List[BaseTransferHandler]:
+    """Handlers currently in the cache (built at startup or on first use)"""
+    return list(_handler_cache.values())
+
+
+async def close_handlers():
+    """Close all cached handlers (RPC clients) and empty the cache"""
+    handlers = list(_handler_cache.values())
+    _handler_cache.clear()
+    results = await asyncio.gather(*[handler.close() for handler in handlers], return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"[Registry] Failed to close TransferHandler: {result}")
+    logger.info(f"[Registry] Closed {len(handlers)} TransferHandler instances")
+
+
 # ==================== Backward Compatible Aliases ====================
 
 def create_sepolia_handler(token: str = "USDC") -> Optional[BaseTransferHandler]:
@@ -148,6 +265,11 @@ except ImportError:
 __all__ = [
     "create_handler",
     "create_sepolia_handler",
+    "build_handlers",
+    "check_handlers",
+    "run_handler_health_checks",
+    "get_cached_handlers",
+    "close_handlers",
     "TransferHandler",  # Backward compatibility
     "CHAIN_CONFIGS",
     "TOKEN_CONFIGS"
@@ -1,4 +1,6 @@
 from log import logger
+import os
+import requests
 import dao.app as pg_dao
 
 def add_or_update_order_item(order_number: str, user_id: str, spend_amount: float, budget: float, currency: str, chain: str, deadline: int, status: str, status_message: str = ""):
@@ -8,4 +10,15 @@ def get_order_item(order_number: str) -> dict[str, any]:
     return pg_dao.get_order_item(order_number)
     
 def get_order_list_by_user(user_id: str) -> list[dict[str, any]]:
-    return pg_dao.get_order_list_by_user(user_id)
\ No newline at end of file
+    return pg_dao.get_order_list_by_user(user_id)
+def notify_order_status(order_number: str, success: bool, error_code: str = None, message: str = None):
+    """Post the final status of an order to NOTIFICATION_URL"""
+    notification_url = os.getenv("NOTIFICATION_URL")
+    if not notification_url:
+        return
+    payload = {"status": success, "order_number": order_number}
+    if not success:
+        payload.update({"error_code": error_code, "message": message})
+    res = requests.post(notification_url, json=payload)
+    if res.ok:
+        logger.info(f"Notify settlement message by url: {notification_url} with status code: {res.status_code}")
@@ -0,0 +1,150 @@
+"""
+Owner Permit-Nonce Tracker
+
+EIP-2612 nonces(owner) only changes when a permit of that owner is executed, so the value
+is kept in memory per (chain id, token, owner) and shared by the signing side
+(services/execute_sign.py) and the validating side (PermitValidator):
+
+- Loaded from the chain on first use
+- Incremented locally when a permit we submitted is confirmed
+- Dropped (and re-read on next use) when a permit fails with INVALID_SIGNATURE,
+  SIGNATURE_ALREADY_USED or SIGNATURE_EXPIRED, which is how a stale nonce shows up
+
+Signing reserves nonces on top of the on-chain one: every signature takes the next free
+nonce, so permits signed before the earlier ones confirm do not share a nonce. Reservations
+are dropped with the cached nonce, and once every permit signed ahead has expired.
+"""
+from log import logger
+import re
+import time
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from services.blockchain_errors import BlockchainErrorClassifier, BlockchainErrorCode
+
+# Error codes that indicate the permit was signed over a stale nonce
+RESYNC_ERROR_CODES = (
+    BlockchainErrorCode.INVALID_SIGNATURE,
+    BlockchainErrorCode.SIGNATURE_ALREADY_USED,
+    # An expired permit leaves its nonce unused: the permits signed after it can only land once it is signed again
+    BlockchainErrorCode.SIGNATURE_EXPIRED,
+)
+
+_ERROR_CODE_PATTERN = re.compile(r"\[(\d{6})\]")
+
+
+def is_stale_nonce_error(error_message: str) -> bool:
+    """True if an error (a "[110020] ..." message or a raw RPC error) means the permit nonce may be stale"""
+    if not error_message:
+        return False
+    codes = {code.code for code in RESYNC_ERROR_CODES}
+    if any(match in codes for match in _ERROR_CODE_PATTERN.findall(error_message)):
+        return True
+    return BlockchainErrorClassifier.classify_error(error_message) in RESYNC_ERROR_CODES
+
+
+class PermitNonceTracker:
+    """Permit nonces per (chain id, token address, owner)"""
+
+    def __init__(self):
+        self._nonces: Dict[Tuple[int, str, str], int] = {}
+        # Next nonce to sign with and the latest deadline signed with it, per owner
+        self._reserved: Dict[Tuple[int, str, str], Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(chain_id: int, token_address: str, owner: str) -> Tuple[int, str, str]:
+        return int(chain_id), token_address.lower(), owner.lower()
+
+    def get(self, chain_id: int, token_address: str, owner: str, fetch: Callable[[], int], refresh: bool = False) -> int:
+        """
+        Get an owner's permit nonce
+
+        Args:
+            chain_id: EVM chain id
+            token_address: Token contract address
+            owner: Token holder's address
+            fetch: Reads nonces(owner) from the chain (only called on a miss or refresh)
+            refresh: Ignore the cached value
+
+        Returns:
+            The permit nonce
+        """
+        key = self._key(chain_id, token_address, owner)
+        if not refresh:
+            with self._lock:
+                if key in self._nonces:
+                    return self._nonces[key]
+        nonce = int(fetch())
+        with self._lock:
+            self._nonces[key] = nonce
+        return nonce
+
+    def reserve(self, chain_id: int, token_address: str, owner: str, fetch: Callable[[], int], deadline: int) -> int:
+        """
+        Reserve the nonce of a permit about to be signed
+
+        Args:
+            chain_id: EVM chain id
+            token_address: Token contract address
+            owner: Token holder's address
+            fetch: Reads nonces(owner) from the chain (only called on a miss)
+            deadline: Deadline of the permit signed with the nonce
+
+        Returns:
+            The owner's current nonce, or the one after the last reserved nonce when permits
+            signed before are still unconfirmed
+        """
+        key = self._key(chain_id, token_address, owner)
+        with self._lock:
+            reservation = self._reserved.get(key)
+            if reservation is not None and reservation[1] < time.time():
+                # Every permit signed ahead has expired, none of them can land anymore
+                self._reserved.pop(key)
+                self._nonces.pop(key, None)
+        current = self.get(chain_id, token_address, owner, fetch)
+        with self._lock:
+            next_nonce, latest_deadline = self._reserved.get(key, (current, 0))
+            nonce = max(current, next_nonce)
+            self._reserved[key] = (nonce + 1, max(latest_deadline, int(deadline)))
+            return nonce
+
+    def peek(self, chain_id: int, token_address: str, owner: str) -> Optional[int]:
+        """Cached nonce or None (never reads the chain)"""
+        with self._lock:
+            return self._nonces.get(self._key(chain_id, token_address, owner))
+
+    def increment(self, chain_id: int, token_address: str, owner: str):
+        """Advance the cached nonce after a permit of the owner was confirmed"""
+        key = self._key(chain_id, token_address, owner)
+        with self._lock:
+            if key in self._nonces:
+                self._nonces[key] += 1
+
+    def invalidate(self, chain_id: int, token_address: str, owner: str):
+        """Drop the cached nonce and the reservations so the next use reads it from the chain"""
+        key = self._key(chain_id, token_address, owner)
+        with self._lock:
+            self._nonces.pop(key, None)
+            self._reserved.pop(key, None)
+
+    def resync_on_error(self, chain_id: int, token_address: str, owner: str, error_message: str) -> bool:
+        """
+        Invalidate the owner's nonce if the error indicates a stale nonce
+
+        Returns:
+            True if the nonce was invalidated
+        """
+        if not is_stale_nonce_error(error_message):
+            return False
+        self.invalidate(chain_id, token_address, owner)
+        logger.info(f"[Permit] Resyncing permit nonce of {owner} (chain {chain_id}, token {token_address}) after: {error_message[:120]}")
+        return True
+
+
+_permit_nonce_tracker = PermitNonceTracker()
+
+
+def get_permit_nonce_tracker() -> PermitNonceTracker:
+    """Get the process-wide permit nonce tracker"""
+    return _permit_nonce_tracker
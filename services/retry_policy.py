@@ -0,0 +1,179 @@
+"""
+Retry Policy Engine for Blockchain Submissions and RPC Calls
+
+Errors are classified with BlockchainErrorClassifier ("[110014] ..." code prefix or message
+patterns); only RETRYABLE ones (nonce conflicts, low gas price, RPC / connection errors)
+are retried, everything else fails at once:
+
+- Backoff: exponential with full jitter, delay = uniform(0, min(max_delay, base_delay * 2^attempt)),
+  so callers that failed together do not retry together
+- Budget: every retry of a chain takes a token from that chain's bucket (refilled per
+  minute); with the bucket empty errors fail at once instead of piling retries on an RPC
+  that is already struggling
+- Hooks: on_retry sees the classified error before the next attempt, e.g. to resync the
+  nonce on NONCE_TOO_LOW (see EVMTransferHandler._send_transaction)
+
+Used around EVM transaction submission and RPC simulation calls; the settlement workers use
+the same policy objects and budgets to re-queue payments whose step failed transiently.
+
+Configuration (.env):
+- RETRY_MAX_ATTEMPTS: Attempts of one call, including the first (default: 3)
+- RETRY_BASE_DELAY_SECONDS: Backoff base (default: 0.5)
+- RETRY_MAX_DELAY_SECONDS: Backoff cap (default: 8)
+- RETRY_BUDGET_PER_MINUTE: Retries allowed per chain and minute (default: 60)
+"""
+from log import logger
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+from services.blockchain_errors import BlockchainErrorClassifier, BlockchainErrorCode
+
+# Load environment variables
+load_dotenv()
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "8"))
+RETRY_BUDGET_PER_MINUTE = float(os.getenv("RETRY_BUDGET_PER_MINUTE", "60"))
+
+
+class RetryPolicy:
+    """Attempt limit and exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts: Attempts including the first one
+            base_delay: Backoff of the first retry (seconds, before jitter)
+            max_delay: Backoff cap (seconds, before jitter)
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the retry that follows failed attempt number `attempt` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def should_retry(self, error_code: Optional[BlockchainErrorCode], attempt: int) -> bool:
+        """A classified, retryable error with attempts left"""
+        return (
+            error_code is not None
+            and BlockchainErrorClassifier.is_retryable(error_code)
+            and attempt + 1 < self.max_attempts
+        )
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS)
+
+
+class RetryBudget:
+    """Token bucket of retries for one chain"""
+
+    def __init__(self, network: str, per_minute: float = RETRY_BUDGET_PER_MINUTE):
+        self.network = network
+        self.capacity = max(1.0, per_minute)
+        self.refill_per_second = per_minute / 60
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        # Metrics
+        self.granted = 0
+        self.denied = 0
+
+    def try_acquire(self) -> bool:
+        """Take one retry token (False when the chain's budget is spent)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_per_second)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+
+# ==================== Global Budget Cache ====================
+
+_budgets: Dict[str, RetryBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(network: str) -> RetryBudget:
+    """Get (or lazily create) the retry budget of a chain"""
+    network = (network or "").lower()
+    with _budgets_lock:
+        budget = _budgets.get(network)
+        if budget is None:
+            budget = RetryBudget(network)
+            _budgets[network] = budget
+        return budget
+
+
+def classify(error: BaseException) -> Optional[BlockchainErrorCode]:
+    """Blockchain error code of a raised error (None if unknown)"""
+    message = str(error)
+    if hasattr(error, 'args') and error.args and str(error.args[0]) != message:
+        # web3.py often keeps the RPC message in the first argument
+        message = f"{message} {error.args[0]}"
+    return BlockchainErrorClassifier.classify_exception(message)
+
+
+async def retry_async(
+    operation: str,
+    fn: Callable[[int], Awaitable[Any]],
+    network: str,
+    policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    on_retry: Optional[Callable[[BlockchainErrorCode, BaseException], None]] = None
+) -> Any:
+    """
+    Run a call, retrying classified transient errors with backoff within the chain's budget
+
+    Args:
+        operation: Call name for the logs
+        fn: Async callable receiving the 0-based attempt number
+        network: Chain whose retry budget is used
+        policy: Attempts and backoff
+        on_retry: Called with (error code, error) before each retry
+
+    Returns:
+        The result of the first successful attempt; the last error is raised otherwise
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn(attempt)
+        except Exception as e:
+            error_code = classify(e)
+            if not policy.should_retry(error_code, attempt):
+                raise
+            if not get_retry_budget(network).try_acquire():
+                logger.warning(f"[Retry] {operation} on {network}: retry budget spent, not retrying {error_code.name}")
+                raise
+            delay = policy.backoff(attempt)
+            logger.warning(
+                f"[Retry] {operation} on {network} failed with {error_code.name} "
+                f"(attempt {attempt + 1}/{policy.max_attempts}), retrying in {delay:.2f}s: {e}"
+            )
+            if on_retry:
+                on_retry(error_code, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class RetryLater(Exception):
+    """A step failed transiently; the caller should run it again after `delay` seconds"""
+
+    def __init__(self, delay: float, error: BaseException):
+        super().__init__(str(error))
+        self.delay = delay
+        self.error = error
@@ -7,7 +7,7 @@ def collect_settlement_detail(chain: str, gross_amount: float = 0,
     fee_amount: float = 0, net_amount: float = 0, source_event: SourceEvent = None, 
     settlement_detail_status: SettlementDetailStatus = None, session_id: str = None,
     tx_hash: str = None, payer_address: str = None, payee_address: str = None,
-    settled_at: datetime = None) -> SettlementDetail:
+    settled_at: datetime = None, asset_id: str = None) -> SettlementDetail:
     
     chain_id = ChainID.get(chain.lower())
     if not chain_id:
@@ -49,5 +49,8 @@ def collect_settlement_detail(chain: str, gross_amount: float = 0,
     if settled_at:
         logger.info(f"Collected settled_at: {settled_at} for settlement_detail")
         settlement_detail.settled_at = settled_at
+    if asset_id:
+        logger.info(f"Collected asset_id: {asset_id} for settlement_detail")
+        settlement_detail.asset_id = asset_id
     
     return settlement_detail
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Pluggable EVM Signer Backends
+
+Signers expose the same surface as an eth_account LocalAccount (address, sign_transaction,
+sign_message), so they can replace Account.from_key(...) wherever keys were loaded inline:
+
+- LocalSigner: In-process private key (original behaviour)
+- RemoteSigner: Keys live in a separate signer process reached over HTTP or a Unix socket
+  (see services/signer_server.py for a local stand-in server)
+- BatchingSigner: Wraps a RemoteSigner and pipelines concurrent requests into one round trip
+
+Configuration (.env):
+- SIGNER_BACKEND: local (default), remote or batching
+- SIGNER_URL: Remote signer endpoint, http://host:port or unix:///path/to/signer.sock
+- SIGNER_TIMEOUT_SECONDS: Remote request timeout (default: 10)
+- SIGNER_BATCH_MAX_SIZE / SIGNER_BATCH_MAX_WAIT_MS: Batching limits (default: 64 / 2)
+"""
+from log import logger
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+from eth_account import Account
+from eth_account.datastructures import SignedMessage, SignedTransaction
+from eth_account.messages import SignableMessage
+from hexbytes import HexBytes
+from web3 import Web3
+
+# Load environment variables
+load_dotenv()
+
+SIGNER_BACKEND = os.getenv("SIGNER_BACKEND", "local").lower()
+SIGNER_URL = os.getenv("SIGNER_URL", "http://127.0.0.1:8700")
+SIGNER_TIMEOUT_SECONDS = float(os.getenv("SIGNER_TIMEOUT_SECONDS", "10"))
+SIGNER_BATCH_MAX_SIZE = int(os.getenv("SIGNER_BATCH_MAX_SIZE", "64"))
+SIGNER_BATCH_MAX_WAIT_MS = float(os.getenv("SIGNER_BATCH_MAX_WAIT_MS", "2"))
+
+
+# ==================== Wire Format ====================
+
+def encode_sign_request(kind: str, payload: Any) -> Dict[str, Any]:
+    """JSON request for one signature (kind: transaction or message)"""
+    if kind == "transaction":
+        transaction = {
+            key: (HexBytes(value).hex() if isinstance(value, (bytes, bytearray)) else value)
+            for key, value in payload.items()
+        }
+        return {"kind": "transaction", "transaction": transaction}
+    return {
+        "kind": "message",
+        "version": payload.version.hex(),
+        "header": payload.header.hex(),
+        "body": payload.body.hex()
+    }
+
+
+def sign_request_with_account(account, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Sign one decoded request with an eth_account account (used by LocalSigner and the signer server)"""
+    if request["kind"] == "transaction":
+        signed = account.sign_transaction(request["transaction"])
+        return {
+            "raw_transaction": signed.raw_transaction.hex(),
+            "hash": signed.hash.hex(),
+            "r": hex(signed.r), "s": hex(signed.s), "v": signed.v
+        }
+    message = SignableMessage(
+        version=bytes.fromhex(request["version"]),
+        header=bytes.fromhex(request["header"]),
+        body=bytes.fromhex(request["body"])
+    )
+    signed = account.sign_message(message)
+    return {
+        "message_hash": signed.message_hash.hex(),
+        "signature": signed.signature.hex(),
+        "r": hex(signed.r), "s": hex(signed.s), "v": signed.v
+    }
+
+
+def decode_sign_result(kind: str, result: Dict[str, Any]):
+    """Rebuild the eth_account result objects from a JSON sign result"""
+    if "error" in result:
+        raise Exception(f"Remote signer error: {result['error']}")
+    if kind == "transaction":
+        return SignedTransaction(
+            raw_transaction=HexBytes(result["raw_transaction"]),
+            hash=HexBytes(result["hash"]),
+            r=int(result["r"], 16), s=int(result["s"], 16), v=int(result["v"])
+        )
+    return SignedMessage(
+        message_hash=HexBytes(result["message_hash"]),
+        r=int(result["r"], 16), s=int(result["s"], 16), v=int(result["v"]),
+        signature=HexBytes(result["signature"])
+    )
+
+
+# ==================== Signer Backends ====================
+
+class BaseSigner(ABC):
+    """Signs transactions and EIP-191/712 messages for one address"""
+
+    address: str
+
+    def sign_transaction(self, transaction: Dict[str, Any]) -> SignedTransaction:
+        return self.sign_many([("transaction", transaction)])[0]
+
+    def sign_message(self, message: SignableMessage) -> SignedMessage:
+        return self.sign_many([("message", message)])[0]
+
+    @abstractmethod
+    def sign_many(self, requests: List[tuple]) -> List[Any]:
+        """
+        Sign several requests at once
+
+        Args:
+            requests: (kind, payload) pairs, kind is "transaction" (dict) or "message" (SignableMessage)
+
+        Returns:
+            SignedTransaction / SignedMessage per request, in order
+        """
+        pass
+
+
+class LocalSigner(BaseSigner):
+    """In-process private key"""
+
+    def __init__(self, private_key: str):
+        self._account = Account.from_key(private_key)
+        self.address = self._account.address
+
+    @property
+    def private_key_bytes(self) -> bytes:
+        """Raw key, only handed to the crypto process pool (services/crypto_executor.py)"""
+        return bytes(self._account.key)
+
+    def sign_transaction(self, transaction: Dict[str, Any]) -> SignedTransaction:
+        return self._account.sign_transaction(transaction)
+
+    def sign_message(self, message: SignableMessage) -> SignedMessage:
+        return self._account.sign_message(message)
+
+    def sign_many(self, requests: List[tuple]) -> List[Any]:
+        return [
+            self.sign_transaction(payload) if kind == "transaction" else self.sign_message(payload)
+            for kind, payload in requests
+        ]
+
+
+class RemoteSigner(BaseSigner):
+    """Signer process reached over HTTP (http://host:port) or a Unix socket (unix:///path)"""
+
+    def __init__(self, address: str, url: str = SIGNER_URL, timeout: float = SIGNER_TIMEOUT_SECONDS):
+        """
+        Initialize the remote signer
+
+        Args:
+            address: Address whose key is held by the signer process
+            url: Signer endpoint
+            timeout: Request timeout in seconds
+        """
+        import httpx
+
+        self.address = Web3.to_checksum_address(address)
+        self.url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            self._client = httpx.Client(transport=transport, base_url="http://signer", timeout=timeout)
+        else:
+            self._client = httpx.Client(base_url=url, timeout=timeout)
+
+    def sign_many(self, requests: List[tuple]) -> List[Any]:
+        response = self._client.post("/sign", json={
+            "address": self.address,
+            "requests": [encode_sign_request(kind, payload) for kind, payload in requests]
+        })
+        response.raise_for_status()
+        results = response.json()["results"]
+        return [decode_sign_result(kind, result) for (kind, _), result in zip(requests, results)]
+
+    def close(self):
+        self._client.close()
+
+
+class BatchingSigner(BaseSigner):
+    """
+    Pipelines concurrent sign requests into batched calls of the wrapped signer
+
+    Callers block only until their own batch returns; requests arriving within
+    max_wait_ms of each other share one round trip.
+    """
+
+    def __init__(self, inner: BaseSigner, max_batch: int = SIGNER_BATCH_MAX_SIZE, max_wait_ms: float = SIGNER_BATCH_MAX_WAIT_MS):
+        self.inner = inner
+        self.address = inner.address
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Queue = Queue()
+        self._worker = threading.Thread(target=self._run, name=f"signer-batch-{self.address[:10]}", daemon=True)
+        self._worker.start()
+
+    def sign_many(self, requests: List[tuple]) -> List[Any]:
+        futures = []
+        for request in requests:
+            future = Future()
+            self._queue.put((request, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+            except Empty:
+                pass
+            try:
+                results = self.inner.sign_many([request for request, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+# ==================== Factory ====================
+
+def create_signer(private_key: Optional[str] = None, address: Optional[str] = None) -> BaseSigner:
+    """
+    Create a signer for the configured backend (SIGNER_BACKEND)
+
+    Args:
+        private_key: Key for the local backend
+        address: Address for the remote/batching backends (derived from private_key if omitted)
+
+    Returns:
+        A signer with the LocalAccount surface (address, sign_transaction, sign_message)
+    """
+    if SIGNER_BACKEND == "local":
+        if not private_key:
+            raise ValueError("Private key required for SIGNER_BACKEND=local")
+        return LocalSigner(private_key)
+
+    if not address and private_key:
+        address = Account.from_key(private_key).address
+    if not address:
+        raise ValueError(f"Signer address required for SIGNER_BACKEND={SIGNER_BACKEND}")
+
+    signer = RemoteSigner(address, SIGNER_URL)
+    if SIGNER_BACKEND == "batching":
+        signer = BatchingSigner(signer)
+    elif SIGNER_BACKEND != "remote":
+        raise ValueError(f"Unknown SIGNER_BACKEND: {SIGNER_BACKEND}")
+    logger.info(f"[Signer] Using {SIGNER_BACKEND} signer for {signer.address} via {SIGNER_URL}")
+    return signer
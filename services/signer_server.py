@@ -0,0 +1,122 @@
+"""
+Stand-in Remote Signer Server
+
+A minimal signer process for local development and tests of the remote/batching signer
+backends (services/signer.py). Keys are held only by this process.
+
+Endpoints:
+- GET  /accounts  -> {"accounts": [address, ...]}
+- POST /sign      -> {"address", "requests": [...]} -> {"results": [...]}
+
+Usage:
+    SIGNER_SERVER_KEYS=<KEY_1>,<KEY_2> python -m services.signer_server --port 8700
+    SIGNER_SERVER_KEYS=<KEY_1> python -m services.signer_server --unix /tmp/zen7-signer.sock
+"""
+from log import logger
+import os
+import json
+import argparse
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from eth_account import Account
+
+from services.signer import sign_request_with_account
+
+
+class SignerRequestHandler(BaseHTTPRequestHandler):
+    accounts: Dict[str, object] = {}
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/accounts":
+            self._reply(200, {"accounts": list(self.accounts.keys())})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/sign":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            account = self.accounts.get(request["address"].lower())
+            if account is None:
+                self._reply(403, {"error": f"Unknown signer address: {request['address']}"})
+                return
+            results = []
+            for sign_request in request["requests"]:
+                try:
+                    results.append(sign_request_with_account(account, sign_request))
+                except Exception as e:
+                    results.append({"error": str(e)})
+            self._reply(200, {"results": results})
+        except Exception as e:
+            self._reply(400, {"error": str(e)})
+
+    def address_string(self) -> str:
+        # Unix socket clients have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"[SignerServer] {self.address_string()} {format % args}")
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_signer_server(private_keys: List[str], host: str = "127.0.0.1", port: int = 8700, unix_path: str = None):
+    """
+    Create (but do not start) a signer server holding the given keys
+
+    Args:
+        private_keys: Keys served by this process
+        host, port: TCP bind address (ignored when unix_path is set)
+        unix_path: Unix socket path
+
+    Returns:
+        The server; call serve_forever() or start_signer_server_thread()
+    """
+    accounts = {}
+    for key in private_keys:
+        account = Account.from_key(key.strip())
+        accounts[account.address.lower()] = account
+    handler = type("BoundSignerRequestHandler", (SignerRequestHandler,), {"accounts": accounts})
+
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = ThreadingUnixHTTPServer(unix_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"[SignerServer] Serving {len(accounts)} account(s) on {unix_path or f'{host}:{port}'}")
+    return server
+
+
+def start_signer_server_thread(server) -> threading.Thread:
+    """Run a signer server in a daemon thread (for tests and benchmarks)"""
+    thread = threading.Thread(target=server.serve_forever, name="signer-server", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in remote signer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--unix", default=None, help="Unix socket path (overrides host/port)")
+    args = parser.parse_args()
+
+    keys = [key for key in os.getenv("SIGNER_SERVER_KEYS", "").split(",") if key.strip()]
+    if not keys:
+        raise SystemExit("SIGNER_SERVER_KEYS not configured")
+    create_signer_server(keys, args.host, args.port, args.unix).serve_forever()
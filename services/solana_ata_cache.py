@@ -0,0 +1,102 @@
+"""
+Associated Token Account Existence Cache
+
+Whether a payee's associated token account (ATA) exists decides if a transfer needs a
+create-ATA instruction. ATAs are practically never closed, so existence is cached per
+(owner, mint) on each cluster:
+
+- Positive entries: kept for the life of the process (filled by lookups and by confirmed transfers)
+- Negative entries: kept for SOLANA_ATA_NEGATIVE_TTL_SECONDS only, the account may be created any time
+- Unknown (lookup failed): callers add the idempotent create instruction, which is a no-op
+  for an existing account
+
+Configuration (.env):
+- SOLANA_ATA_NEGATIVE_TTL_SECONDS: Lifetime of "does not exist" entries (default: 10)
+- SOLANA_ATA_CACHE_MAX_ENTRIES: Max positive entries per cluster (default: 100000)
+"""
+from log import logger
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_ATA_NEGATIVE_TTL_SECONDS = float(os.getenv("SOLANA_ATA_NEGATIVE_TTL_SECONDS", "10"))
+SOLANA_ATA_CACHE_MAX_ENTRIES = int(os.getenv("SOLANA_ATA_CACHE_MAX_ENTRIES", "100000"))
+
+
+class AtaCache:
+    """ATA existence per (owner, mint) on one Solana cluster"""
+
+    def __init__(self, rpc_url: str):
+        self.rpc_url = rpc_url
+        self._existing: Dict[Tuple[str, str], bool] = {}
+        self._missing: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def mark_exists(self, owner, mint):
+        """Record that the ATA of (owner, mint) exists (e.g. after a confirmed transfer into it)"""
+        key = (str(owner), str(mint))
+        with self._lock:
+            self._missing.pop(key, None)
+            if len(self._existing) >= SOLANA_ATA_CACHE_MAX_ENTRIES:
+                self._existing.clear()
+            self._existing[key] = True
+
+    def cached(self, owner, mint) -> Optional[bool]:
+        """True / False from the cache, None when unknown or the negative entry expired"""
+        key = (str(owner), str(mint))
+        with self._lock:
+            if key in self._existing:
+                return True
+            expires_at = self._missing.get(key)
+            if expires_at is not None:
+                if time.monotonic() < expires_at:
+                    return False
+                del self._missing[key]
+        return None
+
+    async def exists(self, owner, mint, ata) -> Optional[bool]:
+        """
+        Whether the ATA of (owner, mint) exists
+
+        Args:
+            owner, mint: solders Pubkeys the ATA was derived from
+            ata: The associated token account address
+
+        Returns:
+            True / False, or None if the lookup failed
+        """
+        cached = self.cached(owner, mint)
+        if cached is not None:
+            return cached
+        try:
+            response = await get_solana_client(self.rpc_url).get_account_info(ata)
+        except Exception as e:
+            logger.warning(f"[Solana] ATA lookup failed for {ata}: {e}")
+            return None
+        if response.value:
+            self.mark_exists(owner, mint)
+            return True
+        with self._lock:
+            self._missing[(str(owner), str(mint))] = time.monotonic() + SOLANA_ATA_NEGATIVE_TTL_SECONDS
+        return False
+
+
+_ata_caches: Dict[str, AtaCache] = {}
+_ata_caches_lock = threading.Lock()
+
+
+def get_ata_cache(rpc_url: str) -> AtaCache:
+    """Get (or create) the ATA existence cache of a cluster"""
+    with _ata_caches_lock:
+        cache = _ata_caches.get(rpc_url)
+        if cache is None:
+            cache = AtaCache(rpc_url)
+            _ata_caches[rpc_url] = cache
+        return cache
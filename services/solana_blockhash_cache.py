@@ -0,0 +1,162 @@
+"""
+Background Recent-Blockhash Cache for Solana
+
+A Solana transaction references a recent blockhash and is only valid until the chain passes
+that blockhash's last-valid block height (~150 blocks, 60-90s). Instead of calling
+getLatestBlockhash on every payment, one cache per cluster is refreshed by a background
+task and serves the current blockhash with its last-valid block height:
+
+- Transaction building reads the cached blockhash (no RPC while it is fresh)
+- Submission refuses a transaction whose blockhash has fewer than
+  SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS blocks of validity left
+- The current block height between refreshes is extrapolated from the slot time
+
+Without the background task (scripts, tests) a stale cache refreshes itself on read.
+
+Configuration (.env):
+- SOLANA_BLOCKHASH_CACHE_ENABLED: true (default) / false to fetch a blockhash per transaction
+- SOLANA_BLOCKHASH_REFRESH_SECONDS: Refresh interval (default: 2)
+- SOLANA_BLOCKHASH_MAX_AGE_SECONDS: Max age of a served blockhash (default: 10)
+- SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS: Refuse blockhashes closer to expiry (default: 20)
+"""
+from log import logger
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_BLOCKHASH_CACHE_ENABLED = os.getenv("SOLANA_BLOCKHASH_CACHE_ENABLED", "true").lower() == "true"
+SOLANA_BLOCKHASH_REFRESH_SECONDS = float(os.getenv("SOLANA_BLOCKHASH_REFRESH_SECONDS", "2"))
+SOLANA_BLOCKHASH_MAX_AGE_SECONDS = float(os.getenv("SOLANA_BLOCKHASH_MAX_AGE_SECONDS", "10"))
+SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS = int(os.getenv("SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS", "20"))
+
+# Target slot time, used to extrapolate the block height between refreshes
+SLOT_SECONDS = 0.4
+
+# Blockhashes we served (and their last-valid heights) kept for the submission check
+MAX_KNOWN_BLOCKHASHES = 64
+
+
+class BlockhashCache:
+    """Recent blockhash of one Solana cluster"""
+
+    def __init__(self, rpc_url: str):
+        """
+        Initialize the cache
+
+        Args:
+            rpc_url: Cluster RPC URL (the shared client of the cluster is used)
+        """
+        self.rpc_url = rpc_url
+        self.blockhash = None
+        self.last_valid_block_height: Optional[int] = None
+        self._block_height: Optional[int] = None
+        self._fetched_at = 0.0
+        self._known: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    @property
+    def client(self):
+        return get_solana_client(self.rpc_url)
+
+    def estimated_block_height(self) -> Optional[int]:
+        """Block height at the last refresh plus the blocks expected since then"""
+        if self._block_height is None:
+            return None
+        return self._block_height + int((time.monotonic() - self._fetched_at) / SLOT_SECONDS)
+
+    def remaining_blocks(self, last_valid_block_height: int) -> Optional[int]:
+        height = self.estimated_block_height()
+        return None if height is None else last_valid_block_height - height
+
+    def _is_fresh(self) -> bool:
+        if self.blockhash is None or time.monotonic() - self._fetched_at > SOLANA_BLOCKHASH_MAX_AGE_SECONDS:
+            return False
+        remaining = self.remaining_blocks(self.last_valid_block_height)
+        return remaining is not None and remaining > SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS
+
+    async def refresh(self):
+        """Fetch the latest blockhash and the current block height"""
+        async with self._lock:
+            blockhash_response, height_response = await asyncio.gather(
+                self.client.get_latest_blockhash(),
+                self.client.get_block_height()
+            )
+            value = blockhash_response.value
+            self.blockhash = value.blockhash
+            self.last_valid_block_height = value.last_valid_block_height
+            self._block_height = height_response.value
+            self._fetched_at = time.monotonic()
+            self._known[str(value.blockhash)] = value.last_valid_block_height
+            self._known.move_to_end(str(value.blockhash))
+            while len(self._known) > MAX_KNOWN_BLOCKHASHES:
+                self._known.popitem(last=False)
+
+    async def get_blockhash(self) -> Tuple[object, int]:
+        """
+        Current blockhash of the cluster
+
+        Returns:
+            (solders Hash, last_valid_block_height); refreshed inline if the cached one is stale
+        """
+        if not SOLANA_BLOCKHASH_CACHE_ENABLED or not self._is_fresh():
+            await self.refresh()
+        return self.blockhash, self.last_valid_block_height
+
+    async def check_blockhash(self, blockhash) -> Optional[str]:
+        """
+        Check that a transaction's blockhash has enough validity left for submission
+
+        Args:
+            blockhash: The transaction's recent_blockhash
+
+        Returns:
+            None if usable, otherwise the reason it is refused
+        """
+        last_valid = self._known.get(str(blockhash))
+        if last_valid is None:
+            # Not served by us (e.g. built by an external client): ask the cluster once
+            response = await self.client.is_blockhash_valid(blockhash)
+            return None if response.value else f"Blockhash {blockhash} is no longer valid"
+
+        if self._block_height is None or time.monotonic() - self._fetched_at > SOLANA_BLOCKHASH_MAX_AGE_SECONDS:
+            await self.refresh()
+        remaining = self.remaining_blocks(last_valid)
+        if remaining <= SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS:
+            return f"Blockhash {blockhash} expires in ~{max(remaining, 0)} blocks (minimum {SOLANA_BLOCKHASH_MIN_REMAINING_BLOCKS})"
+        return None
+
+
+_blockhash_caches: Dict[str, BlockhashCache] = {}
+_blockhash_caches_lock = threading.Lock()
+
+
+def get_blockhash_cache(rpc_url: str) -> BlockhashCache:
+    """Get (or create) the blockhash cache of a cluster; created caches are refreshed by run_blockhash_refresh"""
+    with _blockhash_caches_lock:
+        cache = _blockhash_caches.get(rpc_url)
+        if cache is None:
+            cache = BlockhashCache(rpc_url)
+            _blockhash_caches[rpc_url] = cache
+        return cache
+
+
+async def run_blockhash_refresh(interval_seconds: float = SOLANA_BLOCKHASH_REFRESH_SECONDS):
+    """Background loop refreshing every registered cluster's blockhash (started in the FastAPI lifespan)"""
+    logger.info(f"[Solana] Blockhash refresh loop started (interval: {interval_seconds}s)")
+    while True:
+        with _blockhash_caches_lock:
+            caches = list(_blockhash_caches.values())
+        results = await asyncio.gather(*[cache.refresh() for cache in caches], return_exceptions=True)
+        for cache, result in zip(caches, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[Solana] Blockhash refresh failed for {cache.rpc_url}: {result}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,82 @@
+"""
+Shared Solana RPC Clients
+
+One pooled AsyncClient per RPC endpoint (cluster), shared by the signing code
+(execute_sign_solana) and the transfer handlers instead of a new client per call:
+
+- Keep-alive: idle HTTP connections are reused for SOLANA_RPC_KEEPALIVE_SECONDS
+- Concurrency limit: at most SOLANA_RPC_MAX_CONCURRENCY requests in flight per cluster,
+  further requests wait for a free connection (up to SOLANA_RPC_POOL_TIMEOUT_SECONDS)
+- Closed once on server shutdown (close_solana_clients in the FastAPI lifespan)
+
+Configuration (.env):
+- SOLANA_RPC_MAX_CONCURRENCY: In-flight requests per cluster (default: 16)
+- SOLANA_RPC_KEEPALIVE_SECONDS: Idle connection lifetime (default: 30)
+- SOLANA_RPC_TIMEOUT_SECONDS: Request timeout (default: 10)
+- SOLANA_RPC_POOL_TIMEOUT_SECONDS: Max wait for a free connection (default: 30)
+"""
+from log import logger
+import os
+import threading
+from typing import Dict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_RPC_MAX_CONCURRENCY = int(os.getenv("SOLANA_RPC_MAX_CONCURRENCY", "16"))
+SOLANA_RPC_KEEPALIVE_SECONDS = float(os.getenv("SOLANA_RPC_KEEPALIVE_SECONDS", "30"))
+SOLANA_RPC_TIMEOUT_SECONDS = float(os.getenv("SOLANA_RPC_TIMEOUT_SECONDS", "10"))
+SOLANA_RPC_POOL_TIMEOUT_SECONDS = float(os.getenv("SOLANA_RPC_POOL_TIMEOUT_SECONDS", "30"))
+
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _create_client(rpc_url: str):
+    import httpx
+    from solana.rpc.async_api import AsyncClient  # type: ignore
+    from solana.rpc.commitment import Confirmed  # type: ignore
+
+    client = AsyncClient(rpc_url, commitment=Confirmed, timeout=SOLANA_RPC_TIMEOUT_SECONDS)
+    # Swap the provider's default (unused, unbounded) httpx session for a bounded keep-alive pool
+    client._provider.session = httpx.AsyncClient(
+        timeout=httpx.Timeout(SOLANA_RPC_TIMEOUT_SECONDS, pool=SOLANA_RPC_POOL_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=SOLANA_RPC_MAX_CONCURRENCY,
+            max_keepalive_connections=SOLANA_RPC_MAX_CONCURRENCY,
+            keepalive_expiry=SOLANA_RPC_KEEPALIVE_SECONDS
+        )
+    )
+    return client
+
+
+def get_solana_client(rpc_url: str):
+    """
+    Get the shared AsyncClient of a Solana RPC endpoint (created on first use)
+
+    Args:
+        rpc_url: Cluster RPC URL
+
+    Returns:
+        solana.rpc.async_api.AsyncClient (do not close it, see close_solana_clients)
+    """
+    with _clients_lock:
+        client = _clients.get(rpc_url)
+        if client is None:
+            client = _create_client(rpc_url)
+            _clients[rpc_url] = client
+            logger.info(f"[Solana] Shared RPC client for {rpc_url} (max {SOLANA_RPC_MAX_CONCURRENCY} concurrent requests)")
+        return client
+
+
+async def close_solana_clients():
+    """Close all shared Solana clients (called on server shutdown)"""
+    with _clients_lock:
+        clients = list(_clients.items())
+        _clients.clear()
+    for rpc_url, client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"[Solana] Failed to close RPC client for {rpc_url}: {e}")
@@ -0,0 +1,166 @@
+"""
+Bulk Solana Confirmation Tracker
+
+Instead of fetching the full transaction (getTransaction) per payment every couple of
+seconds, pending signatures of a cluster are collected and polled together with
+getSignatureStatuses (up to 256 signatures per request). Each waiting payment holds a
+future that resolves once its signature reaches the configured commitment level or fails,
+so RPC cost grows with elapsed time rather than with the number of payments in flight.
+
+Configuration (.env):
+- SOLANA_CONFIRMATION_COMMITMENT: processed, confirmed (default) or finalized
+- SOLANA_CONFIRMATION_POLL_SECONDS: Poll interval while signatures are pending (default: 1)
+"""
+from log import logger
+import os
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_CONFIRMATION_COMMITMENT = os.getenv("SOLANA_CONFIRMATION_COMMITMENT", "confirmed").lower()
+SOLANA_CONFIRMATION_POLL_SECONDS = float(os.getenv("SOLANA_CONFIRMATION_POLL_SECONDS", "1"))
+
+# getSignatureStatuses accepts at most 256 signatures per request
+MAX_SIGNATURES_PER_REQUEST = 256
+
+COMMITMENT_RANK = {"processed": 0, "confirmed": 1, "finalized": 2}
+
+
+def _status_rank(confirmation_status) -> int:
+    """Rank of a solders TransactionConfirmationStatus (Processed/Confirmed/Finalized)"""
+    if confirmation_status is None:
+        return -1
+    return COMMITMENT_RANK.get(str(confirmation_status).rsplit(".", 1)[-1].lower(), -1)
+
+
+class SolanaConfirmationTracker:
+    """Resolves per-signature futures from batched getSignatureStatuses polls"""
+
+    def __init__(self, rpc_url: str, commitment: str = SOLANA_CONFIRMATION_COMMITMENT,
+                 poll_seconds: float = SOLANA_CONFIRMATION_POLL_SECONDS):
+        """
+        Initialize the tracker
+
+        Args:
+            rpc_url: Cluster RPC URL (the shared client of the cluster is used)
+            commitment: Level at which a signature counts as confirmed
+            poll_seconds: Poll interval while signatures are pending
+        """
+        if commitment not in COMMITMENT_RANK:
+            raise ValueError(f"Unknown SOLANA_CONFIRMATION_COMMITMENT: {commitment}")
+        self.rpc_url = rpc_url
+        self.commitment = commitment
+        self.poll_seconds = poll_seconds
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self._poll_task: Optional[asyncio.Task] = None
+
+    async def wait(self, signature: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a signature to be confirmed or fail
+
+        Args:
+            signature: Transaction signature (base58)
+            timeout: Max seconds to wait
+
+        Returns:
+            Status dict ({"success", "status": confirmed/failed, "message", "details"}) or None on timeout
+        """
+        future = self._pending.get(signature)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[signature] = future
+        self._waiters[signature] = self._waiters.get(signature, 0) + 1
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll_loop())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            # Stop tracking once nobody waits for the signature any more
+            self._waiters[signature] -= 1
+            if self._waiters[signature] == 0:
+                del self._waiters[signature]
+                self._pending.pop(signature, None)
+
+    async def _poll_loop(self):
+        while self._pending:
+            await asyncio.sleep(self.poll_seconds)
+            signatures = [signature for signature, future in self._pending.items() if not future.done()]
+            chunks = [
+                signatures[i:i + MAX_SIGNATURES_PER_REQUEST]
+                for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST)
+            ]
+            results = await asyncio.gather(*[self._poll_chunk(chunk) for chunk in chunks], return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"[Solana] getSignatureStatuses failed on {self.rpc_url}: {result}")
+
+    async def _poll_chunk(self, signatures: List[str]):
+        from solders.signature import Signature  # type: ignore
+
+        response = await get_solana_client(self.rpc_url).get_signature_statuses(
+            [Signature.from_string(signature) for signature in signatures]
+        )
+        for signature, status in zip(signatures, response.value):
+            future = self._pending.get(signature)
+            if future is None or future.done():
+                continue
+            result = self.status_result(signature, status)
+            if result is not None:
+                future.set_result(result)
+
+    def status_result(self, signature: str, status) -> Optional[Dict[str, Any]]:
+        """
+        Status dict of a getSignatureStatuses entry
+
+        Args:
+            signature: Transaction signature (base58)
+            status: The entry (solders TransactionStatus or None)
+
+        Returns:
+            {"success", "status": confirmed/failed, ...} once the signature failed or reached the
+            tracker's commitment, None while it is unknown or below the commitment
+        """
+        if status is None:
+            return None
+        if status.err is not None:
+            return {
+                "success": False,
+                "status": "failed",
+                "signature": signature,
+                "tx_hash": signature,
+                "message": f"Solana transaction failed: {status.err}",
+                "details": {"error": str(status.err), "slot": status.slot}
+            }
+        if _status_rank(status.confirmation_status) >= COMMITMENT_RANK[self.commitment]:
+            return {
+                "success": True,
+                "status": "confirmed",
+                "signature": signature,
+                "tx_hash": signature,
+                "message": "Solana transaction confirmed successfully",
+                "details": {"slot": status.slot, "confirmation_status": self.commitment}
+            }
+        return None
+
+
+_trackers: Dict[str, SolanaConfirmationTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_confirmation_tracker(rpc_url: str) -> SolanaConfirmationTracker:
+    """Get (or create) the confirmation tracker of a cluster"""
+    with _trackers_lock:
+        tracker = _trackers.get(rpc_url)
+        if tracker is None:
+            tracker = SolanaConfirmationTracker(rpc_url)
+            _trackers[rpc_url] = tracker
+        return tracker
@@ -0,0 +1,131 @@
+"""
+SPL Delegation Tracker (Solana approve/delegate mode)
+
+In the default Solana flow every payment needs a new partial signature of the user. In
+delegate mode (SOLANA_DELEGATE_MODE=true) the user signs one SPL approve_checked for a
+budget, naming the backend fee payer as delegate; later payments are transfer_checked
+pulls signed by the fee payer alone until the budget is used up.
+
+The remaining delegated amount per (owner, mint) is tracked locally:
+
+- Loaded once from the owner's token account (delegate + delegated_amount)
+- Set when an approve is confirmed, reserved before each pull and restored if the pull
+  fails, so concurrent pulls cannot overdraw the delegation
+- Dropped after an on-chain error so the next lookup re-reads the account
+
+Configuration (.env):
+- SOLANA_DELEGATE_MODE: One approve per budget, then delegate pulls (default: false)
+"""
+from log import logger
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_DELEGATE_MODE = os.getenv("SOLANA_DELEGATE_MODE", "false").lower() == "true"
+
+# SPL token account layout: mint(32) owner(32) amount(u64) delegate(COption<Pubkey>) state(u8)
+# is_native(COption<u64>) delegated_amount(u64) close_authority(COption<Pubkey>)
+TOKEN_ACCOUNT_LENGTH = 165
+DELEGATE_OFFSET = 72
+DELEGATED_AMOUNT_OFFSET = 121
+
+
+def parse_token_account_delegation(data: bytes) -> Tuple[Optional[str], int]:
+    """(delegate, delegated_amount) of an SPL token account's data"""
+    from solders.pubkey import Pubkey  # type: ignore
+
+    data = bytes(data)
+    if len(data) < TOKEN_ACCOUNT_LENGTH:
+        raise ValueError("Not an SPL token account")
+    if int.from_bytes(data[DELEGATE_OFFSET:DELEGATE_OFFSET + 4], "little") != 1:
+        return None, 0
+    delegate = Pubkey.from_bytes(data[DELEGATE_OFFSET + 4:DELEGATE_OFFSET + 36])
+    return str(delegate), int.from_bytes(data[DELEGATED_AMOUNT_OFFSET:DELEGATED_AMOUNT_OFFSET + 8], "little")
+
+
+class DelegationTracker:
+    """Remaining delegated amounts to one delegate on one Solana cluster"""
+
+    def __init__(self, rpc_url: str, delegate: str):
+        """
+        Initialize the tracker
+
+        Args:
+            rpc_url: Cluster RPC URL (the shared client of the cluster is used)
+            delegate: Delegate the approvals name (the backend fee payer)
+        """
+        self.rpc_url = rpc_url
+        self.delegate = str(delegate)
+        self._remaining: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    async def remaining(self, owner, mint, token_account) -> int:
+        """
+        Remaining delegated amount of (owner, mint), read from the token account once
+
+        Args:
+            owner, mint: solders Pubkeys
+            token_account: The owner's token account the approval was made on
+        """
+        key = (str(owner), str(mint))
+        with self._lock:
+            if key in self._remaining:
+                return self._remaining[key]
+        response = await get_solana_client(self.rpc_url).get_account_info(token_account)
+        delegated = 0
+        if response.value:
+            delegate, amount = parse_token_account_delegation(response.value.data)
+            if delegate == self.delegate:
+                delegated = amount
+        with self._lock:
+            # Keep a value set (or reserved against) while the account was being read
+            return self._remaining.setdefault(key, delegated)
+
+    def set(self, owner, mint, amount: int):
+        """Record a confirmed approve (approve replaces the previous delegated amount)"""
+        with self._lock:
+            self._remaining[(str(owner), str(mint))] = int(amount)
+
+    def reserve(self, owner, mint, amount: int) -> bool:
+        """Take amount from a loaded delegation before a pull; False if it does not cover it"""
+        key = (str(owner), str(mint))
+        with self._lock:
+            remaining = self._remaining.get(key, 0)
+            if remaining < amount:
+                return False
+            self._remaining[key] = remaining - amount
+            return True
+
+    def restore(self, owner, mint, amount: int):
+        """Give back a reservation whose pull was not submitted"""
+        key = (str(owner), str(mint))
+        with self._lock:
+            if key in self._remaining:
+                self._remaining[key] += amount
+
+    def invalidate(self, owner, mint):
+        """Forget the delegation (re-read from chain on next use)"""
+        with self._lock:
+            if self._remaining.pop((str(owner), str(mint)), None) is not None:
+                logger.info(f"[Solana] Delegation of {owner} dropped, will re-read from chain")
+
+
+_delegation_trackers: Dict[Tuple[str, str], DelegationTracker] = {}
+_delegation_trackers_lock = threading.Lock()
+
+
+def get_delegation_tracker(rpc_url: str, delegate: str) -> DelegationTracker:
+    """Get (or create) the delegation tracker of a delegate on a cluster"""
+    key = (rpc_url, str(delegate))
+    with _delegation_trackers_lock:
+        tracker = _delegation_trackers.get(key)
+        if tracker is None:
+            tracker = DelegationTracker(rpc_url, delegate)
+            _delegation_trackers[key] = tracker
+        return tracker
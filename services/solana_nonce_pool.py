@@ -0,0 +1,225 @@
+"""
+Durable-Nonce Account Pool for Pre-Signed Solana Payments
+
+A transaction built on a recent blockhash expires after ~150 blocks (60-90s), so the
+payer's partial signature has to be produced right before settlement. A transaction built
+on a durable nonce instead (first instruction AdvanceNonceAccount, recent_blockhash = the
+nonce account's stored nonce) stays valid until that nonce is advanced, so payments can be
+pre-signed hours ahead and settled whenever a settlement worker has capacity.
+
+The pool manages SOLANA_NONCE_POOL_SIZE nonce accounts owned by the fee payer, derived
+with create_with_seed(fee_payer, "zen7-nonce-<i>") so no extra keys are needed:
+
+- ensure_accounts: creates (and funds with rent) missing accounts, loads current nonces
+- reserve: hands out a free account and its current nonce for one payment
+- release: after the payment landed or failed (both advance the nonce) the account is
+  free again and its nonce is re-read on next use
+- advance: invalidates an abandoned pre-signed payment before its account is reused
+
+One outstanding pre-signed payment per nonce account; reservations are kept in memory.
+
+Configuration (.env):
+- SOLANA_NONCE_POOL_SIZE: Number of nonce accounts (default: 0 = durable nonces disabled)
+"""
+from log import logger
+import os
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_NONCE_POOL_SIZE = int(os.getenv("SOLANA_NONCE_POOL_SIZE", "0"))
+
+NONCE_SEED_PREFIX = "zen7-nonce-"
+# Versions(u32) + State(u32) + authority(32) + durable nonce(32) + lamports_per_signature(u64)
+NONCE_ACCOUNT_LENGTH = 80
+NONCE_VALUE_OFFSET = 40
+
+
+def parse_nonce_account(data: bytes) -> Tuple[str, str]:
+    """(authority, nonce) of an initialized nonce account's data"""
+    from solders.hash import Hash  # type: ignore
+    from solders.pubkey import Pubkey  # type: ignore
+
+    data = bytes(data)
+    if len(data) < NONCE_ACCOUNT_LENGTH or int.from_bytes(data[4:8], "little") != 1:
+        raise ValueError("Not an initialized nonce account")
+    authority = Pubkey.from_bytes(data[8:40])
+    nonce = Hash.from_bytes(data[NONCE_VALUE_OFFSET:NONCE_VALUE_OFFSET + 32])
+    return str(authority), str(nonce)
+
+
+def durable_nonce_account_of(message) -> Optional[str]:
+    """Nonce account of a transaction built with Message.new_with_nonce (AdvanceNonceAccount first), or None"""
+    if not message.instructions:
+        return None
+    first = message.instructions[0]
+    program_id = message.account_keys[first.program_id_index]
+    # System program AdvanceNonceAccount: instruction index 4 (u32 LE), accounts: nonce, recent blockhashes sysvar, authority
+    if str(program_id) != "11111111111111111111111111111111" or bytes(first.data) != (4).to_bytes(4, "little"):
+        return None
+    return str(message.account_keys[first.accounts[0]])
+
+
+class NonceAccountPool:
+    """Durable-nonce accounts of one fee payer on one Solana cluster"""
+
+    def __init__(self, rpc_url: str, authority: str, size: int = SOLANA_NONCE_POOL_SIZE):
+        """
+        Initialize the pool
+
+        Args:
+            rpc_url: Cluster RPC URL (the shared client of the cluster is used)
+            authority: Fee payer that owns (and advances) the nonce accounts
+            size: Number of nonce accounts
+        """
+        from solders.pubkey import Pubkey  # type: ignore
+        from solders.system_program import ID as SYSTEM_PROGRAM_ID  # type: ignore
+
+        self.rpc_url = rpc_url
+        self.authority = Pubkey.from_string(str(authority))
+        self.seeds: Dict[str, str] = {}
+        for index in range(size):
+            seed = f"{NONCE_SEED_PREFIX}{index}"
+            self.seeds[str(Pubkey.create_with_seed(self.authority, seed, SYSTEM_PROGRAM_ID))] = seed
+        self._free: List[str] = []
+        self._reserved: Dict[str, str] = {}  # nonce account -> payment reference
+        self._nonces: Dict[str, str] = {}  # nonce account -> last known nonce value
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        return get_solana_client(self.rpc_url)
+
+    def is_pool_account(self, nonce_account: str) -> bool:
+        return str(nonce_account) in self.seeds
+
+    async def fetch_nonce(self, nonce_account: str) -> Optional[str]:
+        """Current nonce stored in a nonce account (None if the account does not exist)"""
+        from solders.pubkey import Pubkey  # type: ignore
+
+        response = await self.client.get_account_info(Pubkey.from_string(str(nonce_account)))
+        if not response.value:
+            return None
+        authority, nonce = parse_nonce_account(response.value.data)
+        if authority != str(self.authority):
+            raise ValueError(f"Nonce account {nonce_account} is owned by {authority}, not {self.authority}")
+        with self._lock:
+            self._nonces[str(nonce_account)] = nonce
+        return nonce
+
+    async def ensure_accounts(self, fee_payer_keypair):
+        """
+        Create missing nonce accounts (funded by the fee payer) and load the current nonces
+
+        Args:
+            fee_payer_keypair: Fee payer Keypair (authority and funder)
+        """
+        from solders.message import Message  # type: ignore
+        from solders.pubkey import Pubkey  # type: ignore
+        from solders.system_program import create_nonce_account_with_seed  # type: ignore
+        from solders.transaction import Transaction  # type: ignore
+
+        nonces = await asyncio.gather(*[self.fetch_nonce(account) for account in self.seeds], return_exceptions=True)
+        missing = []
+        with self._lock:
+            for account, nonce in zip(self.seeds, nonces):
+                if isinstance(nonce, Exception):
+                    logger.warning(f"[Solana] Nonce account {account} unusable: {nonce}")
+                elif nonce is None:
+                    missing.append(account)
+                elif account not in self._reserved and account not in self._free:
+                    self._free.append(account)
+
+        if missing:
+            rent = (await self.client.get_minimum_balance_for_rent_exemption(NONCE_ACCOUNT_LENGTH)).value
+            for account in missing:
+                instructions = create_nonce_account_with_seed(
+                    self.authority, Pubkey.from_string(account), self.authority, self.seeds[account], self.authority, rent
+                )
+                blockhash = (await self.client.get_latest_blockhash()).value.blockhash
+                transaction = Transaction.new_unsigned(Message.new_with_blockhash(list(instructions), self.authority, blockhash))
+                transaction.sign([fee_payer_keypair], blockhash)
+                await self.client.send_transaction(transaction)
+                logger.info(f"[Solana] Created nonce account {account} ({self.seeds[account]})")
+            # Newly created accounts join the pool once their nonce is readable
+            for account in missing:
+                try:
+                    if await self.fetch_nonce(account):
+                        with self._lock:
+                            self._free.append(account)
+                except Exception:
+                    pass
+        logger.info(f"[Solana] Nonce pool ready: {len(self._free)} free / {len(self.seeds)} accounts")
+
+    async def reserve(self, reference: str) -> Tuple[str, str]:
+        """
+        Reserve a free nonce account for one pre-signed payment
+
+        Args:
+            reference: Payment reference (for tracking)
+
+        Returns:
+            (nonce account, current nonce value) to build the transaction with
+        """
+        with self._lock:
+            if not self._free:
+                raise Exception(f"No free durable nonce account ({len(self._reserved)} reserved)")
+            account = self._free.pop(0)
+            self._reserved[account] = reference
+            nonce = self._nonces.get(account)
+        if nonce is None:
+            nonce = await self.fetch_nonce(account)
+        return account, nonce
+
+    def current_nonce(self, nonce_account: str) -> Optional[str]:
+        """Last known nonce of an account (the value a valid pre-signed transaction must reference)"""
+        with self._lock:
+            return self._nonces.get(str(nonce_account))
+
+    def release(self, nonce_account: str):
+        """Return an account after its transaction landed or failed on-chain (the nonce has advanced)"""
+        account = str(nonce_account)
+        with self._lock:
+            self._reserved.pop(account, None)
+            self._nonces.pop(account, None)  # re-read on next reserve
+            if account in self.seeds and account not in self._free:
+                self._free.append(account)
+
+    async def advance(self, nonce_account: str, fee_payer_keypair):
+        """Advance a reserved account's nonce (invalidates its pre-signed payment), then release it"""
+        from solders.hash import Hash  # type: ignore
+        from solders.message import Message  # type: ignore
+        from solders.pubkey import Pubkey  # type: ignore
+        from solders.transaction import Transaction  # type: ignore
+
+        nonce = self.current_nonce(nonce_account) or await self.fetch_nonce(nonce_account)
+        message = Message.new_with_nonce([], self.authority, Pubkey.from_string(str(nonce_account)), self.authority)
+        transaction = Transaction.new_unsigned(message)
+        transaction.sign([fee_payer_keypair], Hash.from_string(nonce))
+        await self.client.send_transaction(transaction)
+        self.release(nonce_account)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"accounts": len(self.seeds), "free": len(self._free), "reserved": len(self._reserved)}
+
+
+_nonce_pools: Dict[Tuple[str, str], NonceAccountPool] = {}
+_nonce_pools_lock = threading.Lock()
+
+
+def get_nonce_pool(rpc_url: str, authority: str) -> NonceAccountPool:
+    """Get (or create) the nonce pool of a fee payer on a cluster"""
+    key = (rpc_url, str(authority))
+    with _nonce_pools_lock:
+        pool = _nonce_pools.get(key)
+        if pool is None:
+            pool = NonceAccountPool(rpc_url, authority)
+            _nonce_pools[key] = pool
+        return pool
@@ -0,0 +1,282 @@
+"""
+Solana Priority-Fee Oracle and Compute-Budget Estimation
+
+Transactions without ComputeBudget instructions get the default 200k CU per instruction
+limit and no priority fee, so they land late (or expire) when the cluster is congested.
+One oracle per cluster:
+
+- Priority fees: getRecentPrioritizationFees is polled in the background and reduced to a
+  micro-lamports-per-CU price per urgency tier (a percentile of the recent fees)
+- Compute units: a transaction shape (program, account count, instruction discriminator of
+  every instruction) is simulated once; units consumed plus a margin become its cached limit
+- Landing metrics: submit-to-confirm latency per tier, logged on each confirmation
+
+AsyncClient has no get_recent_prioritization_fees method, so the request is posted raw
+through the client's pooled HTTP session.
+
+Configuration (.env):
+- SOLANA_PRIORITY_FEES_ENABLED: true (default) / false to build transactions without ComputeBudget instructions
+- SOLANA_PRIORITY_FEE_URGENCY: Default tier (low, normal, high, urgent; default: normal)
+- SOLANA_PRIORITY_FEE_REFRESH_SECONDS: Background refresh interval (default: 10)
+- SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS: Price cap per CU (default: 1000000)
+- SOLANA_COMPUTE_UNIT_MARGIN: Multiplier on simulated units (default: 1.2)
+"""
+from log import logger
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from services.solana_client_pool import get_solana_client
+
+# Load environment variables
+load_dotenv()
+
+SOLANA_PRIORITY_FEES_ENABLED = os.getenv("SOLANA_PRIORITY_FEES_ENABLED", "true").lower() == "true"
+SOLANA_PRIORITY_FEE_URGENCY = os.getenv("SOLANA_PRIORITY_FEE_URGENCY", "normal").lower()
+SOLANA_PRIORITY_FEE_REFRESH_SECONDS = float(os.getenv("SOLANA_PRIORITY_FEE_REFRESH_SECONDS", "10"))
+SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS = int(os.getenv("SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS", "1000000"))
+SOLANA_COMPUTE_UNIT_MARGIN = float(os.getenv("SOLANA_COMPUTE_UNIT_MARGIN", "1.2"))
+
+# Percentile of recent prioritization fees paid per urgency tier
+URGENCY_PERCENTILES = {"low": 25, "normal": 50, "high": 75, "urgent": 90}
+
+# Floor per tier (micro-lamports per CU) for idle clusters where recent fees are all zero
+URGENCY_MIN_MICROLAMPORTS = {"low": 0, "normal": 1000, "high": 10000, "urgent": 50000}
+
+# Used when simulation fails: transfer_checked ~6.2k CU, idempotent ATA creation ~25k CU
+FALLBACK_COMPUTE_UNITS = 60000
+MAX_COMPUTE_UNITS = 1400000
+
+COMPUTE_BUDGET_PROGRAM_ID = "ComputeBudget111111111111111111111111111111"
+SET_COMPUTE_UNIT_PRICE_DISCRIMINATOR = 3
+
+# getRecentPrioritizationFees accepts at most 128 accounts; the most recently used are sent
+MAX_FEE_ACCOUNTS = 128
+
+# Landing latencies kept per tier for the metrics
+LANDING_SAMPLES = 200
+
+
+def _percentile(values: List[int], percentile: int) -> int:
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def instruction_shape(instructions) -> Tuple:
+    """Cache key of a transaction's compute cost: (program, account count, discriminator) per instruction"""
+    return tuple(
+        (str(ix.program_id), len(ix.accounts), bytes(ix.data[:1]))
+        for ix in instructions
+        if str(ix.program_id) != COMPUTE_BUDGET_PROGRAM_ID
+    )
+
+
+def compute_unit_price_of(message) -> Optional[int]:
+    """SetComputeUnitPrice value (micro-lamports per CU) of a compiled message, or None"""
+    for ix in message.instructions:
+        program_id = message.account_keys[ix.program_id_index]
+        data = bytes(ix.data)
+        if str(program_id) == COMPUTE_BUDGET_PROGRAM_ID and data[:1] == bytes([SET_COMPUTE_UNIT_PRICE_DISCRIMINATOR]):
+            return int.from_bytes(data[1:9], "little")
+    return None
+
+
+class PriorityFeeOracle:
+    """Priority fees, compute-unit limits and landing metrics of one Solana cluster"""
+
+    def __init__(self, rpc_url: str):
+        """
+        Initialize the oracle
+
+        Args:
+            rpc_url: Cluster RPC URL (the shared client of the cluster is used)
+        """
+        self.rpc_url = rpc_url
+        self.fees: Dict[str, int] = {}
+        self.accounts: Dict[str, None] = {}  # insertion-ordered set of write-locked accounts
+        self._fetched_at = 0.0
+        self._compute_units: Dict[Tuple, int] = {}
+        self._landings: Dict[str, deque] = {tier: deque(maxlen=LANDING_SAMPLES) for tier in URGENCY_PERCENTILES}
+        self._submitted: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        return get_solana_client(self.rpc_url)
+
+    # ==================== Priority Fees ====================
+
+    async def refresh(self):
+        """Fetch recent prioritization fees (for the write-locked accounts we transact with) and derive tier prices"""
+        provider = self.client._provider
+        response = await provider.session.post(provider.endpoint_uri, json={
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getRecentPrioritizationFees",
+            "params": [list(self.accounts)] if self.accounts else []
+        })
+        response.raise_for_status()
+        payload = response.json()
+        if "error" in payload:
+            raise Exception(f"getRecentPrioritizationFees error: {payload['error']}")
+        recent = [entry["prioritizationFee"] for entry in payload.get("result", [])]
+        self.fees = {
+            tier: min(
+                max(_percentile(recent, percentile), URGENCY_MIN_MICROLAMPORTS[tier]),
+                SOLANA_PRIORITY_FEE_MAX_MICROLAMPORTS
+            )
+            for tier, percentile in URGENCY_PERCENTILES.items()
+        }
+        self._fetched_at = time.monotonic()
+
+    async def get_fee(self, urgency: str = SOLANA_PRIORITY_FEE_URGENCY) -> int:
+        """Compute-unit price (micro-lamports) for an urgency tier; refreshed inline when stale"""
+        if urgency not in URGENCY_PERCENTILES:
+            raise ValueError(f"Unknown urgency tier: {urgency}. Supported: {list(URGENCY_PERCENTILES.keys())}")
+        if not self.fees or time.monotonic() - self._fetched_at > SOLANA_PRIORITY_FEE_REFRESH_SECONDS * 3:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"[Solana] Priority fee refresh failed for {self.rpc_url}: {e}")
+        return self.fees.get(urgency, URGENCY_MIN_MICROLAMPORTS[urgency])
+
+    def tier_for_price(self, price: Optional[int]) -> str:
+        """Highest tier whose current price the given price meets ("none" without a priority fee)"""
+        if not price:
+            return "none"
+        matched = "low"
+        for tier in URGENCY_PERCENTILES:
+            if price >= self.fees.get(tier, URGENCY_MIN_MICROLAMPORTS[tier]):
+                matched = tier
+        return matched
+
+    # ==================== Compute Units ====================
+
+    async def get_compute_unit_limit(self, instructions, fee_payer, recent_blockhash) -> int:
+        """
+        Compute-unit limit for a set of instructions (simulated once per instruction shape)
+
+        Args:
+            instructions: The transaction's instructions (without ComputeBudget instructions)
+            fee_payer: Fee payer Pubkey
+            recent_blockhash: Blockhash used for the simulation message
+        """
+        shape = instruction_shape(instructions)
+        with self._lock:
+            if shape in self._compute_units:
+                return self._compute_units[shape]
+
+        from solders.compute_budget import set_compute_unit_limit  # type: ignore
+        from solders.message import Message  # type: ignore
+        from solders.transaction import Transaction  # type: ignore
+
+        limit = FALLBACK_COMPUTE_UNITS
+        try:
+            message = Message.new_with_blockhash(
+                [set_compute_unit_limit(MAX_COMPUTE_UNITS), *instructions], fee_payer, recent_blockhash
+            )
+            response = await self.client.simulate_transaction(Transaction.new_unsigned(message), sig_verify=False)
+            units = response.value.units_consumed if response.value else None
+            if units and response.value.err is None:
+                limit = min(MAX_COMPUTE_UNITS, math.ceil(units * SOLANA_COMPUTE_UNIT_MARGIN))
+                with self._lock:
+                    self._compute_units[shape] = limit
+            else:
+                logger.warning(f"[Solana] Compute unit simulation failed ({response.value.err if response.value else 'no result'}), using {limit}")
+        except Exception as e:
+            logger.warning(f"[Solana] Compute unit simulation failed for {self.rpc_url}: {e}, using {limit}")
+        return limit
+
+    async def compute_budget_instructions(self, instructions, fee_payer, recent_blockhash,
+                                          urgency: str = SOLANA_PRIORITY_FEE_URGENCY) -> List:
+        """
+        SetComputeUnitLimit / SetComputeUnitPrice instructions to prepend to a transaction
+
+        Returns:
+            [] when SOLANA_PRIORITY_FEES_ENABLED is false
+        """
+        if not SOLANA_PRIORITY_FEES_ENABLED:
+            return []
+        from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price  # type: ignore
+
+        for ix in instructions:
+            # Fees are local to the accounts a transaction write-locks
+            for meta in ix.accounts:
+                if meta.is_writable:
+                    self.accounts.pop(str(meta.pubkey), None)
+                    self.accounts[str(meta.pubkey)] = None
+        while len(self.accounts) > MAX_FEE_ACCOUNTS:
+            self.accounts.pop(next(iter(self.accounts)))
+        limit = await self.get_compute_unit_limit(instructions, fee_payer, recent_blockhash)
+        price = await self.get_fee(urgency)
+        logger.info(f"[Solana] Compute budget ({urgency}): {limit} CU at {price} micro-lamports/CU")
+        return [set_compute_unit_limit(limit), set_compute_unit_price(price)]
+
+    # ==================== Landing Metrics ====================
+
+    def record_submission(self, signature: str, message):
+        """Remember when (and at which tier) a transaction was submitted"""
+        with self._lock:
+            self._submitted[signature] = (time.monotonic(), self.tier_for_price(compute_unit_price_of(message)))
+
+    def record_landing(self, signature: str, confirmed: bool):
+        """Record the submit-to-confirm latency of a transaction"""
+        with self._lock:
+            submitted = self._submitted.pop(signature, None)
+        if submitted is None or not confirmed:
+            return
+        submitted_at, tier = submitted
+        latency = time.monotonic() - submitted_at
+        with self._lock:
+            self._landings.setdefault(tier, deque(maxlen=LANDING_SAMPLES)).append(latency)
+        logger.info(f"[Solana] Transaction {signature[:16]}... landed in {latency:.2f}s (tier: {tier})")
+
+    def landing_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Landing latency per tier: {tier: {"count", "p50", "p90", "max"}} (seconds)"""
+        metrics = {}
+        with self._lock:
+            for tier, samples in self._landings.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                metrics[tier] = {
+                    "count": len(ordered),
+                    "p50": round(ordered[len(ordered) // 2], 3),
+                    "p90": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 3),
+                    "max": round(ordered[-1], 3)
+                }
+        return metrics
+
+
+_oracles: Dict[str, PriorityFeeOracle] = {}
+_oracles_lock = threading.Lock()
+
+
+def get_priority_fee_oracle(rpc_url: str) -> PriorityFeeOracle:
+    """Get (or create) the priority fee oracle of a cluster"""
+    with _oracles_lock:
+        oracle = _oracles.get(rpc_url)
+        if oracle is None:
+            oracle = PriorityFeeOracle(rpc_url)
+            _oracles[rpc_url] = oracle
+        return oracle
+
+
+async def run_priority_fee_refresh(interval_seconds: float = SOLANA_PRIORITY_FEE_REFRESH_SECONDS):
+    """Background loop refreshing every registered cluster's priority fees (started in the FastAPI lifespan)"""
+    logger.info(f"[Solana] Priority fee refresh loop started (interval: {interval_seconds}s)")
+    while True:
+        with _oracles_lock:
+            oracles = list(_oracles.values())
+        results = await asyncio.gather(*[oracle.refresh() for oracle in oracles], return_exceptions=True)
+        for oracle, result in zip(oracles, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[Solana] Priority fee refresh failed for {oracle.rpc_url}: {result}")
+        await asyncio.sleep(interval_seconds)
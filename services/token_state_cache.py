@@ -0,0 +1,263 @@
+"""
+Event-Driven ERC-20 Allowance and Balance Cache
+
+Keeps (owner, spender) allowances and owner balances of the tokens we handle in memory,
+so hot lookups (allowance checks, pre-sign balance checks) skip the allowance()/balanceOf()
+RPC round trip.
+
+- Entries are warmed on first use with a regular eth_call
+- A background sync loop follows Approval/Transfer logs of every cached token and applies
+  them to the entries it knows about (permit() emits Approval as well)
+- Staleness is bounded: an entry is only served while the last successful log sync (or its
+  own load time) is at most TOKEN_CACHE_MAX_STALENESS_SECONDS old, otherwise it is re-read
+
+Configuration (.env):
+- TOKEN_CACHE_ENABLED: true (default) / false to always read from the chain
+- TOKEN_CACHE_MAX_STALENESS_SECONDS: Max age of served values (default: 15)
+- TOKEN_CACHE_POLL_SECONDS: Log polling interval (default: 4)
+"""
+from log import logger
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from eth_utils import keccak
+from web3 import Web3
+
+# Load environment variables
+load_dotenv()
+
+TOKEN_CACHE_ENABLED = os.getenv("TOKEN_CACHE_ENABLED", "true").lower() == "true"
+TOKEN_CACHE_MAX_STALENESS_SECONDS = float(os.getenv("TOKEN_CACHE_MAX_STALENESS_SECONDS", "15"))
+TOKEN_CACHE_POLL_SECONDS = float(os.getenv("TOKEN_CACHE_POLL_SECONDS", "4"))
+
+# Larger gaps (e.g. after downtime) are not replayed; the cache is cleared and re-warmed instead
+MAX_LOG_BLOCK_RANGE = 2000
+
+APPROVAL_TOPIC = "0x" + keccak(text="Approval(address,address,uint256)").hex()
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+
+# allowance(address,address) / balanceOf(address) selectors
+ALLOWANCE_SELECTOR = "0xdd62ed3e"
+BALANCE_OF_SELECTOR = "0x70a08231"
+
+
+def _topic_address(topic) -> str:
+    topic_hex = topic.hex() if isinstance(topic, (bytes, bytearray)) else str(topic)
+    return Web3.to_checksum_address("0x" + topic_hex[-40:])
+
+
+def _log_value(data) -> int:
+    if isinstance(data, (bytes, bytearray)):
+        return int.from_bytes(data, "big")
+    return int(str(data), 16)
+
+
+class TokenStateCache:
+    """Allowance and balance cache for one ERC-20 token on one chain"""
+
+    def __init__(self, network: str, token_address: str, w3: Web3):
+        """
+        Initialize the cache
+
+        Args:
+            network: Network name (sepolia, basesepolia, bnbtestnet)
+            token_address: Token contract address
+            w3: Web3 instance used for warm-up reads and log polling
+        """
+        self.network = network
+        self.token_address = Web3.to_checksum_address(token_address)
+        self.w3 = w3
+        # key -> (value, loaded_at)
+        self._allowances: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._balances: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        # Log following state: last applied block, time of the last successful sync and since when syncs are continuous
+        self._last_block: Optional[int] = None
+        self._synced_at: Optional[float] = None
+        self._following_since: Optional[float] = None
+
+    # ---------- Reads ----------
+
+    def _is_fresh(self, loaded_at: float) -> bool:
+        # Entries loaded while the log sync was running stay current as of the last sync
+        as_of = loaded_at
+        if self._synced_at is not None and self._following_since is not None and loaded_at >= self._following_since:
+            as_of = max(loaded_at, self._synced_at)
+        return time.time() - as_of <= TOKEN_CACHE_MAX_STALENESS_SECONDS
+
+    def _call_uint(self, data: str, block_identifier) -> int:
+        res = self.w3.eth.call({"to": self.token_address, "data": data}, block_identifier)
+        return int(res.hex(), 16) if len(res) else 0
+
+    def _read(self, data: str) -> Tuple[int, Optional[int]]:
+        # While following logs, read at the last applied block so later logs apply exactly once
+        synced_block = self._last_block
+        value = self._call_uint(data, synced_block if synced_block is not None else "latest")
+        return value, synced_block
+
+    def _store(self, entries: dict, key, value: int, loaded_at: float, synced_block: Optional[int]):
+        with self._lock:
+            # A sync ran in between; the value is already outdated relative to the applied logs
+            if synced_block == self._last_block:
+                entries[key] = (value, loaded_at)
+
+    def get_allowance(self, owner: str, spender: str, refresh: bool = False) -> int:
+        """
+        Allowance granted by owner to spender (smallest unit)
+
+        Args:
+            owner: Token holder's address
+            spender: Spender address
+            refresh: Skip the cache and read from the chain
+        """
+        key = (owner.lower(), spender.lower())
+        if TOKEN_CACHE_ENABLED and not refresh:
+            with self._lock:
+                entry = self._allowances.get(key)
+            if entry and self._is_fresh(entry[1]):
+                return entry[0]
+        loaded_at = time.time()
+        data = ALLOWANCE_SELECTOR + owner[2:].lower().rjust(64, "0") + spender[2:].lower().rjust(64, "0")
+        allowance, synced_block = self._read(data)
+        self._store(self._allowances, key, allowance, loaded_at, synced_block)
+        return allowance
+
+    def get_balance(self, owner: str, refresh: bool = False) -> int:
+        """
+        Token balance of owner (smallest unit)
+
+        Args:
+            owner: Token holder's address
+            refresh: Skip the cache and read from the chain
+        """
+        key = owner.lower()
+        if TOKEN_CACHE_ENABLED and not refresh:
+            with self._lock:
+                entry = self._balances.get(key)
+            if entry and self._is_fresh(entry[1]):
+                return entry[0]
+        loaded_at = time.time()
+        balance, synced_block = self._read(BALANCE_OF_SELECTOR + owner[2:].lower().rjust(64, "0"))
+        self._store(self._balances, key, balance, loaded_at, synced_block)
+        return balance
+
+    # ---------- Writes ----------
+
+    def set_allowance(self, owner: str, spender: str, value: int):
+        """Record a known allowance (e.g. right after a confirmed permit)"""
+        with self._lock:
+            self._allowances[(owner.lower(), spender.lower())] = (int(value), time.time())
+
+    def invalidate_owner(self, owner: str):
+        """Drop all entries of an owner (e.g. after submitting a transferFrom)"""
+        owner_key = owner.lower()
+        with self._lock:
+            self._balances.pop(owner_key, None)
+            for key in [key for key in self._allowances if key[0] == owner_key]:
+                del self._allowances[key]
+
+    def clear(self):
+        with self._lock:
+            self._allowances.clear()
+            self._balances.clear()
+
+    # ---------- Log following ----------
+
+    def sync(self) -> int:
+        """
+        Apply Approval/Transfer logs since the last synced block (blocking, call from a thread)
+
+        Returns:
+            Number of logs applied
+        """
+        latest = self.w3.eth.block_number
+        if self._last_block is None or latest - self._last_block > MAX_LOG_BLOCK_RANGE:
+            if self._last_block is not None:
+                logger.warning(f"[TokenCache] {self.network} {self.token_address} fell behind by {latest - self._last_block} blocks, clearing cache")
+            with self._lock:
+                self._allowances.clear()
+                self._balances.clear()
+                self._last_block = latest
+            self._following_since = time.time()
+            self._synced_at = self._following_since
+            return 0
+        if latest <= self._last_block:
+            self._synced_at = time.time()
+            return 0
+
+        logs = self.w3.eth.get_logs({
+            "address": self.token_address,
+            "fromBlock": self._last_block + 1,
+            "toBlock": latest,
+            "topics": [[APPROVAL_TOPIC, TRANSFER_TOPIC]]
+        })
+        now = time.time()
+        with self._lock:
+            self._last_block = latest
+            for log in logs:
+                topics = log["topics"]
+                if len(topics) < 3:
+                    continue
+                topic0 = topics[0].hex() if isinstance(topics[0], (bytes, bytearray)) else str(topics[0])
+                topic0 = topic0 if topic0.startswith("0x") else "0x" + topic0
+                source = _topic_address(topics[1]).lower()
+                target = _topic_address(topics[2]).lower()
+                value = _log_value(log["data"])
+                if topic0 == APPROVAL_TOPIC:
+                    # permit() and approve() both emit Approval with the new absolute allowance
+                    if (source, target) in self._allowances:
+                        self._allowances[(source, target)] = (value, now)
+                elif topic0 == TRANSFER_TOPIC:
+                    if source in self._balances:
+                        self._balances[source] = (self._balances[source][0] - value, now)
+                    if target in self._balances:
+                        self._balances[target] = (self._balances[target][0] + value, now)
+                    # transferFrom does not emit Approval on every token (e.g. USDC), re-read the owner's allowances
+                    for key in [key for key in self._allowances if key[0] == source]:
+                        del self._allowances[key]
+        self._synced_at = now
+        return len(logs)
+
+
+# ==================== Global Cache Registry ====================
+
+_token_state_caches: Dict[Tuple[str, str], TokenStateCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_token_state_cache(network: str, token_address: str, w3: Web3) -> TokenStateCache:
+    """
+    Get (or create) the cache of a token; the w3 instance is only used on creation
+
+    Args:
+        network: Network name
+        token_address: Token contract address
+        w3: Web3 instance for the network
+    """
+    key = (network.lower(), token_address.lower())
+    with _caches_lock:
+        cache = _token_state_caches.get(key)
+        if cache is None:
+            cache = TokenStateCache(network.lower(), token_address, w3)
+            _token_state_caches[key] = cache
+        return cache
+
+
+async def run_token_state_sync(interval_seconds: float = TOKEN_CACHE_POLL_SECONDS):
+    """Follow Approval/Transfer logs of all registered token caches (intended as a background task)"""
+    logger.info(f"[TokenCache] Log sync started (every {interval_seconds}s, max staleness {TOKEN_CACHE_MAX_STALENESS_SECONDS}s)")
+    while True:
+        with _caches_lock:
+            caches = list(_token_state_caches.values())
+        for cache in caches:
+            try:
+                await asyncio.to_thread(cache.sync)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries age out on their own once syncs stop succeeding
+                logger.warning(f"[TokenCache] Log sync failed for {cache.network} {cache.token_address}: {e}")
+        await asyncio.sleep(interval_seconds)
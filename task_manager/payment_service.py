@@ -17,21 +17,25 @@ if settlement_mode == "CUSTODIAL":
 elif settlement_mode == "NONE_CUSTODIAL": # Note: Original code typo: NONE_CUSTODIAL
     # Assumes these modules/functions exist in the non_custodial service path
     from services.non_custodial.execute_permit import ExecutePermitRequest, execute_permit, TransferFromRequest, transfer_from
+    # EVM relayer pool (multi-spender wallet sharding)
+    from services.non_custodial.relayer_pool import get_relayer_pool
+    # Persistent payment state machine (resumable after a restart)
+    from .payment_state_machine import create_payment, mark_signed
+    # Settlement runs in per-chain worker pools, this layer only enqueues
+    from .settlement_workers import enqueue_settlement
+    from dao.app import count_unfinished_payments_by_spender
 # else: the functions will be undefined if the env var is missing or misspelled
 
 import asyncio
 
 # Protocol-specific signing simulation/generation functions
 from services.execute_sign import sign # For EVM (EIP-2612)
-from services.execute_sign_solana import sign_solana_transfer # For Solana (Partial Transaction Signing)
+from services.crypto_executor import get_crypto_executor
+from services.execute_sign_solana import sign_solana_transfer, sign_solana_approve # For Solana (Partial Transaction Signing)
+from services.solana_delegation_tracker import SOLANA_DELEGATE_MODE
 
-# Data Access Object (DAO) models
-from dao.model import (
-    SettlementBatchStatus, SettlementDetailStatus, SourceEvent,
-)
 # Business logic services for recording data
-from services.settlement_detail import collect_settlement_detail
-from services.settlement_batch import collect_settlement_batch
+from .settlement_recording import record_solana_settlement, record_evm_settlement
 from datetime import datetime
 
 # Backend/Spender configuration
@@ -71,49 +75,28 @@ async def permit_and_transfer_for_solana_devnet(
     logger.info("Executing Solana-devnet permit authorization...")
     
     period_start = datetime.now()
-    # The execute_permit implementation for Solana will complete the signature and submit
-    result = await execute_permit(permit_request)
-    logger.info("Permit Solana-devnet executed successfully!")
-    logger.info(f"Result: {result}")
-    
-    # Solana Note: The transfer instruction is part of the partial transaction submitted in 'permit'
-    logger.info("[SKIP] Solana does not require a separate transferFrom; the transfer is completed in the permit stage.")
-    current_time = datetime.now()
-    period_end = current_time
-
-    # --- Settlement Recording Logic ---
-    
-    is_success = result.get("success", False)
-    settlement_batch_status: Optional[SettlementBatchStatus] = None
-    settlement_detail_status: Optional[SettlementDetailStatus] = None
-    
-    if is_success:
-        settlement_batch_status = SettlementBatchStatus.released
-        settlement_detail_status = SettlementDetailStatus.released
+    if SOLANA_DELEGATE_MODE:
+        # Delegate mode: the (optional) approval is submitted first, then the fee payer pulls the spend amount
+        if signature:
+            permit_result = await execute_permit(permit_request)
+            logger.info(f"Solana-devnet approval result: {permit_result}")
+        else:
+            logger.info("[SKIP] Existing Solana delegation covers the payment, no approval needed.")
+        result = await transfer_from(TransferFromRequest(owner=payer, amount=spend_amount, token=token, network=network))
+        logger.info(f"Solana-devnet delegate transfer result: {result}")
     else:
-        settlement_batch_status = SettlementBatchStatus.failed
-        settlement_detail_status = SettlementDetailStatus.failed
+        # The execute_permit implementation for Solana will complete the signature and submit
+        result = await execute_permit(permit_request)
+        logger.info("Permit Solana-devnet executed successfully!")
+        logger.info(f"Result: {result}")
         
-    tx_hash = result.get("txHash", "N/A")
-    owner = payer
-    spender = payee # The fee payer is also the recipient in the current design
-    merchant_id = "zen7"
-    amount = budget_amount # Gross amount of the token transfer
-    gas_price = result.get("gasUsed", 0) # Assumes gasUsed is returned by the Solana handler
-    net_amount = amount - gas_price
-    
-    settlement_detail = collect_settlement_detail(
-        chain=network, gross_amount=spend_amount, source_event=SourceEvent.settlement_completed,
-        fee_amount=gas_price, net_amount=net_amount, settlement_detail_status=settlement_detail_status,
-        session_id=session_id, tx_hash=tx_hash, payer_address=owner, 
-        payee_address=spender, settled_at=current_time
-    )
-    
-    collect_settlement_batch(
-        settlement_detail=settlement_detail, chain=network, tenant_id=spender,
-        period_start=period_start, period_end=period_end, total_count=1, total_amount=spend_amount,
-        payee_address=spender, merchant_id=merchant_id, check_date=current_time, fee_total=gas_price,
-        net_total=net_amount, settlement_status=settlement_batch_status
+        # Solana Note: The transfer instruction is part of the partial transaction submitted in 'permit'
+        logger.info("[SKIP] Solana does not require a separate transferFrom; the transfer is completed in the permit stage.")
+
+    # --- Settlement Recording Logic ---
+    record_solana_settlement(
+        session_id=session_id, network=network, result=result, payer=payer, payee=payee,
+        budget_amount=budget_amount, spend_amount=spend_amount, period_start=period_start
     )
     return result
 
@@ -126,17 +109,22 @@ async def permit_and_transfer(
     budget_amount: int, 
     spend_amount: int, 
     deadline: int, 
-    v: int, r: str, s: str
+    v: int, r: str, s: str,
+    spender: str = None
 ) -> Dict[str, Any]:
     """
     Executes the two-step EVM EIP-2612 process: 
     1. Permit (Authorize Spender)
     2. TransferFrom (Spender moves tokens)
+    
+    The spender is the relayer named in the permit; it defaults to SPENDER_WALLET_ADDRESS.
     """
+    spender = spender or spender_wallet_address
+    
     # 1. Execute Permit (Allowance Authorization)
     permit_request = ExecutePermitRequest(
         owner=owner_wallet_address,
-        spender=spender_wallet_address,
+        spender=spender,
         value=budget_amount,
         deadline=deadline,
         v=v,
@@ -157,52 +145,17 @@ async def permit_and_transfer(
         amount=spend_amount,
         network=chain
     )
+    if settlement_mode == "NONE_CUSTODIAL":
+        transfer_request.spender = spender
     period_start = datetime.now()
     result = await transfer_from(transfer_request)
     logger.info("TransferFrom executed successfully!")
     logger.info(f"TransferFrom Result: {result}")
 
-    current_time = datetime.now()
-    period_end = current_time
-    
     # --- Settlement Recording Logic ---
-    
-    is_success = result.get("success", False)
-    settlement_batch_status: Optional[SettlementBatchStatus] = None
-    settlement_detail_status: Optional[SettlementDetailStatus] = None
-    
-    if is_success:
-        settlement_batch_status = SettlementBatchStatus.released
-        settlement_detail_status = SettlementDetailStatus.released
-    else:
-        settlement_batch_status = SettlementBatchStatus.failed
-        settlement_detail_status = SettlementDetailStatus.failed
-        
-    tx_hash = result.get("txHash", "N/A")
-
-    details = result.get("details", {})
-    logger.info(f"Got details from transfer_from: {details}")
-
-    owner = details.get("owner", owner_wallet_address)
-    spender = details.get("spender", spender_wallet_address)
-    merchant_id = "zen7"
-    amount = details.get("amount", spend_amount)
-    # The original code assumes gas_price is returned and converts units
-    gas_price = details.get("gas_price", 0) / 10000 
-    net_amount = amount - gas_price
-    
-    settlement_detail = collect_settlement_detail(
-        chain=chain, gross_amount=spend_amount, source_event=SourceEvent.settlement_completed,
-        fee_amount=gas_price, net_amount=net_amount, settlement_detail_status=settlement_detail_status,
-        session_id=session_id, tx_hash=tx_hash, payer_address=owner, 
-        payee_address=spender, settled_at=current_time
-    )
-    
-    collect_settlement_batch(
-        settlement_detail=settlement_detail, chain=chain, tenant_id=spender,
-        period_start=period_start, period_end=period_end, total_count=1, total_amount=spend_amount,
-        payee_address=spender, merchant_id=merchant_id, check_date=current_time, fee_total=gas_price,
-        net_total=net_amount, settlement_status=settlement_batch_status
+    record_evm_settlement(
+        session_id=session_id, chain=chain, result=result, owner_wallet_address=owner_wallet_address,
+        spender=spender, spend_amount=spend_amount, period_start=period_start
     )
     return result
 
@@ -222,15 +175,52 @@ class PaymentService:
         self.wallet_address = wallet_address
         self.payload = payload
         self.sign_info: Dict[str, Any] = {}
+        self.assigned_relayer: Optional[tuple] = None  # (network, relayer address) while a payment is in flight
+        self.payment_id: Optional[str] = None  # Persisted payment (non-custodial state machine)
         
     async def sign_for_payment(self) -> Optional[Dict[str, Any]]:
         """
         Handles the signing/signature generation step based on the network (EVM or Solana).
+        Non-custodial payments are persisted as 'created' before and 'signed' after signing.
         """
+        self.track_created()
+        sign_info = await self._generate_sign_info()
+        self.track_signed()
+        return sign_info
+
+    def track_created(self):
+        """Persist the payment before it is signed (non-custodial only)"""
+        if settlement_mode == "NONE_CUSTODIAL" and self.payment_id is None:
+            self.payment_id = create_payment(self.session_id, self.wallet_address, self.payload)
+
+    def track_signed(self):
+        """Store the signature of the persisted payment"""
+        if self.payment_id and self.sign_info and mark_signed(self.payment_id, self.sign_info) and self.assigned_relayer:
+            # The persisted payment now names its relayer and counts as its load until it finishes
+            network, relayer_address = self.assigned_relayer
+            get_relayer_pool(network).release(relayer_address)
+            self.assigned_relayer = None
+
+    async def _generate_sign_info(self) -> Optional[Dict[str, Any]]:
         logger.info(f"Sign for payment with payload: {self.payload}")
         network = self.payload.get("network")
         
-        if network == "solana-devnet":
+        if network == "solana-devnet" and SOLANA_DELEGATE_MODE:
+            # --- Solana delegate mode: one approval per budget, None while the delegation covers the payment ---
+            tx_base64, payer, payee = await sign_solana_approve(
+                network=network,
+                token=self.payload["token"],
+                budget=self.payload["budget"],
+                required=self.payload["spend_amount"]
+            )
+            self.sign_info = {
+                "signature": tx_base64,
+                "payer": payer,
+                "payee": payee,
+                "nonce": 0
+            }
+            return self.sign_info
+        elif network == "solana-devnet":
             # --- Solana: Generate Partial Transaction ---
             tx_base64, payer, payee = await sign_solana_transfer(
                 network=network,
@@ -256,7 +246,9 @@ class PaymentService:
                     "signature": self.payload["signature"],
                     "r": self.payload["r"], 
                     "s": self.payload["s"],
-                    "v": self.payload["v"]
+                    "v": self.payload["v"],
+                    # Pre-signed permits name their spender explicitly, otherwise the default spender
+                    "spender": self.payload.get("spender", spender_wallet_address)
                 }
                 # No return here, just setting self.sign_info
             else:
@@ -266,16 +258,33 @@ class PaymentService:
                 deadline = self.payload["deadline"]
                 network = self.payload["network"]
                 token = self.payload["token"]
-                signature, r, s, v, nonce = sign(budget=budget, deadline=deadline, network=network, token=token)
+                spender = self.assign_spender(network)
+                signature, r, s, v, nonce = await get_crypto_executor().run(
+                    sign, budget=budget, deadline=deadline, network=network, token=token, spender=spender
+                )
                 self.sign_info = {
                     "signature": signature,
                     "r": r, 
                     "s": s,
                     "v": v,
-                    "nonce": nonce
+                    "nonce": nonce,
+                    "spender": spender
                 }
             return self.sign_info # Return the collected/generated sign info
 
+    def assign_spender(self, network: str) -> str:
+        """
+        Picks the relayer that the permit names as spender (non-custodial EVM only).
+        Custodial mode keeps the single SPENDER_WALLET_ADDRESS.
+        """
+        if settlement_mode != "NONE_CUSTODIAL":
+            return spender_wallet_address
+        relayer = get_relayer_pool(network).assign(
+            owner=self.wallet_address, persisted_in_flight=count_unfinished_payments_by_spender(network)
+        )
+        self.assigned_relayer = (network, relayer.address)
+        return relayer.address
+
     async def do_permit_and_transfer(self, session_id: str, chain: str) -> Dict[str, Any]:
         """
         Submits the transaction(s) using the signed information.
@@ -291,7 +300,18 @@ class PaymentService:
         
         network = self.payload["network"]
         
-        if network == "solana-devnet":
+        if self.payment_id:
+            # Non-custodial: the chain's settlement workers settle the persisted payment,
+            # record the settlement and update the order
+            enqueue_settlement(self.payment_id, network)
+            return {
+                "success": True,
+                "txHash": "",
+                "status": "queued",
+                "message": "Payment queued for settlement",
+                "polling_required": True
+            }
+        elif network == "solana-devnet":
             # Solana Flow
             signature = self.sign_info["signature"]
             payer = self.sign_info["payer"]
@@ -321,10 +341,16 @@ class PaymentService:
                 deadline=deadline,
                 v=v,
                 r=r,
-                s=s
+                s=s,
+                spender=self.sign_info.get("spender")
             )
 
     async def cleanup(self):
         """Resets the state after the transaction is complete."""
+        if self.assigned_relayer:
+            network, relayer_address = self.assigned_relayer
+            get_relayer_pool(network).release(relayer_address)
+            self.assigned_relayer = None
         self.sign_info = {}
-        logger.info(f"Payment service has cleaned up for wallet address: {self.wallet_address}")
\ No newline at end of file
+        logger.info(f"Payment service has cleaned up for wallet address: {self.wallet_address}")
+
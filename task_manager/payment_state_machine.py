@@ -0,0 +1,398 @@
+"""
+Persistent Payment State Machine (non-custodial)
+
+Every payment is a row of the payment table that moves through
+
+    created -> signed -> permit_submitted -> permit_confirmed -> transfer_submitted -> confirmed
+                                                                                    \\-> failed (from any state)
+
+Each step reads the persisted row, does one on-chain action and stores the outcome
+(tx hash and relayer nonce on submission, the new state on confirmation) before the next
+step runs, so a payment can be picked up again after a crash or restart:
+
+- signed: the permit (EVM) / partially signed transaction (Solana) is submitted again;
+  a permit that already landed is skipped through the allowance check. EVM permits of one
+  owner and token are submitted in the order of the nonces they were signed with: a payment
+  waits while an earlier one of the owner is unfinished
+- permit_submitted / transfer_submitted: the stored tx hash is awaited, nothing is resent
+- permit_confirmed: transferFrom is submitted; the state moves to transfer_submitted
+  before the transaction is sent, so it can never be sent twice. A payment found in
+  transfer_submitted without a tx hash failed between the two and is marked failed for
+  manual reconciliation.
+
+Steps are driven by advance_payment, called by the per-chain settlement workers
+(settlement_workers.py), which also re-queue payments nobody advanced for a while. A lease
+on the row keeps two workers from driving the same payment.
+
+A step that fails with a retryable error (RPC / connection errors, nonce conflicts, see
+retry_policy.py) does not fail the payment: it stays in its state (a transferFrom that was
+certainly not sent goes back to permit_confirmed) and the worker runs it again after an
+exponential backoff, within the chain's retry budget and SETTLEMENT_RETRY_MAX_ATTEMPTS.
+A send whose outcome is unknown (TRANSACTION_STATUS_UNKNOWN) is never resent and does not
+fail the payment either: its tx hash is stored like that of a submitted transaction and
+the receipt settles it.
+
+Configuration (.env):
+- PAYMENT_LEASE_SECONDS: How long a worker owns a payment it drives (default: 300)
+- PAYMENT_CONFIRM_TIMEOUT_SECONDS: Wait for a stored tx hash when resuming (default: 60)
+- SETTLEMENT_RETRY_MAX_ATTEMPTS: Runs of a failing step before the payment fails (default: 5)
+- SETTLEMENT_RETRY_BASE_DELAY_SECONDS / SETTLEMENT_RETRY_MAX_DELAY_SECONDS: Backoff base and cap (default: 5 / 120)
+"""
+from log import logger
+
+from dotenv import load_dotenv
+import os
+import re
+from decimal import Decimal
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from dao.model import Payment, PaymentState
+from dao.app import (
+    add_payment, get_payment, transition_payment, lease_payment, release_payment_lease,
+    has_earlier_unfinished_permit
+)
+from services.non_custodial.execute_permit import ExecutePermitRequest, execute_permit, TransferFromRequest, transfer_from
+from services.non_custodial.transfer_handler import create_handler
+from services.order.order_service import add_or_update_order_item
+from services.solana_delegation_tracker import SOLANA_DELEGATE_MODE
+from services.retry_policy import RetryPolicy, RetryLater, classify, get_retry_budget
+from .settlement_recording import record_solana_settlement, record_evm_settlement
+
+load_dotenv()
+
+PAYMENT_LEASE_SECONDS = int(os.getenv("PAYMENT_LEASE_SECONDS", "300"))
+PAYMENT_CONFIRM_TIMEOUT_SECONDS = int(os.getenv("PAYMENT_CONFIRM_TIMEOUT_SECONDS", "60"))
+SETTLEMENT_RETRY_POLICY = RetryPolicy(
+    int(os.getenv("SETTLEMENT_RETRY_MAX_ATTEMPTS", "5")),
+    float(os.getenv("SETTLEMENT_RETRY_BASE_DELAY_SECONDS", "5")),
+    float(os.getenv("SETTLEMENT_RETRY_MAX_DELAY_SECONDS", "120"))
+)
+
+TERMINAL_STATES = (PaymentState.confirmed.value, PaymentState.failed.value)
+UNFINISHED_STATES = [state for state in PaymentState if state.value not in TERMINAL_STATES]
+
+
+def create_payment(session_id: str, owner_address: str, payload: Dict[str, Any]) -> str:
+    """
+    Persist a new payment before it is signed
+
+    Args:
+        session_id: Payment session
+        owner_address: User wallet
+        payload: Payment payload (network, token, budget, spend_amount, deadline, order_number)
+
+    Returns:
+        payment_id
+    """
+    payment = add_payment(Payment(
+        session_id=session_id,
+        order_number=payload.get("order_number"),
+        chain=payload["network"],
+        token=payload.get("token", "USDC"),
+        owner_address=owner_address,
+        budget=payload["budget"],
+        spend_amount=payload["spend_amount"],
+        deadline=payload["deadline"],
+        state=PaymentState.created
+    ))
+    return payment["payment_id"]
+
+
+def mark_signed(payment_id: str, sign_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Store the signature (and the permit nonce it was made with) of a created payment"""
+    fields = {
+        "sign_info": sign_info,
+        "spender_address": sign_info.get("spender") or sign_info.get("payee"),
+        "permit_nonce": sign_info.get("nonce")
+    }
+    if sign_info.get("payer"):
+        # Solana: the token owner is the payer of the partially signed transaction
+        fields["owner_address"] = sign_info["payer"]
+    return transition_payment(payment_id, [PaymentState.created], PaymentState.signed, **fields)
+
+
+async def advance_payment(payment_id: str, retries: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Drive a payment from its persisted state until it is confirmed, failed or waiting on-chain
+
+    Args:
+        payment_id: Payment to advance
+        retries: Earlier runs of the payment that failed transiently
+
+    Returns:
+        Result of the last step ("status": confirmed / failed / pending), or None if the
+        payment is finished or another worker holds it. Retryable step errors raise
+        RetryLater with the backoff; other step errors mark the payment failed and are re-raised.
+    """
+    payment = lease_payment(payment_id, PAYMENT_LEASE_SECONDS)
+    if payment is None:
+        logger.info(f"Payment {payment_id} is finished or driven by another worker")
+        return None
+    result = None
+    try:
+        while payment and payment["state"] not in TERMINAL_STATES:
+            step = _STEPS[payment["state"]]
+            try:
+                payment, result = await step(payment)
+            except Exception as e:
+                delay = _retry_delay(payment_id, e, retries)
+                if delay is None:
+                    _fail(payment, str(e))
+                    raise
+                raise RetryLater(delay, e)
+            if result is None or result.get("status") == "pending":
+                # Waiting for confirmation (resumed later) or another worker moved the payment
+                break
+    finally:
+        release_payment_lease(payment_id)
+    return result
+
+
+# --- Steps: each takes the persisted payment and returns (payment after the step, step result) ---
+
+async def _submit_permit(payment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """signed -> permit_submitted -> permit_confirmed"""
+    payment_id = payment["payment_id"]
+    sign_info = payment.get("sign_info") or {}
+    solana = _is_solana(payment)
+    if solana and SOLANA_DELEGATE_MODE and not sign_info.get("signature"):
+        logger.info(f"Payment {payment_id}: existing Solana delegation covers the payment, no approval needed.")
+        return _after_permit(payment, {"success": True, "txHash": "", "status": "confirmed"})
+
+    permit_nonce = payment.get("permit_nonce")
+    if permit_nonce is not None:
+        permit_nonce = int(Decimal(str(permit_nonce)))
+    in_time = int(payment["deadline"]) > datetime.now().timestamp()
+    if not solana and permit_nonce is not None and in_time and has_earlier_unfinished_permit(
+        payment_id, payment["chain"], payment["token"], payment["owner_address"], permit_nonce
+    ):
+        # The token only accepts the owner's permits in nonce order, and each permit overwrites
+        # the allowance the previous payment's transferFrom still needs. The wait ends with the
+        # permit's own deadline: the submission then fails fast with SIGNATURE_EXPIRED
+        logger.info(f"Payment {payment_id}: waiting for earlier permits of {payment['owner_address']} (nonce {permit_nonce})")
+        return payment, {"success": True, "status": "pending", "message": "Waiting for earlier permits of the owner"}
+
+    permit_request = ExecutePermitRequest(
+        owner=payment["owner_address"],
+        spender=payment["spender_address"],
+        value=_amount(payment["budget"]),
+        deadline=payment["deadline"],
+        token=payment["token"],
+        network=payment["chain"]
+    )
+    if solana:
+        permit_request.signature = sign_info["signature"]
+    else:
+        permit_request.v = sign_info["v"]
+        permit_request.r = sign_info["r"]
+        permit_request.s = sign_info["s"]
+        permit_request.nonce = permit_nonce
+
+    def on_submitted(tx_hash: str, details: Dict[str, Any]):
+        transition_payment(
+            payment_id, [PaymentState.signed], PaymentState.permit_submitted,
+            permit_tx_hash=tx_hash, permit_relayer_nonce=details.get("nonce")
+        )
+
+    result = await execute_permit(permit_request, on_submitted=on_submitted)
+    logger.info(f"Payment {payment_id} permit result: {result}")
+    return _after_permit(payment, result)
+
+
+async def _await_permit(payment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """permit_submitted -> permit_confirmed (resume: wait for the stored permit tx)"""
+    handler = create_handler(network=payment["chain"], token=payment["token"])
+    result = await _wait(handler, payment["permit_tx_hash"])
+    if result["status"] == "confirmed":
+        handler.mark_permit_used(payment["owner_address"], payment["spender_address"], _amount(payment["budget"]))
+    elif result["status"] == "failed":
+        handler.resync_permit_nonce(payment["owner_address"], result.get("message", ""))
+    return _after_permit(payment, result)
+
+
+async def _submit_transfer(payment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """permit_confirmed -> transfer_submitted -> confirmed"""
+    payment_id = payment["payment_id"]
+    solana = _is_solana(payment)
+    if solana and not SOLANA_DELEGATE_MODE:
+        # The transfer_checked instruction was part of the transaction submitted as permit
+        return _finish(payment, {
+            "success": True,
+            "txHash": payment.get("permit_tx_hash") or "",
+            "status": "confirmed",
+            "message": "Transfer completed in the permit transaction",
+            "polling_required": False
+        })
+
+    # Persist the intent before sending: a crash after this point is never resent blindly
+    payment = transition_payment(payment_id, [PaymentState.permit_confirmed], PaymentState.transfer_submitted)
+    if payment is None:
+        return None, None
+
+    transfer_request = TransferFromRequest(
+        owner=payment["owner_address"],
+        amount=_amount(payment["spend_amount"]),
+        token=payment["token"],
+        network=payment["chain"]
+    )
+    if not solana:
+        transfer_request.spender = payment["spender_address"]
+
+    def on_submitted(tx_hash: str, details: Dict[str, Any]):
+        transition_payment(
+            payment_id, [PaymentState.transfer_submitted], PaymentState.transfer_submitted,
+            transfer_tx_hash=tx_hash, transfer_relayer_nonce=details.get("nonce")
+        )
+
+    result = await transfer_from(transfer_request, on_submitted=on_submitted)
+    logger.info(f"Payment {payment_id} transferFrom result: {result}")
+    return _after_transfer(payment, result)
+
+
+async def _await_transfer(payment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """transfer_submitted -> confirmed (resume: wait for the stored transferFrom tx)"""
+    if not payment.get("transfer_tx_hash"):
+        raise Exception(
+            "transferFrom was started but its transaction hash was not recorded; "
+            "reconcile the owner's transfers on-chain before paying again"
+        )
+    handler = create_handler(network=payment["chain"], token=payment["token"])
+    result = await _wait(handler, payment["transfer_tx_hash"])
+    if result["status"] == "confirmed" and _is_solana(payment):
+        handler.mark_permit_used(payment["owner_address"])
+    return _after_transfer(payment, result)
+
+
+async def _abandon_unsigned(payment: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """created -> failed (resumed past its permit deadline: signing did not finish in time)"""
+    raise Exception("Payment was never signed")
+
+
+_STEPS = {
+    PaymentState.created.value: _abandon_unsigned,
+    PaymentState.signed.value: _submit_permit,
+    PaymentState.permit_submitted.value: _await_permit,
+    PaymentState.permit_confirmed.value: _submit_transfer,
+    PaymentState.transfer_submitted.value: _await_transfer,
+}
+
+
+# --- Helpers ---
+
+def _after_permit(payment: Dict[str, Any], result: Dict[str, Any]):
+    if result.get("status") == "confirmed" and result.get("success"):
+        confirmed = transition_payment(
+            payment["payment_id"], [PaymentState.signed, PaymentState.permit_submitted], PaymentState.permit_confirmed,
+            permit_tx_hash=result.get("txHash") or payment.get("permit_tx_hash")
+        )
+        return confirmed, result
+    if result.get("status") == "failed" or not result.get("success"):
+        return _finish(payment, result)
+    return get_payment(payment["payment_id"]), result
+
+
+def _after_transfer(payment: Dict[str, Any], result: Dict[str, Any]):
+    if result.get("status") == "pending" and result.get("success"):
+        return get_payment(payment["payment_id"]), result
+    return _finish(payment, result)
+
+
+def _finish(payment: Dict[str, Any], result: Dict[str, Any]):
+    """Move to confirmed/failed, then record the settlement and the order status"""
+    is_success = bool(result.get("success")) and result.get("status") == "confirmed"
+    fields = {"transfer_tx_hash": result.get("txHash") or payment.get("transfer_tx_hash")}
+    if not is_success:
+        fields["error_message"] = result.get("message") or result.get("error")
+    finished = transition_payment(
+        payment["payment_id"], UNFINISHED_STATES,
+        PaymentState.confirmed if is_success else PaymentState.failed, **fields
+    )
+    if finished is None:
+        return None, None
+
+    period_start = datetime.fromisoformat(finished["created_at"])
+    if _is_solana(finished):
+        record_solana_settlement(
+            session_id=finished["session_id"], network=finished["chain"], result=result,
+            payer=finished["owner_address"], payee=finished["spender_address"],
+            budget_amount=_amount(finished["budget"]), spend_amount=_amount(finished["spend_amount"]),
+            period_start=period_start
+        )
+    else:
+        record_evm_settlement(
+            session_id=finished["session_id"], chain=finished["chain"], result=result,
+            owner_wallet_address=finished["owner_address"], spender=finished["spender_address"],
+            spend_amount=_amount(finished["spend_amount"]), period_start=period_start, token=finished["token"]
+        )
+    _update_order(finished, "SUCCESS" if is_success else "FAILED", finished.get("error_message") or "")
+    return finished, result
+
+
+def _retry_delay(payment_id: str, error: Exception, retries: int) -> Optional[float]:
+    """Backoff before the failed step runs again, or None if the error fails the payment"""
+    error_code = classify(error)
+    if not SETTLEMENT_RETRY_POLICY.should_retry(error_code, retries):
+        return None
+    payment = get_payment(payment_id)
+    if payment is None or payment["state"] in TERMINAL_STATES:
+        return None
+    if not get_retry_budget(payment["chain"]).try_acquire():
+        logger.warning(f"Payment {payment_id}: retry budget of {payment['chain']} is spent, failing on {error_code.name}")
+        return None
+    if payment["state"] == PaymentState.transfer_submitted.value and not payment.get("transfer_tx_hash"):
+        # transferFrom failed before it could reach the node (a send with an unknown outcome
+        # records its tx hash and is awaited instead): submit it again
+        if transition_payment(payment_id, [PaymentState.transfer_submitted], PaymentState.permit_confirmed) is None:
+            return None
+    delay = SETTLEMENT_RETRY_POLICY.backoff(retries)
+    logger.warning(
+        f"Payment {payment_id} ({payment['state']}) failed with {error_code.name}, "
+        f"retry {retries + 1}/{SETTLEMENT_RETRY_POLICY.max_attempts - 1} in {delay:.1f}s: {error}"
+    )
+    return delay
+
+
+def _fail(payment: Dict[str, Any], error: str):
+    """Move to failed after a step raised (nothing was confirmed, no settlement is recorded)"""
+    error_code = None
+    error_message = error
+    match = re.search(r'\[(\d+)\]\s*(.*)', error)
+    if match:
+        error_code = match.group(1)
+        error_message = match.group(2)
+    failed = transition_payment(
+        payment["payment_id"], UNFINISHED_STATES, PaymentState.failed,
+        error_code=error_code, error_message=error_message
+    )
+    if failed:
+        _update_order(failed, "FAILED", error_message)
+
+
+def _update_order(payment: Dict[str, Any], status: str, status_message: str):
+    if not payment.get("order_number"):
+        return
+    add_or_update_order_item(
+        order_number=payment["order_number"], user_id=payment["owner_address"],
+        spend_amount=_amount(payment["spend_amount"]), budget=_amount(payment["budget"]),
+        currency=payment["token"], chain=payment["chain"], deadline=payment["deadline"],
+        status=status, status_message=status_message
+    )
+
+
+async def _wait(handler, tx_hash: str) -> Dict[str, Any]:
+    poll = await handler.wait_for_transaction(tx_hash, timeout=PAYMENT_CONFIRM_TIMEOUT_SECONDS)
+    if poll and poll.get("success") and poll.get("status") == "confirmed":
+        return {"success": True, "txHash": tx_hash, "status": "confirmed", "polling_required": False, "details": poll.get("details", {})}
+    if poll and not poll.get("success") and poll.get("status") == "failed":
+        return {"success": False, "txHash": tx_hash, "status": "failed", "message": poll.get("message", "Transaction failed"), "details": poll.get("details", {})}
+    return {"success": True, "txHash": tx_hash, "status": "pending", "polling_required": True, "message": "Transaction submitted, waiting for confirmation..."}
+
+
+def _is_solana(payment: Dict[str, Any]) -> bool:
+    return payment["chain"].startswith("solana")
+
+
+def _amount(value) -> int:
+    """Amounts come back from NUMERIC columns as decimal strings"""
+    return int(Decimal(str(value)))
@@ -0,0 +1,154 @@
+"""
+Settlement Recording of Finished Payments
+
+Writes the settlement detail (and batch) of a payment once its transfer is confirmed or
+failed. Used by the inline permit/transfer flows and by the payment state machine, which
+may finish a payment long after the request that started it (e.g. after a restart).
+"""
+from log import logger
+
+from dotenv import load_dotenv
+import os
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+from dao.model import (
+    SettlementBatchStatus, SettlementDetailStatus, SourceEvent,
+)
+from services.settlement_detail import collect_settlement_detail
+from services.settlement_batch import collect_settlement_batch
+from services.constants import ChainID, get_token_asset_id
+from dao.app import add_settlement_detail
+
+load_dotenv()
+
+settlement_mode = os.getenv("SETTLEMENT_MODE")
+if settlement_mode == "NONE_CUSTODIAL":
+    # Batched payouts (settlement details are paid out later by the PayoutExecutor)
+    from services.non_custodial.payout_executor import is_batch_payout_enabled
+    from services.non_custodial.evm_transfer_handler import TOKEN_CONFIGS
+
+
+def _settlement_statuses(result: Dict[str, Any]):
+    if result.get("success", False):
+        return SettlementBatchStatus.released, SettlementDetailStatus.released
+    return SettlementBatchStatus.failed, SettlementDetailStatus.failed
+
+
+def record_solana_settlement(
+    session_id: str,
+    network: str,
+    result: Dict[str, Any],
+    payer: str,
+    payee: str,
+    budget_amount: int,
+    spend_amount: int,
+    period_start: datetime,
+    period_end: Optional[datetime] = None
+):
+    """
+    Record the settlement of a Solana payment
+
+    Args:
+        session_id: Payment session (stored as intent_id)
+        network: Solana network name
+        result: Final transfer result (success, txHash, gasUsed)
+        payer: User address
+        payee: Recipient / fee payer address
+        budget_amount, spend_amount: Smallest unit
+        period_start, period_end: Settlement period (period_end defaults to now)
+    """
+    current_time = period_end or datetime.now()
+    settlement_batch_status, settlement_detail_status = _settlement_statuses(result)
+
+    tx_hash = result.get("txHash", "N/A")
+    owner = payer
+    spender = payee # The fee payer is also the recipient in the current design
+    merchant_id = "zen7"
+    amount = budget_amount # Gross amount of the token transfer
+    gas_price = result.get("gasUsed", 0) # Assumes gasUsed is returned by the Solana handler
+    net_amount = amount - gas_price
+
+    settlement_detail = collect_settlement_detail(
+        chain=network, gross_amount=spend_amount, source_event=SourceEvent.settlement_completed,
+        fee_amount=gas_price, net_amount=net_amount, settlement_detail_status=settlement_detail_status,
+        session_id=session_id, tx_hash=tx_hash, payer_address=owner,
+        payee_address=spender, settled_at=current_time
+    )
+
+    collect_settlement_batch(
+        settlement_detail=settlement_detail, chain=network, tenant_id=spender,
+        period_start=period_start, period_end=current_time, total_count=1, total_amount=spend_amount,
+        payee_address=spender, merchant_id=merchant_id, check_date=current_time, fee_total=gas_price,
+        net_total=net_amount, settlement_status=settlement_batch_status
+    )
+
+
+def record_evm_settlement(
+    session_id: str,
+    chain: str,
+    result: Dict[str, Any],
+    owner_wallet_address: str,
+    spender: str,
+    spend_amount: int,
+    period_start: datetime,
+    period_end: Optional[datetime] = None,
+    token: str = "USDC"
+):
+    """
+    Record the settlement of an EVM payment (or queue it for the next payout batch)
+
+    Args:
+        session_id: Payment session (stored as intent_id)
+        chain: EVM network name
+        result: Final transferFrom result (success, txHash, details)
+        owner_wallet_address: Token owner
+        spender: Relayer that executed transferFrom
+        spend_amount: Smallest unit
+        period_start, period_end: Settlement period (period_end defaults to now)
+        token: Token symbol of the payment (the payout batch of that token pays it)
+    """
+    current_time = period_end or datetime.now()
+    is_success = result.get("success", False)
+    settlement_batch_status, settlement_detail_status = _settlement_statuses(result)
+
+    tx_hash = result.get("txHash", "N/A")
+
+    details = result.get("details", {})
+    logger.info(f"Got details from transfer_from: {details}")
+
+    owner = details.get("owner", owner_wallet_address)
+    spender = details.get("spender", spender)
+    merchant_id = "zen7"
+    amount = details.get("amount", spend_amount)
+    # The original code assumes gas_price is returned and converts units
+    gas_price = details.get("gas_price", 0) / 10000
+    net_amount = amount - gas_price
+
+    if is_success and settlement_mode == "NONE_CUSTODIAL" and is_batch_payout_enabled():
+        # The deposit sits in the payout wallet; record the detail as ready for the next payout batch
+        payee_address = os.getenv("PAYEE_WALLET_ADDRESS") or spender
+        token_address = TOKEN_CONFIGS.get(chain.lower(), {}).get(token.upper(), {}).get("address")
+        asset_id = get_token_asset_id(ChainID.get(chain.lower(), ""), token_address) if token_address else None
+        settlement_detail = collect_settlement_detail(
+            chain=chain, gross_amount=spend_amount, source_event=SourceEvent.funds_escrowed,
+            fee_amount=0, net_amount=spend_amount, settlement_detail_status=SettlementDetailStatus.ready,
+            session_id=session_id, tx_hash=tx_hash, payer_address=owner,
+            payee_address=payee_address, asset_id=asset_id
+        )
+        add_settlement_detail(settlement_detail)
+        return
+
+    settlement_detail = collect_settlement_detail(
+        chain=chain, gross_amount=spend_amount, source_event=SourceEvent.settlement_completed,
+        fee_amount=gas_price, net_amount=net_amount, settlement_detail_status=settlement_detail_status,
+        session_id=session_id, tx_hash=tx_hash, payer_address=owner,
+        payee_address=spender, settled_at=current_time
+    )
+
+    collect_settlement_batch(
+        settlement_detail=settlement_detail, chain=chain, tenant_id=spender,
+        period_start=period_start, period_end=current_time, total_count=1, total_amount=spend_amount,
+        payee_address=spender, merchant_id=merchant_id, check_date=current_time, fee_total=gas_price,
+        net_total=net_amount, settlement_status=settlement_batch_status
+    )
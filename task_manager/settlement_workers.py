@@ -0,0 +1,294 @@
+"""
+Per-Chain Settlement Worker Pools (non-custodial)
+
+The agent layer no longer settles payments inline: it enqueues the persisted payment
+(see payment_state_machine.py) into the settlement_job table and returns. Each chain
+has its own worker pool that claims due jobs of that chain with FOR UPDATE SKIP LOCKED
+and drives them with advance_payment, so a burst on a slow chain cannot take the
+workers of another one, and several processes can share the queue.
+
+A job whose transaction is still unconfirmed goes back to the queue with a re-check
+delay of about two blocks, a job whose step failed transiently with the retry backoff of
+the state machine; a job of a crashed worker is reclaimed once its lock expires.
+When the payment finishes the worker records the audit event and notifies
+NOTIFICATION_URL (the order status is updated by the state machine).
+
+Pool size per chain: SETTLEMENT_WORKERS when configured, otherwise Little's law on the
+chain's RPC budget: (rps / RPC calls per payment) x payment latency, where the latency is
+~2 blocks per transaction (EVM: permit + transferFrom, Solana: one transaction).
+
+Configuration (.env):
+- SETTLEMENT_WORKERS_ENABLED: Run the pools in this process (default: true); with false the
+  server only enqueues and `python -m task_manager.settlement_workers` runs the workers
+- SETTLEMENT_WORKERS: Explicit pool sizes, e.g. sepolia:8,solana-devnet:16
+- SETTLEMENT_RPC_RPS: RPC requests per second available per chain, e.g. sepolia:25 (default: 10)
+- SETTLEMENT_RPC_CALLS_PER_PAYMENT: RPC calls of one payment (default: 10)
+- SETTLEMENT_MIN_WORKERS / SETTLEMENT_MAX_WORKERS: Bounds of computed pool sizes (default: 2 / 32)
+- SETTLEMENT_POLL_SECONDS: Queue poll interval of an idle pool (default: 1)
+- PAYMENT_RESUME_INTERVAL_SECONDS: Interval of the resume loop (default: 30)
+- PAYMENT_RESUME_STALE_SECONDS: Idle time after which an unfinished payment is re-queued (default: 120);
+  a payment never queued for settlement (created / signed, waiting for the user) only once its permit deadline passed
+- PAYMENT_RESUME_BATCH_SIZE: Payments re-queued per cycle (default: 20)
+"""
+from log import logger
+
+from dotenv import load_dotenv
+import os
+import math
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set
+
+from dao.app import (
+    enqueue_settlement_job, claim_settlement_jobs, update_settlement_job,
+    get_payment, get_resumable_payment_ids
+)
+from dao.model import AuditEventType, BatchStatus, PaymentState
+from services.audit_event import collect_audit_event
+from services.order.order_service import notify_order_status
+from services.non_custodial.transfer_handler import CHAIN_CONFIGS, get_configured_handlers
+from services.retry_policy import RetryLater
+from .payment_state_machine import advance_payment, TERMINAL_STATES, PAYMENT_LEASE_SECONDS
+
+load_dotenv()
+
+
+def _parse_network_map(value: Optional[str], cast) -> Dict[str, Any]:
+    """"sepolia:8,solana-devnet:16" -> {"sepolia": 8, "solana-devnet": 16}"""
+    result = {}
+    for item in (value or "").split(","):
+        if ":" in item:
+            network, number = item.rsplit(":", 1)
+            result[network.strip().lower()] = cast(number.strip())
+    return result
+
+
+SETTLEMENT_WORKERS_ENABLED = os.getenv("SETTLEMENT_WORKERS_ENABLED", "true").lower() == "true"
+SETTLEMENT_WORKERS = _parse_network_map(os.getenv("SETTLEMENT_WORKERS"), int)
+SETTLEMENT_RPC_RPS = _parse_network_map(os.getenv("SETTLEMENT_RPC_RPS"), float)
+DEFAULT_RPC_RPS = 10.0
+SETTLEMENT_RPC_CALLS_PER_PAYMENT = float(os.getenv("SETTLEMENT_RPC_CALLS_PER_PAYMENT", "10"))
+SETTLEMENT_MIN_WORKERS = int(os.getenv("SETTLEMENT_MIN_WORKERS", "2"))
+SETTLEMENT_MAX_WORKERS = int(os.getenv("SETTLEMENT_MAX_WORKERS", "32"))
+SETTLEMENT_POLL_SECONDS = float(os.getenv("SETTLEMENT_POLL_SECONDS", "1"))
+PAYMENT_RESUME_INTERVAL_SECONDS = int(os.getenv("PAYMENT_RESUME_INTERVAL_SECONDS", "30"))
+PAYMENT_RESUME_STALE_SECONDS = int(os.getenv("PAYMENT_RESUME_STALE_SECONDS", "120"))
+PAYMENT_RESUME_BATCH_SIZE = int(os.getenv("PAYMENT_RESUME_BATCH_SIZE", "20"))
+
+
+def _block_time(network: str) -> float:
+    return float(CHAIN_CONFIGS.get(network, {}).get("block_time", 12))
+
+
+def pool_size(network: str) -> int:
+    """Worker count of a chain (explicit SETTLEMENT_WORKERS, else sized from block time and RPC budget)"""
+    if network in SETTLEMENT_WORKERS:
+        return max(1, SETTLEMENT_WORKERS[network])
+    transactions = 1 if network.startswith("solana") else 2
+    latency = transactions * max(2 * _block_time(network), 1.0)
+    throughput = SETTLEMENT_RPC_RPS.get(network, DEFAULT_RPC_RPS) / SETTLEMENT_RPC_CALLS_PER_PAYMENT
+    return min(SETTLEMENT_MAX_WORKERS, max(SETTLEMENT_MIN_WORKERS, math.ceil(throughput * latency)))
+
+
+class SettlementWorkerPool:
+    """Concurrent settlements of one chain, fed from the settlement_job queue"""
+
+    def __init__(self, network: str, concurrency: int):
+        """
+        Initialize the pool
+
+        Args:
+            network: Chain whose jobs the pool claims
+            concurrency: Max payments settled at the same time
+        """
+        self.network = network
+        self.concurrency = concurrency
+        self.recheck_seconds = max(2.0, 2 * _block_time(network))
+        self._running: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        """A job was enqueued: claim now instead of at the next poll"""
+        self._wake.set()
+
+    async def run(self):
+        """Claim and settle jobs forever (intended as a background task)"""
+        logger.info(f"[Settlement] Worker pool for {self.network} started ({self.concurrency} workers)")
+        try:
+            while True:
+                jobs = []
+                try:
+                    free = self.concurrency - len(self._running)
+                    if free > 0:
+                        jobs = claim_settlement_jobs(self.network, free, PAYMENT_LEASE_SECONDS)
+                    for job in jobs:
+                        task = asyncio.create_task(self._settle(job))
+                        self._running.add(task)
+                        task.add_done_callback(self._running.discard)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"[Settlement] Claiming jobs for {self.network} failed: {e}")
+                if jobs and len(self._running) < self.concurrency:
+                    # The queue may hold more due jobs
+                    continue
+                self._wake.clear()
+                wake = asyncio.ensure_future(self._wake.wait())
+                await asyncio.wait({wake, *self._running}, timeout=SETTLEMENT_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                wake.cancel()
+        finally:
+            # Claims of interrupted jobs expire and are picked up again
+            for task in list(self._running):
+                task.cancel()
+
+    async def _settle(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        payment_id = job["payment_id"]
+        error = None
+        retry_in = None
+        try:
+            await advance_payment(payment_id, retries=job.get("retries") or 0)
+        except RetryLater as e:
+            error = str(e)
+            retry_in = e.delay
+        except Exception as e:
+            error = str(e)
+            logger.error(f"[Settlement] Payment {payment_id} on {self.network} failed: {error}")
+
+        try:
+            payment = get_payment(payment_id)
+            if payment is None:
+                update_settlement_job(job_id, status=BatchStatus.failed, locked_until=None, last_error="Payment not found")
+                return
+            if payment["state"] in TERMINAL_STATES:
+                confirmed = payment["state"] == PaymentState.confirmed.value
+                update_settlement_job(
+                    job_id, status=BatchStatus.done if confirmed else BatchStatus.failed,
+                    locked_until=None, last_error=payment.get("error_message")
+                )
+                await self._report(payment, confirmed)
+            elif retry_in is not None:
+                # A step failed transiently: run it again after the backoff
+                update_settlement_job(
+                    job_id, status=BatchStatus.pending, locked_until=None, last_error=error,
+                    retries=(job.get("retries") or 0) + 1,
+                    available_at=datetime.now() + timedelta(seconds=retry_in)
+                )
+            else:
+                # Waiting for confirmation, or the payment is driven by another worker: check again later
+                update_settlement_job(
+                    job_id, status=BatchStatus.pending, locked_until=None, last_error=error,
+                    available_at=datetime.now() + timedelta(seconds=self.recheck_seconds)
+                )
+        except Exception as e:
+            logger.error(f"[Settlement] Updating job {job_id} failed (reclaimed after its lock expires): {e}")
+
+    async def _report(self, payment: Dict[str, Any], confirmed: bool):
+        """Audit event and order notification of a finished payment"""
+        collect_audit_event(
+            session_id=payment["session_id"], chain=payment["chain"],
+            event_type=AuditEventType.transfer_completed if confirmed else AuditEventType.transaction_failed,
+            owner_address=payment["owner_address"], spender_address=payment["spender_address"],
+            amount=payment["spend_amount"], tx_hash=payment.get("transfer_tx_hash") or payment.get("permit_tx_hash")
+        )
+        if payment.get("order_number"):
+            await asyncio.to_thread(
+                notify_order_status, payment["order_number"], confirmed,
+                payment.get("error_code"), payment.get("error_message")
+            )
+
+
+_pools: Dict[str, SettlementWorkerPool] = {}
+_pool_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _start_pool(network: str) -> asyncio.Task:
+    pool = SettlementWorkerPool(network, pool_size(network))
+    _pools[network] = pool
+    task = asyncio.create_task(pool.run())
+    _pool_tasks[network] = task
+    return task
+
+
+def enqueue_settlement(payment_id: str, chain: str) -> Dict[str, Any]:
+    """
+    Queue a signed payment for settlement by its chain's worker pool
+
+    Args:
+        payment_id: Persisted payment
+        chain: Network of the payment
+
+    Returns:
+        The settlement job
+    """
+    job = enqueue_settlement_job(payment_id, chain)
+    if SETTLEMENT_WORKERS_ENABLED:
+        pool = _pools.get(chain)
+        if pool is None:
+            logger.info(f"[Settlement] No worker pool for {chain} yet, starting one")
+            _start_pool(chain)
+        else:
+            pool.wake()
+    return job
+
+
+def start_settlement_pools(networks: Optional[List[str]] = None) -> List[asyncio.Task]:
+    """
+    Start one worker pool per chain (no-op with SETTLEMENT_WORKERS_ENABLED=false)
+
+    Args:
+        networks: Chains to serve, defaults to the networks of the configured handlers
+
+    Returns:
+        The started tasks (cancel them on shutdown)
+    """
+    if not SETTLEMENT_WORKERS_ENABLED:
+        return []
+    if networks is None:
+        networks = sorted({network for network, _ in get_configured_handlers()})
+    return [_start_pool(network) for network in networks if network not in _pools]
+
+
+async def stop_settlement_pools(tasks: List[asyncio.Task]):
+    """Cancel pools started by start_settlement_pools / enqueue_settlement"""
+    tasks = list(tasks) + [task for task in _pool_tasks.values() if task not in tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _pools.clear()
+    _pool_tasks.clear()
+
+
+async def run_payment_resume_loop(interval_seconds: int = PAYMENT_RESUME_INTERVAL_SECONDS):
+    """Re-queue unfinished payments nobody advanced for a while, e.g. after a restart (intended as a background task)"""
+    logger.info(f"[Settlement] Resume loop started (every {interval_seconds}s, stale after {PAYMENT_RESUME_STALE_SECONDS}s)")
+    while True:
+        try:
+            for payment_id in get_resumable_payment_ids(PAYMENT_RESUME_STALE_SECONDS, limit=PAYMENT_RESUME_BATCH_SIZE):
+                payment = get_payment(payment_id)
+                if payment:
+                    enqueue_settlement(payment_id, payment["chain"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Settlement] Resume cycle failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def main():
+    """Standalone settlement worker process (SETTLEMENT_WORKERS_ENABLED=false on the API servers)"""
+    from services.non_custodial.transfer_handler import build_handlers, close_handlers
+
+    global SETTLEMENT_WORKERS_ENABLED
+    SETTLEMENT_WORKERS_ENABLED = True
+    await build_handlers()
+    tasks = start_settlement_pools() + [asyncio.create_task(run_payment_resume_loop())]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await stop_settlement_pools(tasks)
+        await close_handlers()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())